@@ -0,0 +1,183 @@
+"""
+ASGI config for battleship project.
+
+It exposes the ASGI callable as a module-level variable named ``application``, to be served by any ASGI server, e.g.
+``uvicorn battleship.asgi:application``.
+
+Django 2.0 has no ASGI handler, so the ASGI application runs the WSGI application of the project on a pool of
+ASGI_THREADS threads: the event loop of the server holds the client connections, idle or slow, and a thread is only
+taken while Django handles a request.
+Streaming responses, such as the game event streams, give their request thread back once the view returned and pull
+each of their chunks with a separate task of another pool of ASGI_STREAM_THREADS threads, so the streams never hold
+the request threads. A stream only holds a thread while it waits for its next chunk, up to the POLL_TIMEOUT of the
+game events: at most ASGI_STREAM_THREADS streams wait at once, the chunks of the others wait for their turn. A
+request whose client disconnects stops streaming its response.
+"""
+
+import asyncio
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.db import close_old_connections
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "battleship.settings")
+
+
+def build_environ(scope, body):
+    """
+    WSGI environ of an ASGI http scope
+    :param scope: ASGI http scope
+    :param body: file with the request body
+    :return: WSGI environ
+    """
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+        'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin1').lower()
+        if name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        elif name == 'content-type':
+            key = 'CONTENT_TYPE'
+        else:
+            key = 'HTTP_{}'.format(name.upper().replace('-', '_'))
+        value = value.decode('latin1')
+        environ[key] = '{},{}'.format(environ[key], value) if key in environ else value
+
+    return environ
+
+
+class WsgiToAsgi:
+    """
+    ASGI application running a WSGI application on a pool of threads, and the chunks of its streaming responses on
+    another one
+    """
+
+    def __init__(self, wsgi_application, threads, stream_threads):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='asgi')
+        self.stream_executor = ThreadPoolExecutor(stream_threads, thread_name_prefix='asgi-stream')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError('Unsupported ASGI scope type {}'.format(scope['type']))
+
+        body = io.BytesIO()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+
+        disconnected = threading.Event()
+        watcher = asyncio.ensure_future(self.watch_disconnect(receive, disconnected))
+        loop = asyncio.get_event_loop()
+        try:
+            streaming = await loop.run_in_executor(self.executor, self.run, loop, build_environ(scope, body), send)
+            if streaming is not None:
+                await self.stream(loop, *streaming, send, disconnected)
+        finally:
+            watcher.cancel()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                self.stream_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def watch_disconnect(receive, disconnected):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        disconnected.set()
+
+    def run(self, loop, environ, send):
+        """
+        Run the WSGI application in a thread of the pool, sending its response through the event loop unless it is
+        streaming
+        :return: (response start message, response) of a streaming response, None once the response is sent
+        """
+        response_start = {}
+
+        def start_response(status, headers, exc_info=None):
+            response_start.update({
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers],
+            })
+
+        response = self.wsgi_application(environ, start_response)
+        if getattr(response, 'streaming', True):
+            # the response is closed by a thread of the stream pool, close the database connections of this one now
+            close_old_connections()
+            return response_start, response
+
+        try:
+            # the whole content is known, send it at once rather than a round trip to the event loop per chunk
+            message = {'type': 'http.response.body', 'body': b''.join(response)}
+            asyncio.run_coroutine_threadsafe(self.send_messages(send, [response_start, message]), loop).result()
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+
+    async def stream(self, loop, response_start, response, send, disconnected):
+        """
+        Send a streaming response, each chunk pulled by a separate task of the stream pool
+        """
+        chunks = iter(response)
+        # the response starts along with its first chunk
+        pending = [response_start]
+        try:
+            while not disconnected.is_set():
+                chunk = await loop.run_in_executor(self.stream_executor, next, chunks, None)
+                if chunk is None:
+                    await self.send_messages(send, pending + [{'type': 'http.response.body', 'body': b''}])
+                    return
+                if chunk:
+                    await self.send_messages(send, pending + [
+                        {'type': 'http.response.body', 'body': chunk, 'more_body': True}])
+                    pending = []
+        finally:
+            if hasattr(response, 'close'):
+                await loop.run_in_executor(self.stream_executor, response.close)
+
+    @staticmethod
+    async def send_messages(send, messages):
+        for message in messages:
+            await send(message)
+
+
+application = WsgiToAsgi(get_wsgi_application(), settings.ASGI_THREADS, settings.ASGI_STREAM_THREADS)
@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, to time the whole request; left out unless BATTLESHIP_METRICS is enabled
+    'battleship_game.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,6 +73,11 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'battleship.wsgi.application'
 
+# Threads of battleship/asgi.py running the requests, each holds a database connection while it handles one
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 32))
+# Threads of battleship/asgi.py pulling the chunks of the streaming responses, a stream holds one while it waits
+ASGI_STREAM_THREADS = int(os.environ.get('ASGI_STREAM_THREADS', 32))
+
 # Database
 # https://docs.djangoproject.com/en/2.0/ref/settings/#databases
 
@@ -83,6 +90,16 @@ DATABASES = {
     }
 }
 
+# Caches
+# https://docs.djangoproject.com/en/2.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.0/ref/settings/#auth-password-validators
 
@@ -118,3 +135,83 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.0/howto/static-files/
 
 STATIC_URL = '/static/'
+
+# Pool of pre-generated boards claimed by new games, see battleship_game/pool.py
+# SIZE: number of ready boards to keep, 0 disables the pool
+# GRID_SIZES: number of ready boards to keep of other grid sizes, e.g. {1000: 2}. A game of a size without boards in the
+# pool and a default fleet too big to place inside a request is rejected
+# REFILL_INTERVAL: seconds between two refills of the pool worker
+# THREAD: run the pool worker as a thread of the web process instead of the fill_board_pool command
+
+BATTLESHIP_BOARD_POOL = {
+    'SIZE': int(os.environ.get('BOARD_POOL_SIZE', 0)),
+    # BOARD_POOL_GRID_SIZES e.g. "500:4,1000:2"
+    'GRID_SIZES': {int(grid_size): int(count) for grid_size, count in
+                   (item.split(':') for item in os.environ.get('BOARD_POOL_GRID_SIZES', '').split(',') if item)},
+    'REFILL_INTERVAL': 1.0,
+    'THREAD': False,
+}
+
+# In-memory store of the games in progress, checkpointed to the database, see battleship_game/store.py
+# ENABLED: attacks change the games in memory instead of saving them, requests on a game must reach the same process
+# FLUSH_INTERVAL: seconds between two checkpoints of the changed games, the attacks a crash may lose
+# IDLE_TIMEOUT: seconds after which an unchanged game leaves the store
+
+BATTLESHIP_GAME_STORE = {
+    'ENABLED': os.environ.get('GAME_STORE', '') == 'memory',
+    'FLUSH_INTERVAL': 0.2,
+    'IDLE_TIMEOUT': 300,
+}
+
+# Cache of the serialized games read by GET games/<id>/, see battleship_game/cache.py
+# ALIAS: Django cache holding the games (a shared one with several web processes), None disables the cache
+# TIMEOUT: seconds a game stays cached after it was last stored
+
+BATTLESHIP_GAME_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+# Events of the games served by games/<id>/events/, see battleship_game/events.py
+# BROKER: dotted path of the event broker class, the local one only sees the attacks of its own process
+# OPTIONS: keyword arguments of the broker class
+# POLL_TIMEOUT: seconds a long-poll request waits for an event
+# STREAM_TIMEOUT: seconds an event stream stays open
+
+BATTLESHIP_EVENTS = {
+    'BROKER': 'battleship_game.events.LocalEventBroker',
+    'OPTIONS': {'buffer_size': 100, 'max_games': 10000},
+    'POLL_TIMEOUT': 25,
+    'STREAM_TIMEOUT': 300,
+}
+
+# Shot suggestions served by games/<id>/suggest/, see battleship_game/advisor.py
+# MAX_GAMES: games whose attacker strategy each process keeps up to date, its memory grows with the board area
+
+BATTLESHIP_ADVISOR = {
+    'MAX_GAMES': 1000,
+}
+
+# Matchmaking queue of the two player games served by matchmaking/, see battleship_game/matchmaking.py
+# BATCH_SIZE: waiting tickets paired by a pass at most
+# PAIR_INTERVAL: seconds between two pairing passes, of the polls of a process or of the matchmaker
+# THREAD: run the matchmaker as a thread of the web process, instead of the matchmaker management command
+# TICKET_TIMEOUT: seconds a ticket stays in the queue, waiting or paired
+# STATS_WINDOW: seconds of enqueued tickets behind the wait time percentiles of matchmaking/stats/
+
+BATTLESHIP_MATCHMAKING = {
+    'BATCH_SIZE': 1000,
+    'PAIR_INTERVAL': 0.1,
+    'THREAD': False,
+    'TICKET_TIMEOUT': 600,
+    'STATS_WINDOW': 300,
+}
+
+# Request metrics served by /metrics in the Prometheus text format, see battleship_game/metrics.py
+# ENABLED: time the requests and their phases and count their queries, in each process
+# SERVER_TIMING: send the phases of each request in a Server-Timing header
+
+BATTLESHIP_METRICS = {
+    'ENABLED': os.environ.get('METRICS', '') == 'on',
+    'SERVER_TIMING': os.environ.get('METRICS_SERVER_TIMING', '') == 'on',
+}
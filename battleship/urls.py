@@ -17,8 +17,10 @@ from django.contrib import admin
 from django.urls import path, include
 
 from battleship_game.urls import router as game_router
+from battleship_game.views import metrics_view
 
 urlpatterns = [
     path('', include(game_router.urls)),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -0,0 +1,117 @@
+"""
+Shot suggestions of the computer attacker, served by the games/<id>/suggest/ endpoint.
+A game's suggestions come from a DensityStrategy (see battleship_game/strategies.py) fed only what the game shows of
+the attacked board: the opened cells and the fleet; in a two player game each player has a strategy. Each process
+keeps the strategies of the last games asked, up to the MAX_GAMES of the BATTLESHIP_ADVISOR setting, and the
+advice_updated receiver of the game_attacked signal updates them with the cells changed by every attack, so that a
+suggestion does not go over every ship placement again. A strategy that missed an attack, made by another process,
+is rebuilt from the board.
+"""
+import random
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from battleship_game import cache
+from battleship_game.strategies import DensityStrategy
+
+DEFAULTS = {
+    # games whose strategy is kept, the least recently asked is dropped first
+    'MAX_GAMES': 1000,
+}
+
+
+def advisor_settings():
+    return dict(DEFAULTS, **getattr(settings, 'BATTLESHIP_ADVISOR', {}))
+
+
+class GameAdvisor:
+    """
+    Density strategy of a player of a game, kept in step with the board the player attacks
+    """
+
+    def __init__(self, game, player=None):
+        """
+        :param game: the game
+        :param player: player of a two player game
+        """
+        board = game.target_grid(player)
+        self.lock = threading.Lock()
+        # cells opened so far, compared with the board version to tell whether the strategy is up to date
+        self.version = 0
+        self.strategy = DensityStrategy(board.size, [ship.size for ship in board.fleet], random.Random(game.pk))
+        self.update([(index // board.size, index % board.size, board.cell(index))
+                     for index in sorted(set(board.misses) | set(board.hits) | set(board.killed))])
+
+    def update(self, changes):
+        """
+        Take the cells changed by attacks into account
+        :param changes: (row, column, GameCell value) of the changed cells
+        """
+        opened = self.strategy.opened
+        size = self.strategy.grid_size
+        self.version += sum(1 for row, column, _ in changes if not opened[row * size + column])
+        self.strategy.record(None, changes)
+
+    def suggest(self):
+        """
+        :return: (row, column) of the suggested shot
+        """
+        return self.strategy.next_shot()
+
+
+_lock = threading.Lock()
+# (game id, player) -> GameAdvisor, least recently asked first
+_advisors = OrderedDict()
+
+
+def suggest_shot(game, player=None):
+    """
+    Next shot suggested for a game in progress
+    :param game: the game, to be locked by the caller while it is attacked concurrently
+    :param player: player of a two player game
+    :return: (row, column)
+    """
+    if not game.two_player:
+        player = None
+    key = game.pk, player
+    with _lock:
+        advisor = _advisors.get(key)
+        if advisor is not None:
+            _advisors.move_to_end(key)
+
+    if advisor is None or advisor.version != cache.board_version(game.target_grid(player)):
+        advisor = GameAdvisor(game, player)
+        with _lock:
+            _advisors[key] = advisor
+            while len(_advisors) > advisor_settings()['MAX_GAMES']:
+                _advisors.popitem(last=False)
+
+    with advisor.lock:
+        return advisor.suggest()
+
+
+def clear():
+    with _lock:
+        _advisors.clear()
+
+
+def advice_updated(sender, response, **kwargs):
+    """
+    game_attacked receiver updating the strategy of the attacked game, dropped when it did not see every attack
+    """
+    game = response.game
+    key = game.pk, response.player
+    with _lock:
+        advisor = _advisors.get(key)
+    if advisor is None:
+        return
+
+    with advisor.lock:
+        advisor.update(response.changes)
+        up_to_date = advisor.version == cache.board_version(game.target_grid(response.player))
+    if not up_to_date:
+        with _lock:
+            if _advisors.get(key) is advisor:
+                del _advisors[key]
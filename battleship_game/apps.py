@@ -3,3 +3,30 @@ from django.apps import AppConfig
 
 class BattleshipGameConfig(AppConfig):
     name = 'battleship_game'
+
+    def ready(self):
+        import atexit
+
+        from django.db.models.signals import post_save
+
+        from battleship_game import advisor, matchmaking, pool, cache, events, store
+        from battleship_game.models import Game
+        from battleship_game.signals import game_attacked
+
+        post_save.connect(cache.game_saved, sender=Game, dispatch_uid='battleship_game.cache.game_saved')
+        game_attacked.connect(events.attack_published, sender=Game,
+                              dispatch_uid='battleship_game.events.attack_published')
+        game_attacked.connect(advisor.advice_updated, sender=Game,
+                              dispatch_uid='battleship_game.advisor.advice_updated')
+
+        config = pool.pool_settings()
+        if config['SIZE'] and config['THREAD']:
+            pool.PoolWorker().start()
+
+        if matchmaking.matchmaking_settings()['THREAD']:
+            matchmaking.Matchmaker().start()
+
+        if store.store_enabled():
+            store.GameFlusher().start()
+            # a stopped process checkpoints its games, only a crash loses their last attacks
+            atexit.register(store.game_store.flush)
@@ -0,0 +1,487 @@
+"""
+Micro benchmarks of the game hot paths, run by the ``benchmark`` management command or by pytest-benchmark through
+battleship_game/tests/bench_benchmarks.py.
+Benchmarks writing to the database run in a transaction that is rolled back.
+"""
+import random
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache, partial
+
+from django.db import transaction, connection
+from django.test import override_settings
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory, APIClient
+
+from battleship_game import advisor, matchmaking
+from battleship_game.engine import Board
+from battleship_game.factories import create_random_game, create_random_games, create_random_board, \
+    proportional_fleet, BULK_CREATE_BATCH_SIZE
+from battleship_game.enums import GameStatus, GameCell
+from battleship_game.models import Game, AttackCellResponse, MatchTicket
+from battleship_game.serializers import GameSerializer, AttackResponseSerializer, GameCellField, GRID_FORMATS, \
+    AttackDeltaResponseSerializer
+
+# board sizes of the engine benchmarks, each with the standard fleet scaled to the board
+GRID_SIZES = (10, 100, 1000)
+
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(name):
+    """
+    Register a benchmark function. It returns the result of measure()
+    """
+    def register(function):
+        BENCHMARKS[name] = function
+        return function
+
+    return register
+
+
+def perf_counter_timer(function):
+    """
+    Default timer of measure(): call function once and return the elapsed seconds
+    """
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+_timers = [perf_counter_timer]
+
+
+@contextmanager
+def timed_with(timer):
+    """
+    Time the calls of measure() with another timer, e.g. the benchmark fixture of pytest-benchmark
+    :param timer: function calling its argument once and returning the elapsed seconds
+    """
+    _timers.append(timer)
+    try:
+        yield
+    finally:
+        _timers.pop()
+
+
+def measure(operations, function):
+    """
+    Time a single call of function, performing the given number of operations
+    :return: dict with the number of operations, the elapsed seconds and the operations per second
+    """
+    seconds = _timers[-1](function)
+
+    return OrderedDict([
+        ('operations', operations),
+        ('seconds', seconds),
+        ('per_second', operations / seconds if seconds else float('inf')),
+    ])
+
+
+@contextmanager
+def rolled_back():
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+@benchmark('generate_boards')
+def bench_generate_boards(count=5000):
+    return measure(count, lambda: [create_random_board() for _ in range(count)])
+
+
+@benchmark('create_games_one_by_one')
+def bench_create_games_one_by_one(count=1000):
+    with rolled_back():
+        return measure(count, lambda: [create_random_game() for _ in range(count)])
+
+
+@benchmark('create_games_bulk')
+def bench_create_games_bulk(count=1000):
+    with rolled_back():
+        return measure(count, lambda: create_random_games(count))
+
+
+class _NestedListGameSerializer(GameSerializer):
+    """
+    GameSerializer with the per cell grid field it used to have, as a baseline
+    """
+    opponentGrid = serializers.ListField(child=serializers.ListField(child=GameCellField()), source='opponent_grid',
+                                         read_only=True)
+
+
+def _played_game():
+    game = Game(id=1, opponent_grid=_fresh_board(Game.GRID_SIZE))
+    for row, column in [(0, 0), (3, 3), (5, 7), (9, 9)]:
+        game.opponent_grid.attack(row, column)
+
+    return game
+
+
+@benchmark('serialize_game_retrieve')
+def bench_serialize_game_retrieve(count=5000):
+    game = _played_game()
+    return measure(count, lambda: [GameSerializer(game).data for _ in range(count)])
+
+
+@benchmark('serialize_game_retrieve_nested_lists')
+def bench_serialize_game_retrieve_nested_lists(count=5000):
+    game = _played_game()
+    return measure(count, lambda: [_NestedListGameSerializer(game).data for _ in range(count)])
+
+
+@benchmark('serialize_attack_cell')
+def bench_serialize_attack_cell(count=5000):
+    game = _played_game()
+    response = AttackCellResponse(game.opponent_grid.attack(4, 4).attack_status, game)
+    return measure(count, lambda: [AttackResponseSerializer(response).data for _ in range(count)])
+
+
+@benchmark('serialize_attack_cell_delta')
+def bench_serialize_attack_cell_delta(count=5000):
+    game = _played_game()
+    attack_status, changed = game.opponent_grid.attack(4, 4)
+    changes = [(row, column, game.opponent_grid[row][column]) for row, column in changed]
+    response = AttackCellResponse(attack_status, game, changes)
+    return measure(count, lambda: [AttackDeltaResponseSerializer(response).data for _ in range(count)])
+
+
+def bench_render_game(grid_format, count=5000):
+    game = _played_game()
+    renderer = JSONRenderer()
+    return measure(count, lambda: [renderer.render(GameSerializer(game, context={'grid_format': grid_format}).data)
+                                   for _ in range(count)])
+
+
+for _grid_format in GRID_FORMATS:
+    benchmark('render_game_' + _grid_format)(partial(bench_render_game, _grid_format))
+
+
+@benchmark('list_games_pages')
+def bench_list_games_pages(table_size=200000, pages=500):
+    """
+    Walk the list of the finished games page after page through a large table, half of the games being finished.
+    The last pages cost as much as the first ones
+    """
+    from battleship_game.views import GameViewSet
+
+    board = create_random_board()
+    statuses = [GameStatus.IN_PROGRESS.value, GameStatus.FINISHED.value]
+    list_view = GameViewSet.as_view({'get': 'list'})
+    factory = APIRequestFactory()
+
+    def walk():
+        url = '/games/?status={}'.format(GameStatus.FINISHED.value)
+        for _ in range(pages):
+            url = list_view(factory.get(url, HTTP_HOST='localhost')).data['next']
+
+    with rolled_back(), override_settings(ALLOWED_HOSTS=['localhost']):
+        for start in range(0, table_size, BULK_CREATE_BATCH_SIZE):
+            Game.objects.bulk_create([Game(opponent_grid=board, game_status=statuses[index % 2])
+                                      for index in range(start, min(start + BULK_CREATE_BATCH_SIZE, table_size))])
+        # the planner statistics of a table that size, as autovacuum would gather them
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE {}'.format(Game._meta.db_table))
+
+        return measure(pages, walk)
+
+
+def bench_retrieve_game(cache_alias, count=2000):
+    """
+    Poll a game through the detail view, with the game cache on the given cache alias (None disables the cache)
+    """
+    from battleship_game.views import GameViewSet
+
+    detail_view = GameViewSet.as_view({'get': 'retrieve'})
+    factory = APIRequestFactory()
+
+    with rolled_back(), override_settings(BATTLESHIP_GAME_CACHE={'ALIAS': cache_alias}):
+        game = create_random_game()
+        url = '/games/{}/'.format(game.pk)
+        return measure(count, lambda: [detail_view(factory.get(url), pk=str(game.pk)) for _ in range(count)])
+
+
+benchmark('retrieve_game_cached')(partial(bench_retrieve_game, 'default'))
+benchmark('retrieve_game_uncached')(partial(bench_retrieve_game, None))
+
+
+def bench_attack_game(stored, count=2000):
+    """
+    Play games through the attack view, in the in-memory game store or saving every attack
+    """
+    from battleship_game.store import game_store
+    from battleship_game.views import GameViewSet
+
+    attack_view = GameViewSet.as_view({'post': 'attack_cell'})
+    factory = APIRequestFactory()
+    cells = [divmod(index, Game.GRID_SIZE) for index in range(Game.GRID_SIZE ** 2)]
+
+    def play(games):
+        for shot in range(count):
+            game = games[shot // len(cells)]
+            row, column = cells[shot % len(cells)]
+            request = factory.post('/games/{}/attack/'.format(game.pk), {'row': row, 'column': column}, format='json')
+            attack_view(request, pk=str(game.pk))
+
+    with rolled_back(), override_settings(BATTLESHIP_GAME_STORE={'ENABLED': stored}):
+        games = create_random_games(count // len(cells) + 1)
+        try:
+            return measure(count, lambda: play(games))
+        finally:
+            game_store.clear()
+
+
+benchmark('attack_game_stored')(partial(bench_attack_game, True))
+benchmark('attack_game_saved')(partial(bench_attack_game, False))
+
+
+@lru_cache(maxsize=None)
+def _packed_board(grid_size):
+    return create_random_board(random.Random(grid_size), grid_size=grid_size).to_bytes()
+
+
+def _fresh_board(grid_size):
+    """
+    Untouched copy of the benchmark board of the given size
+    """
+    return Board.from_bytes(_packed_board(grid_size))
+
+
+def bench_place_fleet(grid_size):
+    ships = proportional_fleet(grid_size)
+    count = max(1000 // len(ships), 1)
+    return measure(count * len(ships), lambda: [create_random_board(grid_size=grid_size) for _ in range(count)])
+
+
+def bench_attack(grid_size, count=20000):
+    board = _fresh_board(grid_size)
+    rng = random.Random(0)
+    cells = [(rng.randrange(grid_size), rng.randrange(grid_size)) for _ in range(count)]
+    return measure(count, lambda: [board.attack(row, column) for row, column in cells])
+
+
+def bench_attack_packed(grid_size, count=2000):
+    """
+    Attacks as a request runs them: the board is unpacked, attacked and packed again
+    """
+    packed = [_packed_board(grid_size)]
+    rng = random.Random(0)
+    cells = [(rng.randrange(grid_size), rng.randrange(grid_size)) for _ in range(count)]
+
+    def attack(row, column):
+        board = Board.from_bytes(packed[0])
+        board.attack(row, column)
+        packed[0] = board.to_bytes()
+
+    return measure(count, lambda: [attack(row, column) for row, column in cells])
+
+
+def bench_kill_fleet(grid_size):
+    board = _fresh_board(grid_size)
+    cells = [cell for ship in board.fleet for cell in ship.cells()]
+    return measure(len(cells), lambda: [board.attack(row, column) for row, column in cells])
+
+
+# the operations are ships placed and shots fired: their rate should not drop as the board grows
+for _grid_size in GRID_SIZES:
+    _name = '{}x{}'.format(_grid_size, _grid_size)
+    benchmark('place_fleet_' + _name)(partial(bench_place_fleet, _grid_size))
+    benchmark('attack_' + _name)(partial(bench_attack, _grid_size))
+    benchmark('attack_packed_' + _name)(partial(bench_attack_packed, _grid_size))
+    benchmark('kill_fleet_' + _name)(partial(bench_kill_fleet, _grid_size))
+
+
+def _advised_game(grid_size, shots):
+    """
+    Game on the benchmark board of the given size, with its advisor after the first shots it suggested
+    :return: (Game, GameAdvisor)
+    """
+    game = Game(pk=grid_size, opponent_grid=_fresh_board(grid_size))
+    game_advisor = advisor.GameAdvisor(game)
+    _advised_shots(game, game_advisor, shots)
+    return game, game_advisor
+
+
+def _advised_shots(game, game_advisor, shots):
+    """
+    Shoot the suggested cells until the game is won, updating the advisor as the game_attacked receiver does
+    :return: number of shots fired
+    """
+    board = game.opponent_grid
+    for shot in range(shots):
+        if not board.ship_cells_left:
+            return shot
+        row, column = game_advisor.suggest()
+        _, changed = board.attack(row, column)
+        game_advisor.update([(row, column, board.cell(row * board.size + column)) for row, column in changed])
+
+    return shots
+
+
+def bench_suggest_shot(grid_size, count=2000):
+    """
+    Suggested shots, each followed by the update of the advisor with its result. Games are played through to the
+    end, one after the other
+    """
+    # a game takes at least a shot per ship cell
+    games = [_advised_game(grid_size, 0) for _ in range(count // sum(proportional_fleet(grid_size)) + 1)]
+
+    def play():
+        left = count
+        for game, game_advisor in games:
+            left -= _advised_shots(game, game_advisor, left)
+
+    return measure(count, play)
+
+
+def bench_suggest_rebuild(grid_size, count=20):
+    """
+    Advisors built from the board of a game after up to 500 suggested shots, as for the first suggestion a process
+    is asked
+    """
+    game, _ = _advised_game(grid_size, 500)
+    return measure(count, lambda: [advisor.GameAdvisor(game) for _ in range(count)])
+
+
+# the operations are shots suggested and advisors built
+for _grid_size in GRID_SIZES:
+    _name = '{}x{}'.format(_grid_size, _grid_size)
+    benchmark('suggest_shot_' + _name)(partial(bench_suggest_shot, _grid_size))
+    benchmark('suggest_rebuild_' + _name)(partial(bench_suggest_rebuild, _grid_size))
+
+
+def _ship_cells(board):
+    return [list(ship.cells()) for ship in board.fleet]
+
+
+@benchmark('shot_miss')
+def bench_shot_miss(boards=250):
+    """
+    Shots on the water of untouched standard boards
+    """
+    size = Game.GRID_SIZE
+    water = _fresh_board(size)
+    cells = [divmod(index, size) for index in range(size * size) if water.cell(index) == GameCell.EMPTY.value]
+    shots = [(board, row, column) for board in [_fresh_board(size) for _ in range(boards)] for row, column in cells]
+    return measure(len(shots), lambda: [board.attack(row, column) for board, row, column in shots])
+
+
+@benchmark('shot_injure')
+def bench_shot_injure(boards=2000):
+    """
+    First shots on the ships longer than a cell of untouched standard boards
+    """
+    cells = [ship_cells[0] for ship_cells in _ship_cells(_fresh_board(Game.GRID_SIZE)) if len(ship_cells) > 1]
+    shots = [(board, row, column) for board in [_fresh_board(Game.GRID_SIZE) for _ in range(boards)]
+             for row, column in cells]
+    return measure(len(shots), lambda: [board.attack(row, column) for board, row, column in shots])
+
+
+@benchmark('shot_kill')
+def bench_shot_kill(boards=2000):
+    """
+    Last shots on the ships of standard boards, the other cells of the ships being injured
+    """
+    ships = _ship_cells(_fresh_board(Game.GRID_SIZE))
+    shots = []
+    for _ in range(boards):
+        board = _fresh_board(Game.GRID_SIZE)
+        for ship_cells in ships:
+            for row, column in ship_cells[:-1]:
+                board.attack(row, column)
+            shots.append((board,) + ship_cells[-1])
+
+    return measure(len(shots), lambda: [board.attack(row, column) for board, row, column in shots])
+
+
+@benchmark('play_games')
+def bench_play_games(count=500):
+    """
+    Whole standard games, shooting the cells in a random order until the fleet is killed
+    """
+    size = Game.GRID_SIZE
+    rng = random.Random(0)
+    games = []
+    for _ in range(count):
+        cells = [divmod(index, size) for index in range(size * size)]
+        rng.shuffle(cells)
+        games.append((_fresh_board(size), cells))
+
+    def play():
+        for board, cells in games:
+            for row, column in cells:
+                board.attack(row, column)
+                if not board.ship_cells_left:
+                    break
+
+    return measure(count, play)
+
+
+@contextmanager
+def _api_requests():
+    """
+    Client of the API requests of a benchmark, from a host allowed whether the test environment is set up or not
+    """
+    with rolled_back(), override_settings(ALLOWED_HOSTS=['localhost']):
+        yield APIClient(HTTP_HOST='localhost')
+
+
+@benchmark('api_create_game')
+def bench_api_create_game(count=500):
+    with _api_requests() as client:
+        return measure(count, lambda: [client.post(reverse('game-list')) for _ in range(count)])
+
+
+@benchmark('api_list_games')
+def bench_api_list_games(count=500):
+    with _api_requests() as client:
+        create_random_games(100)
+        return measure(count, lambda: [client.get(reverse('game-list')) for _ in range(count)])
+
+
+@benchmark('api_retrieve_game')
+def bench_api_retrieve_game(count=2000):
+    with _api_requests() as client:
+        url = reverse('game-detail', args=[create_random_game().pk])
+        return measure(count, lambda: [client.get(url) for _ in range(count)])
+
+
+@benchmark('api_attack_cell')
+def bench_api_attack_cell(count=1000):
+    """
+    Play standard games through the attack endpoint, shooting the cells in order
+    """
+    cells = [divmod(index, Game.GRID_SIZE) for index in range(Game.GRID_SIZE ** 2)]
+
+    def play(client, games):
+        for shot in range(count):
+            row, column = cells[shot % len(cells)]
+            client.post(reverse('game-attack', args=[games[shot // len(cells)].pk]), {'row': row, 'column': column},
+                        format='json')
+
+    with _api_requests() as client:
+        games = create_random_games(count // len(cells) + 1)
+        return measure(count, lambda: play(client, games))
+
+
+@benchmark('api_enqueue')
+def bench_api_enqueue(count=2000):
+    with _api_requests() as client:
+        return measure(count, lambda: [client.post(reverse('matchticket-list')) for _ in range(count)])
+
+
+@benchmark('pair_tickets')
+def bench_pair_tickets(count=2000):
+    """
+    Pair waiting tickets into two player games, in passes of the configured batch size
+    """
+    def pair():
+        while matchmaking.pair_waiting():
+            pass
+
+    with rolled_back():
+        MatchTicket.objects.bulk_create([MatchTicket() for _ in range(count)], batch_size=BULK_CREATE_BATCH_SIZE)
+        return measure(count, pair)
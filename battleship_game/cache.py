@@ -0,0 +1,137 @@
+"""
+Cache of the serialized games, so that the clients polling a game are answered without a database query.
+Entries are read through by GameViewSet.retrieve and written through when a game is saved, once its transaction
+commits. The entries live in the Django cache named by the BATTLESHIP_GAME_CACHE setting, the default (locmem) one
+unless configured; with several web processes it must be a shared cache (memcached, redis) for the processes to see
+each other's writes.
+"""
+import hashlib
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from battleship_game.serializers import GameSerializer, GRID_FORMATS, GRID_CELLS
+
+DEFAULTS = {
+    # alias of the Django cache holding the games, None disables the cache
+    'ALIAS': 'default',
+    # seconds a game stays cached after it was last stored
+    'TIMEOUT': 300,
+}
+
+# etag: entity tag of the representation, version: see game_version, data: serialized game
+CachedGame = namedtuple('CachedGame', ('etag', 'version', 'data'))
+
+
+def cache_settings():
+    return dict(DEFAULTS, **getattr(settings, 'BATTLESHIP_GAME_CACHE', {}))
+
+
+def cache_key(game_id, grid_format):
+    return 'battleship:game:{}:{}'.format(game_id, grid_format)
+
+
+def version_key(game_id):
+    """
+    Key of the version of the game last written through
+    """
+    return 'battleship:game:{}:version'.format(game_id)
+
+
+def game_version(game):
+    """
+    Number of opened cells of the game: every valid attack opens cells, so a later state of a game has a higher version
+    """
+    version = board_version(game.opponent_grid)
+    if game.player_grid is not None:
+        version += board_version(game.player_grid)
+
+    return version
+
+
+def board_version(board):
+    """
+    Number of opened cells of a board
+    """
+    return len(board.misses) + len(board.hits) + len(board.killed)
+
+
+def game_etag(game, grid_format, player=None):
+    """
+    Entity tag of a representation of a game, seen by a player of a two player game or by the spectators
+    """
+    digest = hashlib.sha1(game.opponent_grid.to_bytes())
+    if game.player_grid is not None:
+        digest.update(game.player_grid.to_bytes())
+    digest.update('{}:{}:{}:{}'.format(game.game_status, game.turn, grid_format, player).encode('ascii'))
+    return '"{}"'.format(digest.hexdigest())
+
+
+def get_game(game_id, grid_format):
+    """
+    Cached representation of a game
+    :return: CachedGame or None when the game is not cached
+    """
+    config = cache_settings()
+    if config['ALIAS'] is None:
+        return None
+
+    return caches[config['ALIAS']].get(cache_key(game_id, grid_format))
+
+
+def put_game(game, grid_format, data, replace=True):
+    """
+    Cache a representation of a game.
+    A cached later version of the game is never replaced. Reads do not replace an entry at all (replace=False):
+    the game may have been read before an attack that is already cached was committed. Nor do they keep an entry
+    older than the version last written through, whose write may have dropped the entries before this one was added
+    :param game: the game
+    :param grid_format: grid format of the representation
+    :param data: serialized game
+    :param replace: whether to replace an entry of the same or an earlier version
+    :return: CachedGame, cached or not
+    """
+    config = cache_settings()
+    entry = CachedGame(game_etag(game, grid_format), game_version(game), dict(data))
+    if config['ALIAS'] is None:
+        return entry
+
+    cache = caches[config['ALIAS']]
+    key = cache_key(game.pk, grid_format)
+    if not replace:
+        if cache.add(key, entry, config['TIMEOUT']):
+            # a later write through stores its version before dropping the entries: it drops this one or is seen here
+            written_version = cache.get(version_key(game.pk))
+            if written_version is not None and written_version > entry.version:
+                cache.delete(key)
+        return entry
+
+    cached = cache.get(key)
+    if cached is None or cached.version <= entry.version:
+        cache.set(key, entry, config['TIMEOUT'])
+
+    return entry
+
+
+def write_through(game):
+    """
+    Cache the default representation of a saved game and drop the other ones. The version of the game is stored
+    first, so that a read of an earlier version adding its entry after the drop takes it out again
+    """
+    config = cache_settings()
+    if config['ALIAS'] is None:
+        return
+
+    cache = caches[config['ALIAS']]
+    cache.set(version_key(game.pk), game_version(game), config['TIMEOUT'])
+    put_game(game, GRID_CELLS, GameSerializer(game, context={'grid_format': GRID_CELLS}).data)
+    cache.delete_many([cache_key(game.pk, grid_format) for grid_format in GRID_FORMATS if grid_format != GRID_CELLS])
+
+
+def game_saved(sender, instance, **kwargs):
+    """
+    post_save receiver writing the saved game through once its transaction commits
+    """
+    transaction.on_commit(lambda: write_through(instance))
@@ -0,0 +1,536 @@
+import struct
+from collections import namedtuple
+from functools import lru_cache
+
+from battleship_game.enums import AttackStatus, GameCell
+
+BoardAttack = namedtuple('BoardAttack', ('attack_status', 'changed'))
+
+# packed layout: format version, board size, ships left, ship cells left and number of ships,
+# then one record per registered ship followed by the ships, hits, misses and killed masks
+_HEADER = struct.Struct('>BHIII')
+# ship record: index of the first cell, size, runs down the rows, hits taken; the records are sorted by first cell
+_SHIP = struct.Struct('>IHBH')
+_SHIP_START = struct.Struct('>I')
+_FORMAT_VERSION = 3
+# older formats have no ship registry (and version 1 no counters); what is missing is rebuilt from the masks
+_LEGACY_HEADERS = {1: struct.Struct('>BH'), 2: struct.Struct('>BHII')}
+
+_CORNER_OFFSETS = ((1, 1), (-1, -1), (1, -1), (-1, 1))
+_SIDE_OFFSETS = ((0, 1), (0, -1), (1, 0), (-1, 0))
+_NEIGHBOUR_OFFSETS = _CORNER_OFFSETS + _SIDE_OFFSETS
+
+
+class Bitset:
+    """
+    Mutable set of cell indexes backed by a bit string, bit ``index`` being bit ``index % 8`` of byte ``index // 8``.
+    Single cell reads and writes cost the same on any board size, unlike shifts of one big integer.
+    """
+    __slots__ = ('bits',)
+
+    def __init__(self, length, bits=None):
+        self.bits = bytearray((length + 7) // 8) if bits is None else bytearray(bits)
+
+    def __contains__(self, index):
+        return self.bits[index >> 3] >> (index & 7) & 1
+
+    def add(self, index):
+        self.bits[index >> 3] |= 1 << (index & 7)
+
+    def discard(self, index):
+        self.bits[index >> 3] &= 0xFF ^ (1 << (index & 7))
+
+    def __iter__(self):
+        """
+        Iterate the indexes in the set, lowest first
+        """
+        for byte_index, byte in enumerate(self.bits):
+            if byte:
+                for bit in range(8):
+                    if byte >> bit & 1:
+                        yield byte_index * 8 + bit
+
+    def __len__(self):
+        return bin(int.from_bytes(self.bits, 'little')).count('1')
+
+    def __bool__(self):
+        return any(self.bits)
+
+    def __eq__(self, other):
+        if not isinstance(other, Bitset):
+            return NotImplemented
+
+        return self.bits == other.bits
+
+    def to_bytes(self):
+        return bytes(self.bits)
+
+
+class Ship:
+    """
+    Registry entry of a ship placed on a board, its id being its position in the registry.
+    The orientation follows the factories: 'row' ships run down the rows, 'col' ships along the columns.
+    """
+    __slots__ = ('id', 'row', 'column', 'size', 'orientation', 'hits')
+
+    def __init__(self, ship_id, row, column, size, orientation, hits=0):
+        self.id = ship_id
+        self.row = row
+        self.column = column
+        self.size = size
+        self.orientation = orientation
+        self.hits = hits
+
+    @property
+    def killed(self):
+        return self.hits >= self.size
+
+    def cells(self):
+        row_increment = 1 if self.orientation == 'row' else 0
+        column_increment = 1 if self.orientation == 'col' else 0
+
+        for offset in range(self.size):
+            yield (self.row + offset * row_increment, self.column + offset * column_increment)
+
+
+class Board:
+    """
+    Bitboard representation of a square game grid.
+    Every cell state is a Bitset where index ``row * size + column`` stands for the cell.
+    The sets are disjoint; a cell in none of them is EMPTY.
+    Alongside the sets the board keeps a registry of its ships, packed ship records sorted by first cell, so an attack
+    finds its ship by bisecting the records and updates the one record in place: it costs the same whatever the size
+    of the board and of its fleet.
+    """
+
+    def __init__(self, size, ships=None, hits=None, misses=None, killed=None, records=None, ships_left=None,
+                 ship_cells_left=None):
+        self.size = size
+        self.ships = Bitset(size * size) if ships is None else ships
+        self.hits = Bitset(size * size) if hits is None else hits
+        self.misses = Bitset(size * size) if misses is None else misses
+        self.killed = Bitset(size * size) if killed is None else killed
+
+        # the registry is None after cell by cell edits and is rebuilt from the sets on demand
+        if records is None:
+            self._records = None if self.ships or self.hits or self.killed else bytearray()
+        else:
+            self._records = bytearray(records)
+        # ships placed since the registry was last sorted
+        self._placed = []
+
+        # counters kept up to date by every board change; ships_left is None until recounted
+        self._ships_left = ships_left
+        self.ship_cells_left = len(self.ships) if ship_cells_left is None else ship_cells_left
+
+    @classmethod
+    def from_grid(cls, grid):
+        """
+        Build a board from a list grid of GameCell values
+        :param grid: square list of lists of cell values
+        :return: Board
+        """
+        size = len(grid)
+        cell_sets = {value: Bitset(size * size) for value in _CELL_MASKS}
+        index = 0
+        for grid_row in grid:
+            for value in grid_row:
+                if value in cell_sets:
+                    cell_sets[value].add(index)
+                index += 1
+
+        return cls(size, **{_CELL_MASKS[value]: cells for value, cells in cell_sets.items()})
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Unpack a board packed by to_bytes
+        :param data: bytes-like packed board
+        :return: Board
+        """
+        data = bytes(data)
+        version = data[0]
+        if version == _FORMAT_VERSION:
+            _, size, ships_left, ship_cells_left, fleet_length = _HEADER.unpack_from(data)
+            offset = _HEADER.size + fleet_length * _SHIP.size
+            records = data[_HEADER.size:offset]
+        elif version in _LEGACY_HEADERS:
+            header = _LEGACY_HEADERS[version].unpack_from(data)
+            size = header[1]
+            ships_left, ship_cells_left = header[2:] if version == 2 else (None, None)
+            records = None
+            offset = _LEGACY_HEADERS[version].size
+        else:
+            raise ValueError('Unsupported board format version {}'.format(version))
+
+        mask_length = _mask_length(size)
+        masks = []
+        for _ in _MASK_ORDER:
+            masks.append(Bitset(size * size, data[offset:offset + mask_length]))
+            offset += mask_length
+
+        return cls(size, *masks, records=records, ships_left=ships_left, ship_cells_left=ship_cells_left)
+
+    def to_bytes(self):
+        """
+        Pack the board into a compact binary string
+        """
+        records = self._registry()
+        return b''.join([
+            _HEADER.pack(_FORMAT_VERSION, self.size, self.ships_left, self.ship_cells_left, len(records) // _SHIP.size),
+            records,
+            b''.join(getattr(self, attribute).bits for attribute in _MASK_ORDER),
+        ])
+
+    @property
+    def fleet(self):
+        """
+        Ships of the registry, indexed by ship id, in the order of their first cell
+        """
+        records = self._registry()
+        return [self._unpack_ship(records, position) for position in range(len(records) // _SHIP.size)]
+
+    @property
+    def ships_left(self):
+        """
+        Number of ships with at least one intact cell
+        """
+        if self._ships_left is None:
+            self._ships_left = sum(1 for ship in self.fleet if not ship.killed)
+
+        return self._ships_left
+
+    def ship_at(self, row, column):
+        """
+        Registered ship covering the cell, None for a cell without ship
+        """
+        position = self._find_record(row * self.size + column)
+        return None if position is None else self._unpack_ship(self._registry(), position)
+
+    def place_ship(self, ship_size, orientation, start_row, start_col) -> Ship:
+        """
+        Put a new ship on the board and register it. The ships placed one after the other are sorted into the
+        registry at once, by the next lookup
+        :return: the registered Ship, its id is only known once sorted into the registry
+        """
+        ships_left = self.ships_left
+        ship = Ship(None, start_row, start_col, ship_size, orientation)
+
+        for row, column in ship.cells():
+            index = row * self.size + column
+            self.hits.discard(index)
+            self.misses.discard(index)
+            self.killed.discard(index)
+            if index not in self.ships:
+                self.ships.add(index)
+                self.ship_cells_left += 1
+
+        self._placed.append(ship)
+        self._ships_left = ships_left + 1
+        return ship
+
+    def to_grid(self, hidden=()):
+        """
+        Expand the board into a list grid of GameCell values
+        :param hidden: GameCells shown as EMPTY
+        """
+        text = self.to_text(hidden)
+        return [list(text[start:start + self.size]) for start in range(0, len(text), self.size)]
+
+    def to_text(self, hidden=()):
+        """
+        GameCell values of all the cells, row after row, as a single string.
+        Each cell set is spread to one byte per cell and the sets are summed as big integers, every cell getting a
+        distinct digit; a translation table turns the digits into cell values. It all runs in a few linear passes of
+        C code, with no Python level loop over the cells.
+        :param hidden: GameCells shown as EMPTY
+        :return: string of size * size GameCell values
+        """
+        area = self.size * self.size
+        digits = 0
+        for digit, attribute in enumerate(_MASK_ORDER, 1):
+            bits = format(int.from_bytes(getattr(self, attribute).bits, 'little'), '0{}b'.format(area))
+            digits += digit * int.from_bytes(bits[::-1].encode('ascii').translate(_BINARY_DIGITS), 'big')
+
+        return digits.to_bytes(area, 'big').translate(_digit_table(tuple(hidden))).decode('ascii')
+
+    def cell(self, index):
+        """
+        GameCell value of the cell at the given index
+        """
+        for value, attribute in _CELL_MASKS.items():
+            if index in getattr(self, attribute):
+                return value
+
+        return GameCell.EMPTY.value
+
+    def set_cell(self, index, value):
+        """
+        Overwrite the cell at the given index with a GameCell value
+        """
+        was_ship = index in self.ships
+        for attribute in _MASK_ORDER:
+            getattr(self, attribute).discard(index)
+
+        if value != GameCell.EMPTY.value:
+            getattr(self, _CELL_MASKS[value]).add(index)
+
+        self.ship_cells_left += (value == GameCell.SHIP.value) - was_ship
+        # a single cell may join, split or create ships, so the registry and the ship count are rebuilt on demand
+        self._records = None
+        self._placed = []
+        self._ships_left = None
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, row):
+        if not 0 <= row < self.size:
+            raise IndexError('board row out of range')
+
+        return BoardRow(self, row)
+
+    def __iter__(self):
+        for row in range(self.size):
+            yield BoardRow(self, row)
+
+    def __eq__(self, other):
+        if not isinstance(other, Board):
+            return NotImplemented
+
+        return self.size == other.size and all(
+            getattr(self, attribute) == getattr(other, attribute) for attribute in _MASK_ORDER)
+
+    def attack(self, row, column) -> BoardAttack:
+        """
+        Attack a cell, marking the misses around injured and killed ships.
+        The cost depends on the size of the ship hit, never on the size of the board.
+        :param row: attack row
+        :param column: attack column
+        :return: BoardAttack with the attack status and the list of the (row, column) cells that changed
+        :raise ValueError: when the cell is outside of the board
+        """
+        if not (0 <= row < self.size and 0 <= column < self.size):
+            raise ValueError('Cell at row {} column {} is outside of the board'.format(row, column))
+
+        index = row * self.size + column
+
+        if index in self.misses or index in self.hits or index in self.killed:
+            return BoardAttack(AttackStatus.INVALID, [])
+
+        if index not in self.ships:
+            self.misses.add(index)
+            return BoardAttack(AttackStatus.MISSED, [(row, column)])
+
+        position = self._find_record(index)
+        ship = self._unpack_ship(self._records, position)
+        ship.hits += 1
+        # only the record of the ship hit changes
+        offset = position * _SHIP.size
+        self._records[offset:offset + _SHIP.size] = _pack_ship(ship, self.size)
+        self.ships.discard(index)
+        self.ship_cells_left -= 1
+
+        if not ship.killed:
+            self.hits.add(index)
+            corners = self._mark_missed([(row, column)], _CORNER_OFFSETS)
+            return BoardAttack(AttackStatus.INJURED, [(row, column)] + corners)
+
+        ship_cells = list(ship.cells())
+        for ship_row, ship_column in ship_cells:
+            ship_index = ship_row * self.size + ship_column
+            self.hits.discard(ship_index)
+            self.killed.add(ship_index)
+        self._ships_left = self.ships_left - 1
+        return BoardAttack(AttackStatus.KILLED, ship_cells + self._mark_missed(ship_cells, _NEIGHBOUR_OFFSETS))
+
+    def _registry(self):
+        """
+        Packed records of the registry, rebuilt from the sets after cell by cell edits and with the placed ships
+        sorted in
+        """
+        if self._records is None:
+            # the sets hold the cells of the placed ships too
+            self._records = bytearray(b''.join(_pack_ship(ship, self.size) for ship in self._rebuild_fleet()))
+            self._placed = []
+        if self._placed:
+            records = [self._records[offset:offset + _SHIP.size] for offset in range(0, len(self._records), _SHIP.size)]
+            # big-endian first cells lead the records, so the records sort by first cell
+            records.extend(_pack_ship(ship, self.size) for ship in self._placed)
+            self._records = bytearray(b''.join(sorted(records)))
+            self._placed = []
+
+        return self._records
+
+    def _find_record(self, index):
+        """
+        Position in the registry of the ship covering the cell, None for a cell without ship.
+        A ship along the columns is the last one starting at or before the cell; a ship down the rows starts at the
+        cell or above it, within the occupied cells of the column
+        """
+        records = self._registry()
+        position = _bisect_records(records, index)
+        if position >= 0:
+            start, ship_size, down_rows, _ = _SHIP.unpack_from(records, position * _SHIP.size)
+            if start == index or (not down_rows and index - start < ship_size
+                                  and start // self.size == index // self.size):
+                return position
+
+        row, column = divmod(index, self.size)
+        for offset in range(1, row + 1):
+            if not self._occupied(row - offset, column):
+                break
+
+            start = index - offset * self.size
+            position = _bisect_records(records, start)
+            if position >= 0:
+                record_start, ship_size, down_rows, _ = _SHIP.unpack_from(records, position * _SHIP.size)
+                if record_start == start and down_rows and offset < ship_size:
+                    return position
+
+        return None
+
+    def _unpack_ship(self, records, position):
+        start, ship_size, down_rows, hits = _SHIP.unpack_from(records, position * _SHIP.size)
+        return Ship(position, start // self.size, start % self.size, ship_size, 'row' if down_rows else 'col', hits)
+
+    def _rebuild_fleet(self):
+        """
+        Register the ships found on the sets, each straight line of occupied cells being a ship
+        """
+        unassigned = set(self.ships) | set(self.hits) | set(self.killed)
+        fleet = []
+        for index in sorted(unassigned):
+            if index not in unassigned:
+                continue
+
+            # the lowest cell of a ship is its first one, the ship runs down the rows or along the columns from there
+            row, column = divmod(index, self.size)
+            ship = Ship(len(fleet), row, column, 1, 'row' if self._occupied(row + 1, column) else 'col')
+            while self._occupied(row + ship.size * (ship.orientation == 'row'),
+                                 column + ship.size * (ship.orientation == 'col')):
+                ship.size += 1
+
+            cells = set(ship.cells())
+            for ship_row, ship_column in cells:
+                for row_offset, column_offset in _SIDE_OFFSETS:
+                    neighbour = (ship_row + row_offset, ship_column + column_offset)
+                    if neighbour not in cells and self._occupied(*neighbour):
+                        raise ValueError('Ship at row {} column {} is not a straight line'.format(row, column))
+
+                ship_index = ship_row * self.size + ship_column
+                unassigned.discard(ship_index)
+                ship.hits += ship_index in self.hits or ship_index in self.killed
+            fleet.append(ship)
+
+        return fleet
+
+    def _occupied(self, row, column):
+        """
+        Whether the cell is on the board and holds a ship, intact or not
+        """
+        if not (0 <= row < self.size and 0 <= column < self.size):
+            return False
+
+        index = row * self.size + column
+        return index in self.ships or index in self.hits or index in self.killed
+
+    def _mark_missed(self, cells, offsets):
+        """
+        Mark as missed the empty cells around the given cells
+        :return: list of the (row, column) cells marked
+        """
+        marked = []
+        for row, column in cells:
+            for row_offset, column_offset in offsets:
+                neighbour_row = row + row_offset
+                neighbour_column = column + column_offset
+                if not (0 <= neighbour_row < self.size and 0 <= neighbour_column < self.size):
+                    continue
+
+                index = neighbour_row * self.size + neighbour_column
+                if not (index in self.misses or index in self.ships or index in self.hits or index in self.killed):
+                    self.misses.add(index)
+                    marked.append((neighbour_row, neighbour_column))
+
+        return marked
+
+
+class BoardRow:
+    """
+    List-like view of a board row. Reads and writes go straight to the board cell sets
+    """
+
+    def __init__(self, board, row):
+        self._board = board
+        self._start = row * board.size
+
+    def __len__(self):
+        return self._board.size
+
+    def __getitem__(self, column):
+        return self._board.cell(self._index(column))
+
+    def __setitem__(self, column, value):
+        self._board.set_cell(self._index(column), value)
+
+    def __iter__(self):
+        for index in range(self._start, self._start + self._board.size):
+            yield self._board.cell(index)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def _index(self, column):
+        if not 0 <= column < self._board.size:
+            raise IndexError('board column out of range')
+
+        return self._start + column
+
+
+def _pack_ship(ship, size):
+    return _SHIP.pack(ship.row * size + ship.column, ship.size, ship.orientation == 'row', ship.hits)
+
+
+def _bisect_records(records, index):
+    """
+    Position of the last record of the packed registry starting at or before the cell index, -1 when there is none
+    """
+    low, high = 0, len(records) // _SHIP.size
+    while low < high:
+        middle = (low + high) // 2
+        if _SHIP_START.unpack_from(records, middle * _SHIP.size)[0] <= index:
+            low = middle + 1
+        else:
+            high = middle
+
+    return low - 1
+
+
+def _mask_length(size):
+    return (size * size + 7) // 8
+
+
+_MASK_ORDER = ('ships', 'hits', 'misses', 'killed')
+
+# bytes.translate tables: '0' and '1' characters to 0 and 1 bytes, and cell digits to GameCell values
+_BINARY_DIGITS = bytes.maketrans(b'01', b'\x00\x01')
+
+
+@lru_cache(maxsize=None)
+def _digit_table(hidden):
+    """
+    Table of the digits of Board.to_text: 0 for EMPTY, then the position of the cell set in _MASK_ORDER
+    """
+    values = [GameCell.EMPTY.value] + [value for attribute in _MASK_ORDER for value, cell_set in _CELL_MASKS.items()
+                                       if cell_set == attribute]
+    shown = [GameCell.EMPTY.value if GameCell(value) in hidden else value for value in values]
+    return bytes.maketrans(bytes(range(len(shown))), ''.join(shown).encode('ascii'))
+
+
+_CELL_MASKS = {
+    GameCell.SHIP.value: 'ships',
+    GameCell.INJURED.value: 'hits',
+    GameCell.MISSED.value: 'misses',
+    GameCell.KILLED.value: 'killed',
+}
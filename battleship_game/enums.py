@@ -0,0 +1,44 @@
+from enum import Enum
+
+
+class AttackStatus(Enum):
+    INVALID = 'INVALID'
+    MISSED = 'MISSED'
+    INJURED = 'INJURED'
+    KILLED = 'KILLED'
+
+
+class DBEnum(Enum):
+    @classmethod
+    def choices(cls):
+        return [(c.value, c.value) for c in cls]
+
+
+class GameStatus(DBEnum):
+    IN_PROGRESS = 'IN_PROGRESS'
+    FINISHED = 'FINISHED'
+
+
+class TicketStatus(Enum):
+    WAITING = 'WAITING'
+    MATCHED = 'MATCHED'
+
+
+class GameCell(DBEnum):
+    EMPTY = ' '
+    MISSED = '.'
+    INJURED = 'i'
+    KILLED = 'x'
+    SHIP = 'o'
+
+    @classmethod
+    def opened_cells(cls):
+        return [cls.MISSED, cls.INJURED, cls.KILLED]
+
+    @classmethod
+    def alive_cells(cls):
+        return [cls.SHIP, cls.INJURED]
+
+    @classmethod
+    def hidden_cells(cls):
+        return [cls.SHIP]
@@ -0,0 +1,170 @@
+"""
+Publish/subscribe of the game events, so that watchers of a game wait for its attacks instead of polling it.
+Every committed attack is published by the attack_published receiver of the game_attacked signal, and served by the
+games/<id>/events/ endpoint. The broker is configured by the BATTLESHIP_EVENTS setting; the default LocalEventBroker
+only sees the attacks of its own process, so several web processes need a broker shared between them.
+"""
+import json
+import threading
+import time
+from collections import namedtuple, OrderedDict, deque
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from battleship_game.enums import GameStatus
+from battleship_game.serializers import AttacksDeltaResponseSerializer
+
+DEFAULTS = {
+    # dotted path of the EventBroker class
+    'BROKER': 'battleship_game.events.LocalEventBroker',
+    # keyword arguments of the broker class
+    'OPTIONS': {},
+    # seconds a long-poll request waits for an event
+    'POLL_TIMEOUT': 25,
+    # seconds an event stream stays open
+    'STREAM_TIMEOUT': 300,
+}
+
+# id: sequence number of the event in its game, from 1; data: attack delta, see AttacksDeltaResponseSerializer
+Event = namedtuple('Event', ('id', 'data'))
+
+
+def events_settings():
+    return dict(DEFAULTS, **getattr(settings, 'BATTLESHIP_EVENTS', {}))
+
+
+class EventBroker:
+    """
+    Interface of the event brokers
+    """
+
+    def publish(self, game_id, data):
+        """
+        Publish an event of a game
+        :return: the published Event
+        """
+        raise NotImplementedError
+
+    def last_event_id(self, game_id):
+        """
+        Id of the last event published for a game, 0 when there is none
+        """
+        raise NotImplementedError
+
+    def wait(self, game_id, after, timeout):
+        """
+        Events of a game published after the given event id, waiting up to timeout seconds for one
+        :return: list of Event, empty when none came in time
+        """
+        raise NotImplementedError
+
+
+class LocalEventBroker(EventBroker):
+    """
+    In-process broker keeping the last buffer_size events of each game, for the max_games last published games
+    """
+
+    def __init__(self, buffer_size=100, max_games=10000):
+        self.buffer_size = buffer_size
+        self.max_games = max_games
+        self._lock = threading.Lock()
+        # game id -> (last event id, events, condition notified on publish), least recently published first
+        self._games = OrderedDict()
+
+    def publish(self, game_id, data):
+        with self._lock:
+            last_id, events, condition = self._game(game_id)
+            event = Event(last_id + 1, data)
+            events.append(event)
+            self._games[game_id] = (event.id, events, condition)
+            self._games.move_to_end(game_id)
+            while len(self._games) > self.max_games:
+                self._games.popitem(last=False)
+
+            condition.notify_all()
+            return event
+
+    def last_event_id(self, game_id):
+        with self._lock:
+            return self._games[game_id][0] if game_id in self._games else 0
+
+    def wait(self, game_id, after, timeout):
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while True:
+                last_id, events, condition = self._game(game_id)
+                if last_id > after:
+                    return [event for event in events if event.id > after]
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                condition.wait(remaining)
+
+    def _game(self, game_id):
+        if game_id not in self._games:
+            self._games[game_id] = (0, deque(maxlen=self.buffer_size), threading.Condition(self._lock))
+
+        return self._games[game_id]
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """
+    The configured EventBroker of the process
+    """
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            config = events_settings()
+            _broker = import_string(config['BROKER'])(**config['OPTIONS'])
+
+        return _broker
+
+
+def reset_broker():
+    """
+    Drop the broker of the process, the next get_broker call creates it again from the settings
+    """
+    global _broker
+    with _broker_lock:
+        _broker = None
+
+
+def attack_published(sender, response, **kwargs):
+    """
+    game_attacked receiver publishing the attacks as a delta of the game
+    """
+    get_broker().publish(response.game.pk, dict(AttacksDeltaResponseSerializer(response).data))
+
+
+def event_stream(game_id, after, finished=False):
+    """
+    Server-sent events of a game, from the event following the given event id, until the game is finished or the
+    stream was open STREAM_TIMEOUT seconds. Comments keep the connection alive while no event comes
+    :param game_id: game id
+    :param after: id of the last event the client has
+    :param finished: whether the game is already finished, only the events the client missed are then sent
+    :return: iterator of event stream chunks
+    """
+    config = events_settings()
+    broker = get_broker()
+    deadline = time.monotonic() + config['STREAM_TIMEOUT']
+
+    while True:
+        remaining = deadline - time.monotonic()
+        new_events = broker.wait(game_id, after, 0 if finished else min(config['POLL_TIMEOUT'], remaining))
+        if not new_events:
+            if finished or remaining <= 0:
+                return
+            yield ': keep-alive\n\n'
+            continue
+
+        for event in new_events:
+            yield 'id: {}\nevent: attack\ndata: {}\n\n'.format(event.id, json.dumps(event.data))
+            after = event.id
+            finished = finished or event.data['status'] == GameStatus.FINISHED.value
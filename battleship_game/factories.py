@@ -1,77 +1,322 @@
 import random
+from collections import Counter
 
-from battleship_game.models import Game, GameCell
+from battleship_game import metrics
+from battleship_game.engine import Board
+from battleship_game.models import Game
 
+SHIPS = [4, 3, 3, 2, 2, 2, 1, 1, 1, 1]
 
-def create_random_game():
+PLACEMENT_ATTEMPTS = 10
+
+# ships, and ship cells, of a fleet placed inside a request at most: placing a fleet costs in proportion to both
+MAX_FLEET_LENGTH = 1000
+MAX_FLEET_CELLS = 20000
+
+BULK_CREATE_BATCH_SIZE = 500
+
+
+def create_random_game(board=None, grid_size=Game.GRID_SIZE, ships=None, players=1, player_board=None):
     """
     Small utility factory function to create a random game
+    :param board: board to play on, a new random one by default
+    :param grid_size: size of the new random board
+    :param ships: fleet of the new random board, see create_random_board
+    :param players: 2 for a two player game, the board of the first player being generated with the same fleet
+    :param player_board: board of the first player of a two player game, a new random one by default
     :return: A new game with randomly placed ships
     """
 
-    game = Game()
+    with metrics.phase(metrics.ENGINE):
+        game = Game(opponent_grid=board or create_random_board(grid_size=grid_size, ships=ships))
+        if players == 2:
+            game.start_two_player(player_board or create_random_board(grid_size=game.grid_size, ships=game.fleet))
+    with metrics.phase(metrics.SAVE):
+        game.save()
+    return game
 
-    ships = [4, 3, 3, 2, 2, 2, 1, 1, 1, 1]
-    for ship_size in ships:
-        _create_random_ship(game.opponent_grid, ship_size)
 
-    game.save()
-    return game
+def create_random_games(count, players=1):
+    """
+    Create many random games at once. The boards are generated up front and inserted in batches
+    :param count: number of games to create
+    :param players: 2 for two player games, see create_random_game
+    :return: list of the new games, with their ids set
+    """
+    with metrics.phase(metrics.ENGINE):
+        games = [Game(opponent_grid=board) for board in create_random_boards(count)]
+        if players == 2:
+            for game, player_grid in zip(games, create_random_boards(count)):
+                game.start_two_player(player_grid)
+    with metrics.phase(metrics.SAVE):
+        return Game.objects.bulk_create(games, batch_size=BULK_CREATE_BATCH_SIZE)
 
 
-def _create_random_ship(grid, ship_size):
+def create_random_boards(count, grid_size=Game.GRID_SIZE):
     """
-    Try to place randomly a ship until succeeded. This is just a small utility, so no fallback is included.
-    Placing from the biggest to smallest ships in order will help reduce the overhead of retries.
-    A full implementation would try a specific number of times (e.g. 10) then default to the first available spot.
+    Generate boards with randomly placed ships, without touching the database
+    :param count: number of boards to generate
+    :param grid_size: board size, the boards get the proportional fleet
+    :return: list of Board
     """
-    while True:
-        orientation = random.choice(('row', 'col'))
+    return [create_random_board(grid_size=grid_size) for _ in range(count)]
 
-        start_row = random.randrange(10)
-        start_col = random.randrange(10)
 
-        if _space_is_available(grid, ship_size, orientation, start_row, start_col):
-            _insert_ship(grid, ship_size, orientation, start_row, start_col)
-            return
+def placed_inline(ships):
+    """
+    Whether a fleet is small enough to be placed inside a request, see MAX_FLEET_LENGTH and MAX_FLEET_CELLS
+    :param ships: ship sizes
+    :return: bool
+    """
+    return len(ships) <= MAX_FLEET_LENGTH and sum(ships) <= MAX_FLEET_CELLS
+
+
+def create_random_board(rng=random, grid_size=Game.GRID_SIZE, ships=None):
+    """
+    Generate a board with a fleet randomly placed
+    :param rng: random number generator, pass a seeded random.Random for a reproducible board
+    :param grid_size: board size
+    :param ships: ship sizes, by default the standard fleet scaled to the board (see proportional_fleet)
+    :return: Board
+    """
+    return place_fleet(grid_size, proportional_fleet(grid_size) if ships is None else ships, rng)
+
+
+def proportional_fleet(grid_size):
+    """
+    Fleet covering the same share of a grid_size x grid_size board as the standard fleet does of a
+    GRID_SIZE x GRID_SIZE one: each ship size is repeated in proportion to the board area.
+    Ships longer than the board are left out; a board too small for any ship still gets a single cell one
+    :param grid_size: board size
+    :return: list of ship sizes, biggest first
+    """
+    scale = (grid_size / Game.GRID_SIZE) ** 2
+    ships = []
+    for ship_size, count in sorted(Counter(SHIPS).items(), reverse=True):
+        if ship_size <= grid_size:
+            ships.extend([ship_size] * int(round(count * scale)))
+
+    return ships or [1]
+
+
+class FleetPlacementError(Exception):
+    """
+    The fleet does not fit on the board
+    """
+
+
+def place_fleet(grid_size, ships, rng=random):
+    """
+    Place the ships one after the other, each uniformly at random among the positions still legal for its size.
+    The legal positions are tracked incrementally, so no position is ever drawn and rejected and placing a ship
+    costs a few updates of the lines around it, whatever the area of the board.
+    Drawing biggest ships first can still leave no room for a small one on a crowded board; the whole fleet is then
+    placed again, up to PLACEMENT_ATTEMPTS times, and at last packed on shelves (see check_fleet), which always fit.
+    :param grid_size: board size
+    :param ships: ship sizes
+    :param rng: random number generator
+    :return: Board with the fleet placed
+    :raises FleetPlacementError: when the fleet can not fit, see check_fleet
+    """
+    ships = sorted(ships, reverse=True)
+    shelves = check_fleet(grid_size, ships)
+
+    for _ in range(PLACEMENT_ATTEMPTS):
+        board = _try_place_fleet(grid_size, ships, rng)
+        if board is not None:
+            return board
+
+    return _place_on_shelves(grid_size, shelves, rng)
 
 
-def _space_is_available(grid, ship_size, orientation, start_row, start_col):
-    for row, col in _ship_cells(ship_size, orientation, start_row, start_col):
-        if row < 0 or row >= Game.GRID_SIZE or col < 0 or col >= Game.GRID_SIZE:
-            return False
+def check_fleet(grid_size, ships):
+    """
+    Reject the fleets that do not fit on shelves: every other line of the board, each shelf holding ships in a row
+    with a cell between two of them. A fleet on shelves is always placed, so no fleet accepted here fails to place.
+    The biggest ships left that fit go on each shelf in turn
+    :param grid_size: board size
+    :param ships: ship sizes
+    :return: list of the shelves, each a list of ship sizes
+    :raises FleetPlacementError: when the fleet does not fit
+    """
+    if ships and max(ships) > grid_size:
+        raise FleetPlacementError('A ship of size {} does not fit on a {}x{} board'.format(
+            max(ships), grid_size, grid_size))
+
+    remaining = Counter(ships)
+    sizes = sorted(remaining, reverse=True)
+    shelves = []
+    for _ in range((grid_size + 1) // 2):
+        if not sizes:
+            break
+
+        # a ship takes its cells and the one after it, the one after the last ship is off the board
+        room = grid_size + 1
+        shelf = []
+        for ship_size in sizes:
+            count = min(remaining[ship_size], room // (ship_size + 1))
+            shelf.extend([ship_size] * count)
+            remaining[ship_size] -= count
+            room -= count * (ship_size + 1)
+        shelves.append(shelf)
+        sizes = [ship_size for ship_size in sizes if remaining[ship_size]]
+
+    if sizes:
+        raise FleetPlacementError('The fleet can not fit on a {}x{} board'.format(grid_size, grid_size))
+
+    return shelves
+
+
+def _place_on_shelves(grid_size, shelves, rng):
+    """
+    Place the shelves of check_fleet on lines drawn at random, all along the rows or all down the columns, with the
+    ships of each shelf shuffled and the free cells of the shelf spread at random between them
+    """
+    board = Board(grid_size)
+    orientation = rng.choice(('col', 'row'))
+    for line, shelf in zip(rng.sample(range(0, grid_size, 2), len(shelves)), shelves):
+        shelf = list(shelf)
+        rng.shuffle(shelf)
+        free = grid_size + 1 - sum(ship_size + 1 for ship_size in shelf)
+        # the free cells before each ship, in increasing order so that the ships keep their order and margins
+        shifts = sorted(rng.randrange(free + 1) for _ in shelf)
+        start = 0
+        for ship_size, shift in zip(shelf, shifts):
+            position = (line, start + shift) if orientation == 'col' else (start + shift, line)
+            board.place_ship(ship_size, orientation, *position)
+            start += ship_size + 1
+
+    return board
+
 
-        if not (_is_empty(grid, row, col)
-                and _is_empty(grid, row - 1, col) and _is_empty(grid, row + 1, col)
-                and _is_empty(grid, row, col - 1) and _is_empty(grid, row, col + 1)
-                and _is_empty(grid, row + 1, col + 1) and _is_empty(grid, row - 1, col - 1)
-                and _is_empty(grid, row + 1, col - 1) and _is_empty(grid, row - 1, col + 1)):
-            return False
+def _try_place_fleet(grid_size, ships, rng):
+    board = Board(grid_size)
+    slots = {}
+    for ship_size in set(ships):
+        # a single cell ship is the same whatever its orientation
+        orientations = ('col',) if ship_size == 1 else ('col', 'row')
+        slots[ship_size] = [_Slots(grid_size, ship_size, orientation) for orientation in orientations]
 
-    return True
+    remaining = Counter(ships)
+    for ship_size in ships:
+        remaining[ship_size] -= 1
+        total = sum(ship_slots.total for ship_slots in slots[ship_size])
+        if not total:
+            return None
+
+        offset = rng.randrange(total)
+        for ship_slots in slots[ship_size]:
+            if offset < ship_slots.total:
+                break
+            offset -= ship_slots.total
 
+        ship = board.place_ship(ship_size, ship_slots.orientation, *ship_slots.position(offset))
+        if not remaining[ship_size]:
+            del slots[ship_size]
 
-def _is_empty(grid, row, col):
-    if row < 0 or row >= Game.GRID_SIZE or col < 0 or col >= Game.GRID_SIZE:
-        return True
+        *_, (end_row, end_col) = ship.cells()
+        for size_slots in slots.values():
+            for other_slots in size_slots:
+                other_slots.block(ship.row - 1, end_row + 1, ship.column - 1, end_col + 1)
 
-    return grid[row][col] == GameCell.EMPTY.value
+    return board
 
 
-def _insert_ship(grid, ship_size, orientation, start_row, start_col):
-    for row, col in _ship_cells(ship_size, orientation, start_row, start_col):
-        grid[row][col] = GameCell.SHIP.value
+class _Slots:
+    """
+    Legal start cells of the ships of one size and orientation.
+    The board is cut in lines along the orientation ('col' ships run along the rows' columns, 'row' ships down the
+    columns' rows); each line keeps a bitset of the legal starts in it and a Fenwick tree sums the lines' counts.
+    """
 
+    def __init__(self, grid_size, ship_size, orientation):
+        self.grid_size = grid_size
+        self.ship_size = ship_size
+        self.orientation = orientation
 
-def _ship_cells(ship_size, orientation, start_row, start_col):
-    row = start_row
-    col = start_col
+        starts = max(grid_size - ship_size + 1, 0)
+        self.lines = [(1 << starts) - 1] * grid_size
+        self.counts = _FenwickTree([starts] * grid_size)
+        self.total = starts * grid_size
 
-    row_increment = 1 if orientation == 'row' else 0
-    col_increment = 1 if orientation == 'col' else 0
+    def position(self, offset):
+        """
+        (row, column) of the legal start number offset, counting line by line
+        """
+        line, line_offset = self.counts.find(offset)
+        start = _nth_set_bit(self.lines[line], line_offset)
+        return (line, start) if self.orientation == 'col' else (start, line)
 
-    for _ in range(ship_size):
-        yield (row, col)
+    def block(self, first_row, last_row, first_col, last_col):
+        """
+        Remove the starts of the ships that would cover a cell in the rectangle (which may exceed the board)
+        """
+        if self.orientation == 'col':
+            first_line, last_line, first_cell, last_cell = first_row, last_row, first_col, last_col
+        else:
+            first_line, last_line, first_cell, last_cell = first_col, last_col, first_row, last_row
+
+        first_start = max(first_cell - self.ship_size + 1, 0)
+        last_start = min(last_cell, self.grid_size - self.ship_size)
+        if first_start > last_start:
+            return
+
+        starts_mask = ((1 << (last_start - first_start + 1)) - 1) << first_start
+        lines = self.lines
+        for line in range(max(first_line, 0), min(last_line, self.grid_size - 1) + 1):
+            blocked = lines[line] & starts_mask
+            if blocked:
+                count = bin(blocked).count('1')
+                lines[line] ^= blocked
+                self.counts.add(line, -count)
+                self.total -= count
+
+
+class _FenwickTree:
+    """
+    Prefix sums over a list of non negative counts with logarithmic updates and search
+    """
+
+    def __init__(self, values):
+        self.tree = [0] + list(values)
+        for index in range(1, len(self.tree)):
+            parent = index + (index & -index)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[index]
+
+    def add(self, position, delta):
+        tree = self.tree
+        index = position + 1
+        while index < len(tree):
+            tree[index] += delta
+            index += index & -index
+
+    def find(self, offset):
+        """
+        Position holding the given offset of the running total, and the offset within that position
+        """
+        index = 0
+        step = 1 << (len(self.tree) - 1).bit_length()
+        while step:
+            following = index + step
+            if following < len(self.tree) and self.tree[following] <= offset:
+                index = following
+                offset -= self.tree[following]
+            step >>= 1
+
+        return index, offset
+
+
+def _nth_set_bit(mask, n):
+    """
+    Index of the set bit of mask preceded by exactly n set bits
+    """
+    low, high = 0, mask.bit_length() - 1
+    while low < high:
+        middle = (low + high) // 2
+        if bin(mask & ((2 << middle) - 1)).count('1') > n:
+            high = middle
+        else:
+            low = middle + 1
 
-        row += row_increment
-        col += col_increment
+    return low
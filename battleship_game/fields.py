@@ -0,0 +1,51 @@
+from base64 import b64decode, b64encode
+
+from django.db import models
+
+from battleship_game.engine import Board
+
+
+class BoardField(models.BinaryField):
+    """
+    Stores a Board as its packed masks in a single bytea column.
+    Accepts a Board, a list grid or the packed bytes and always hands a Board back.
+    """
+    description = 'Game board packed as cell state bitmasks'
+
+    def get_default(self):
+        if self.has_default():
+            return super().get_default()
+
+        return None
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+
+        return Board.from_bytes(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Board):
+            return value
+
+        if isinstance(value, list):
+            return Board.from_grid(value)
+
+        if isinstance(value, str):
+            value = b64decode(value)
+
+        return Board.from_bytes(value)
+
+    def get_prep_value(self, value):
+        if isinstance(value, bytes):
+            # already packed
+            return value
+
+        value = self.to_python(value)
+        if value is None:
+            return value
+
+        return value.to_bytes()
+
+    def value_to_string(self, obj):
+        return b64encode(self.get_prep_value(self.value_from_object(obj))).decode('ascii')
@@ -0,0 +1,54 @@
+import json
+import platform
+from collections import OrderedDict
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from battleship_game.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    help = 'Run the game micro benchmarks and print their throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Benchmarks to run, all of them by default')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON, to be kept for --compare')
+        parser.add_argument('--compare', metavar='FILE',
+                            help='JSON results of an earlier run, to print the throughput change of each benchmark')
+
+    def handle(self, *args, **options):
+        names = options['names'] or list(BENCHMARKS)
+        unknown = [name for name in names if name not in BENCHMARKS]
+        if unknown:
+            raise CommandError('Unknown benchmarks: {}'.format(', '.join(unknown)))
+
+        baseline = {}
+        if options['compare']:
+            try:
+                with open(options['compare']) as baseline_file:
+                    baseline = json.load(baseline_file)['benchmarks']
+            except (OSError, ValueError, KeyError) as error:
+                raise CommandError('Cannot read the results to compare with: {}'.format(error))
+
+        results = OrderedDict()
+        for name in names:
+            result = results[name] = BENCHMARKS[name]()
+            if name in baseline:
+                result['change'] = result['per_second'] / baseline[name]['per_second'] - 1
+
+            if not options['json']:
+                line = '{:<40} {:>10} ops {:>10.3f} s {:>12.1f} ops/s'.format(
+                    name, result['operations'], result['seconds'], result['per_second'])
+                if 'change' in result:
+                    line += ' {:>+8.1%}'.format(result['change'])
+                self.stdout.write(line)
+
+        if options['json']:
+            self.stdout.write(json.dumps(OrderedDict([
+                ('created', timezone.now().isoformat()),
+                ('python', platform.python_version()),
+                ('django', django.get_version()),
+                ('benchmarks', results),
+            ]), indent=2))
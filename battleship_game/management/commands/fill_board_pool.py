@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from battleship_game import pool
+
+
+class Command(BaseCommand):
+    help = 'Fill the pool of pre-generated boards, once or continuously'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, help='Number of boards to keep ready, BATTLESHIP_BOARD_POOL SIZE '
+                                                     'by default')
+        parser.add_argument('--loop', action='store_true', help='Keep refilling until interrupted')
+        parser.add_argument('--interval', type=float, help='Seconds between refills when looping, '
+                                                           'BATTLESHIP_BOARD_POOL REFILL_INTERVAL by default')
+
+    def handle(self, *args, **options):
+        config = pool.pool_settings()
+        size = config['SIZE'] if options['size'] is None else options['size']
+        interval = config['REFILL_INTERVAL'] if options['interval'] is None else options['interval']
+
+        while True:
+            added = pool.fill_pool(size)
+            self.stdout.write('Added {} boards, {} in the pool'.format(added, pool.pool_depth()))
+            if not options['loop']:
+                return
+
+            time.sleep(interval)
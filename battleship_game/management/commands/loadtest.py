@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+from http.client import HTTPConnection, HTTPException
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from battleship_game.models import Game
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of sorted values
+    :param values: sorted values
+    :param fraction: percentile between 0 and 1
+    :return: the percentile, None when there are no values
+    """
+    if not values:
+        return None
+
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class Client:
+    """
+    Load test client sending the requests of a scenario one after the other over a keep-alive connection
+    """
+
+    def __init__(self, host, port, scenario):
+        self.host = host
+        self.port = port
+        self.scenario = scenario
+        self.connection = None
+        self.game_id = None
+        self.shots = 0
+        self.latencies = []
+        # 4xx responses, left out of the latencies
+        self.rejected = 0
+        self.errors = 0
+
+    def request(self, method, path, body=None):
+        """
+        Send a request, reconnecting when the server closed the connection
+        :return: (status, decoded JSON body) or (None, None) on a connection error
+        """
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+        payload = None if body is None else json.dumps(body)
+        if self.connection is None:
+            self.connection = HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            self.connection.request(method, path, payload, headers)
+            response = self.connection.getresponse()
+            content = response.read()
+        except (HTTPException, OSError):
+            self.connection.close()
+            self.connection = None
+            return None, None
+
+        if response.getheader('Connection', '').lower() == 'close':
+            self.connection.close()
+            self.connection = None
+        return response.status, json.loads(content.decode()) if content else None
+
+    def new_game(self):
+        status, data = self.request('POST', '/games/')
+        self.game_id = data['id'] if status == 201 else None
+        self.shots = 0
+
+    def next_request(self):
+        """
+        Next request of the scenario
+        :return: (method, path, body)
+        """
+        if self.scenario == 'list':
+            return 'GET', '/games/', None
+        if self.scenario == 'create':
+            return 'POST', '/games/', None
+
+        if self.game_id is None or self.shots == Game.GRID_SIZE ** 2:
+            self.new_game()
+        if self.scenario == 'retrieve':
+            return 'GET', '/games/{}/'.format(self.game_id), None
+
+        row, column = divmod(self.shots, Game.GRID_SIZE)
+        self.shots += 1
+        return 'POST', '/games/{}/attack/'.format(self.game_id), {'row': row, 'column': column}
+
+    def run(self, deadline):
+        while time.monotonic() < deadline:
+            method, path, body = self.next_request()
+            started = time.monotonic()
+            status, data = self.request(method, path, body)
+            if status is None or status >= 500:
+                self.errors += 1
+                continue
+            if status >= 400:
+                self.rejected += 1
+                if self.scenario == 'attack':
+                    self.game_id = None
+                continue
+
+            self.latencies.append(time.monotonic() - started)
+            if self.scenario == 'attack' and data['game']['status'] == 'FINISHED':
+                self.game_id = None
+
+        if self.connection is not None:
+            self.connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Load test a running game API with concurrent clients and print its throughput and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the game API')
+        parser.add_argument('--clients', type=int, default=100, help='Number of concurrent clients')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds the clients send requests')
+        parser.add_argument('--scenario', choices=('list', 'retrieve', 'create', 'attack'), default='retrieve',
+                            help='Requests the clients send: list the games, retrieve, create or attack a game')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('Only http URLs are supported')
+        if options['clients'] < 1:
+            raise CommandError('At least one client is needed')
+
+        clients = [Client(url.hostname, url.port or 80, options['scenario']) for _ in range(options['clients'])]
+        deadline = time.monotonic() + options['duration']
+        threads = [threading.Thread(target=client.run, args=(deadline,), daemon=True) for client in clients]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.monotonic() - started
+
+        latencies = sorted(latency for client in clients for latency in client.latencies)
+        rejected = sum(client.rejected for client in clients)
+        errors = sum(client.errors for client in clients)
+        self.stdout.write('{} clients, {} requests, {} rejected (4xx), {} errors in {:.1f} s'.format(
+            len(clients), len(latencies), rejected, errors, seconds))
+        if latencies:
+            self.stdout.write('{:.1f} requests/s, latency p50 {:.1f} ms, p99 {:.1f} ms, max {:.1f} ms'.format(
+                len(latencies) / seconds, percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000,
+                latencies[-1] * 1000))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from battleship_game import matchmaking
+
+
+class Command(BaseCommand):
+    help = 'Pair the players waiting in the matchmaking queue, once or continuously'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep pairing until interrupted')
+        parser.add_argument('--interval', type=float, help='Seconds between passes when looping, '
+                                                           'BATTLESHIP_MATCHMAKING PAIR_INTERVAL by default')
+        parser.add_argument('--batch-size', type=int, help='Tickets paired by a pass at most, '
+                                                           'BATTLESHIP_MATCHMAKING BATCH_SIZE by default')
+
+    def handle(self, *args, **options):
+        config = matchmaking.matchmaking_settings()
+        interval = config['PAIR_INTERVAL'] if options['interval'] is None else options['interval']
+        batch_size = config['BATCH_SIZE'] if options['batch_size'] is None else options['batch_size']
+
+        while True:
+            paired = matchmaking.pair_waiting(batch_size)
+            expired = matchmaking.expire_tickets()
+            if paired or expired or not options['loop']:
+                stats = matchmaking.queue_stats()
+                self.stdout.write('Paired {} games, expired {} tickets, {} waiting, wait p50 {} s, p99 {} s'.format(
+                    paired, expired, stats['waiting'], stats['waitSeconds']['p50'], stats['waitSeconds']['p99']))
+            if not options['loop']:
+                return
+
+            # a full batch leaves tickets waiting
+            if paired < batch_size // 2:
+                time.sleep(interval)
@@ -0,0 +1,61 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from battleship_game.factories import FleetPlacementError, check_fleet, proportional_fleet
+from battleship_game.models import Game
+from battleship_game.simulation import simulate, summarize
+from battleship_game.strategies import STRATEGIES
+
+
+class Command(BaseCommand):
+    help = 'Play random games offline with an attacker strategy and print the shots to win distribution'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=10000, help='Number of games to play')
+        parser.add_argument('--strategy', choices=list(STRATEGIES), default='density', help='Attacker strategy')
+        parser.add_argument('--grid-size', type=int, default=Game.GRID_SIZE, help='Board size')
+        parser.add_argument('--fleet', help='Comma separated ship sizes, the standard fleet scaled to the board '
+                                            'by default')
+        parser.add_argument('--processes', type=int, help='Worker processes, one per core by default')
+        parser.add_argument('--seed', type=int, help='Seed of the games, for a reproducible simulation')
+        parser.add_argument('--json', action='store_true', help='Print the summary and the distribution as JSON')
+
+    def handle(self, *args, **options):
+        if options['games'] < 1:
+            raise CommandError('At least one game is needed')
+        if options['processes'] is not None and options['processes'] < 1:
+            raise CommandError('At least one process is needed')
+
+        grid_size = options['grid_size']
+        if options['fleet']:
+            try:
+                fleet = [int(ship_size) for ship_size in options['fleet'].split(',')]
+            except ValueError:
+                raise CommandError('The fleet is a comma separated list of ship sizes')
+            if min(fleet) < 1:
+                raise CommandError('Ship sizes are positive')
+        else:
+            fleet = proportional_fleet(grid_size)
+        try:
+            check_fleet(grid_size, fleet)
+        except FleetPlacementError as error:
+            raise CommandError(str(error))
+
+        started = time.perf_counter()
+        distribution = simulate(options['games'], options['strategy'], grid_size, fleet, options['processes'],
+                                options['seed'])
+        seconds = time.perf_counter() - started
+        summary = summarize(distribution)
+
+        if options['json']:
+            summary['seconds'] = seconds
+            summary['distribution'] = {shots: distribution[shots] for shots in sorted(distribution)}
+            self.stdout.write(json.dumps(summary, indent=2))
+            return
+
+        self.stdout.write('{} games with {} in {:.1f} s, {:.0f} games/s'.format(
+            summary['games'], options['strategy'], seconds, summary['games'] / seconds))
+        self.stdout.write('shots to win: mean {mean:.1f}, min {min}, p50 {p50}, p90 {p90}, p99 {p99}, '
+                          'max {max}'.format(**summary))
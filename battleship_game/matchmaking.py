@@ -0,0 +1,189 @@
+"""
+Matchmaking queue of the two player games. A player enqueues a MatchTicket with POST matchmaking/ and polls it until
+it is paired with another waiting player into a new two player game.
+A pairing pass takes the oldest waiting tickets in a batch, skipping the tickets locked by concurrent passes instead of
+waiting for them, creates the games of the batch in bulk and assigns the tickets in a single update. The polls of the
+waiting tickets run a pass at most every PAIR_INTERVAL seconds per process; the Matchmaker thread or the matchmaker
+management command run them continuously. The tickets leave the queue TICKET_TIMEOUT seconds after they were enqueued,
+paired or not. Everything is configured by the BATTLESHIP_MATCHMAKING setting.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction, close_old_connections
+from django.db.models import Aggregate, Case, Count, F, FloatField, Func, IntegerField, Max, Value, When
+from django.utils import timezone
+
+from battleship_game.factories import create_random_games
+from battleship_game.models import Game, MatchTicket
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # tickets paired by a pass at most
+    'BATCH_SIZE': 1000,
+    # seconds between two pairing passes of a process
+    'PAIR_INTERVAL': 0.1,
+    # run the Matchmaker as a thread of the web process
+    'THREAD': False,
+    # seconds a ticket stays in the queue, waiting or paired, before it is deleted
+    'TICKET_TIMEOUT': 600,
+    # seconds of enqueued tickets behind the wait time percentiles
+    'STATS_WINDOW': 300,
+}
+
+# wait time percentiles of the statistics
+PERCENTILES = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99))
+
+
+def matchmaking_settings():
+    return dict(DEFAULTS, **getattr(settings, 'BATTLESHIP_MATCHMAKING', {}))
+
+
+def enqueue():
+    """
+    Put a new player in the queue
+    :return: the new waiting MatchTicket
+    """
+    return MatchTicket.objects.create()
+
+
+def dequeue(ticket):
+    """
+    Take a waiting ticket out of the queue
+    :return: whether the ticket was still waiting, a paired ticket is left as is
+    """
+    deleted, _ = MatchTicket.objects.filter(pk=ticket.pk, game=None).delete()
+    return bool(deleted)
+
+
+def pair_waiting(batch_size=None):
+    """
+    Pair the oldest waiting tickets two by two into new two player games, the older ticket of a pair being the first
+    player. An odd ticket out waits for the next pass
+    :param batch_size: tickets taken at most, BATCH_SIZE by default
+    :return: number of games created
+    """
+    if batch_size is None:
+        batch_size = matchmaking_settings()['BATCH_SIZE']
+
+    with transaction.atomic():
+        ticket_ids = list(MatchTicket.objects.select_for_update(skip_locked=True).filter(game=None).order_by('id')
+                          .values_list('id', flat=True)[:batch_size // 2 * 2])
+        ticket_ids = ticket_ids[:len(ticket_ids) // 2 * 2]
+        if not ticket_ids:
+            return 0
+
+        games = create_random_games(len(ticket_ids) // 2, players=2)
+        MatchTicket.objects.filter(pk__in=ticket_ids).update(
+            game=Case(*[When(pk=ticket_id, then=Value(games[index // 2].pk))
+                        for index, ticket_id in enumerate(ticket_ids)], output_field=IntegerField()),
+            player=Case(When(pk__in=ticket_ids[1::2], then=Value(Game.PLAYERS[1])), default=Value(Game.PLAYERS[0]),
+                        output_field=IntegerField()),
+            matched_at=timezone.now())
+
+    return len(games)
+
+
+def expire_tickets(timeout=None):
+    """
+    Delete the tickets enqueued more than timeout seconds ago, TICKET_TIMEOUT by default
+    :return: number of tickets deleted
+    """
+    if timeout is None:
+        timeout = matchmaking_settings()['TICKET_TIMEOUT']
+
+    deleted, _ = MatchTicket.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=timeout)).delete()
+    return deleted
+
+
+_lock = threading.Lock()
+# monotonic time of the next pairing pass of a poll in this process
+_next_pass = 0.0
+
+
+def pair_if_due():
+    """
+    Pairing pass of a poll, unless this process ran one less than PAIR_INTERVAL seconds ago. The pass also deletes
+    the expired tickets
+    :return: number of games created
+    """
+    global _next_pass
+    now = time.monotonic()
+    with _lock:
+        if now < _next_pass:
+            return 0
+        _next_pass = now + matchmaking_settings()['PAIR_INTERVAL']
+
+    paired = pair_waiting()
+    expire_tickets()
+    return paired
+
+
+class Percentile(Aggregate):
+    """
+    Smallest value that at least fraction of the rows do not exceed, the percentile_disc ordered-set aggregate
+    """
+    function = 'percentile_disc'
+    template = '%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+
+    def __init__(self, expression, fraction, **extra):
+        super().__init__(expression, fraction=float(fraction), output_field=FloatField(), **extra)
+
+
+def queue_stats(window=None):
+    """
+    Queue metrics: the waiting tickets, and the wait of the tickets enqueued in the last window seconds and paired
+    :param window: seconds, STATS_WINDOW by default
+    :return: OrderedDict with the number of waiting and matched tickets and the wait seconds percentiles
+    """
+    if window is None:
+        window = matchmaking_settings()['STATS_WINDOW']
+
+    wait = Func(F('matched_at') - F('created_at'), template='EXTRACT(EPOCH FROM %(expressions)s)',
+                output_field=FloatField())
+    aggregates = OrderedDict((name, Percentile(wait, fraction)) for name, fraction in PERCENTILES)
+    aggregates['max'] = Max(wait)
+    matched = MatchTicket.objects.filter(created_at__gte=timezone.now() - timedelta(seconds=window),
+                                         game__isnull=False)
+    wait_seconds = matched.aggregate(matched=Count('id'), **aggregates)
+
+    return OrderedDict([
+        ('waiting', MatchTicket.objects.filter(game=None).count()),
+        ('matched', wait_seconds.pop('matched')),
+        ('waitSeconds', OrderedDict((name, wait_seconds[name]) for name in aggregates)),
+    ])
+
+
+class Matchmaker(threading.Thread):
+    """
+    Daemon thread pairing the waiting tickets every PAIR_INTERVAL seconds, at once again after a full batch
+    """
+
+    def __init__(self, interval=None, batch_size=None):
+        super().__init__(name='matchmaker', daemon=True)
+        config = matchmaking_settings()
+        self.interval = config['PAIR_INTERVAL'] if interval is None else interval
+        self.batch_size = config['BATCH_SIZE'] if batch_size is None else batch_size
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            paired = 0
+            try:
+                paired = pair_waiting(self.batch_size)
+                expire_tickets()
+            except Exception:
+                logger.exception('Matchmaking pass failed')
+            finally:
+                close_old_connections()
+
+            if paired < self.batch_size // 2:
+                self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
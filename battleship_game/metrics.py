@@ -0,0 +1,261 @@
+"""
+Request metrics of the game API: how long the requests take and where the time goes.
+With the BATTLESHIP_METRICS setting ENABLED, the MetricsMiddleware times every request and the hooks of the hot paths
+time its phases: loading the game (db_load), the board engine (engine), saving the game (save), serializing the response
+(serialize) and rendering it (render), and counts the database queries made in each phase. The totals of the process
+are served in the Prometheus text format by /metrics, and with SERVER_TIMING each response tells its own phases in a
+Server-Timing header. /metrics also serves the depth of the board pool and the board claims of the process.
+Disabled, the middleware is left out and a hook costs a thread-local lookup.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+DEFAULTS = {
+    # time the requests and their phases
+    'ENABLED': False,
+    # send the phases of each request in a Server-Timing header
+    'SERVER_TIMING': False,
+}
+
+DB_LOAD = 'db_load'
+ENGINE = 'engine'
+SAVE = 'save'
+SERIALIZE = 'serialize'
+RENDER = 'render'
+PHASES = (DB_LOAD, ENGINE, SAVE, SERIALIZE, RENDER)
+# the queries made outside of the phases
+OTHER = 'other'
+
+# upper bounds of the buckets of the request duration histograms, in seconds
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def metrics_settings():
+    return dict(DEFAULTS, **getattr(settings, 'BATTLESHIP_METRICS', {}))
+
+
+def metrics_enabled():
+    return metrics_settings()['ENABLED']
+
+
+class RequestTimings:
+    """
+    Phases of the request handled by the thread
+    """
+
+    def __init__(self):
+        self.seconds = OrderedDict()
+        self.queries = Counter()
+        # phase being timed, the phases inside another one are part of it
+        self.active = None
+
+    def count_query(self, execute, sql, params, many, context):
+        """
+        Database execute wrapper counting the queries of the request
+        """
+        self.queries[self.active or OTHER] += 1
+        return execute(sql, params, many, context)
+
+    def server_timing(self, seconds):
+        """
+        :param seconds: duration of the request
+        :return: value of the Server-Timing header, in milliseconds
+        """
+        return ', '.join('{};dur={:.3f}'.format(name, value * 1000)
+                         for name, value in list(self.seconds.items()) + [('total', seconds)])
+
+
+class Phase:
+    """
+    Context manager timing a phase of the request
+    """
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.timings.active = self.name
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = time.perf_counter() - self.start
+        self.timings.active = None
+        self.timings.seconds[self.name] = self.timings.seconds.get(self.name, 0.0) + seconds
+
+
+_local = threading.local()
+_untimed = nullcontext()
+
+
+def phase(name):
+    """
+    Time a block as a phase of the current request
+    :param name: one of PHASES
+    :return: context manager, doing nothing outside of a timed request or inside another phase
+    """
+    timings = getattr(_local, 'timings', None)
+    if timings is None or timings.active is not None:
+        return _untimed
+
+    return Phase(timings, name)
+
+
+def duration_bucket(seconds):
+    """
+    :return: index of the duration histogram bucket of seconds, len(DURATION_BUCKETS) for the unbounded one
+    """
+    return next((index for index, bound in enumerate(DURATION_BUCKETS) if seconds <= bound), len(DURATION_BUCKETS))
+
+
+class MetricsRegistry:
+    """
+    In-process totals of the timed requests
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # (view, method, status) -> requests
+        self.requests = Counter()
+        # view -> requests per duration bucket, the last one unbounded
+        self.duration_buckets = {}
+        self.duration_seconds = Counter()
+        self.phase_seconds = Counter()
+        self.queries = Counter()
+
+    def record(self, view, method, status, seconds, timings):
+        bucket = duration_bucket(seconds)
+        with self._lock:
+            self.requests[view, method, status] += 1
+            self.duration_buckets.setdefault(view, [0] * (len(DURATION_BUCKETS) + 1))[bucket] += 1
+            self.duration_seconds[view] += seconds
+            for name, phase_seconds in timings.seconds.items():
+                self.phase_seconds[view, name] += phase_seconds
+            for name, queries in timings.queries.items():
+                self.queries[view, name] += queries
+
+    def render(self):
+        """
+        :return: the metrics in the Prometheus text exposition format
+        """
+        with self._lock:
+            lines = _metric_lines('battleship_requests_total', 'counter', 'Requests handled',
+                                  [((('view', view), ('method', method), ('status', status)), count)
+                                   for (view, method, status), count in sorted(self.requests.items())])
+
+            lines.extend(_header('battleship_request_duration_seconds', 'histogram', 'Request handling time'))
+            for view, buckets in sorted(self.duration_buckets.items()):
+                lines.extend(_histogram_samples('battleship_request_duration_seconds', (('view', view),), buckets,
+                                                self.duration_seconds[view]))
+
+            lines.extend(_metric_lines('battleship_request_phase_seconds_total', 'counter',
+                                       'Time spent in each phase of the requests',
+                                       [((('view', view), ('phase', name)), seconds)
+                                        for (view, name), seconds in sorted(self.phase_seconds.items())]))
+            lines.extend(_metric_lines('battleship_request_queries_total', 'counter',
+                                       'Database queries of the requests by phase, other outside of the phases',
+                                       [((('view', view), ('phase', name)), queries)
+                                        for (view, name), queries in sorted(self.queries.items())]))
+
+        return '\n'.join(lines) + '\n'
+
+
+def render_pool_stats(stats):
+    """
+    :param stats: board pool metrics, see battleship_game.pool.stats
+    :return: the board pool metrics in the Prometheus text exposition format
+    """
+    lines = _metric_lines('battleship_board_pool_depth', 'gauge', 'Boards ready in the pool', [((), stats['depth'])])
+    lines.extend(_metric_lines('battleship_board_pool_claims_total', 'counter', 'Boards claimed by the new games',
+                               [((('result', 'hit'),), stats['hits']), ((('result', 'miss'),), stats['misses'])]))
+    lines.extend(_header('battleship_board_pool_claim_seconds', 'histogram', 'Time taken by the board claims'))
+    lines.extend(_histogram_samples('battleship_board_pool_claim_seconds', (), stats['claim_buckets'],
+                                    stats['claim_seconds_total']))
+    lines.extend(_metric_lines('battleship_board_pool_boards_generated_total', 'counter',
+                               'Boards generated into the pool by this process', [((), stats['boards_generated'])]))
+
+    return '\n'.join(lines) + '\n'
+
+
+def _histogram_samples(name, labels, buckets, total):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(DURATION_BUCKETS + ('+Inf',), buckets):
+        cumulative += count
+        lines.append(_sample(name + '_bucket', labels + (('le', bound),), cumulative))
+    lines.append(_sample(name + '_sum', labels, total))
+    lines.append(_sample(name + '_count', labels, cumulative))
+    return lines
+
+
+def _header(name, metric_type, description):
+    return ['# HELP {} {}'.format(name, description), '# TYPE {} {}'.format(name, metric_type)]
+
+
+def _sample(name, labels, value):
+    if not labels:
+        return '{} {}'.format(name, value)
+
+    return '{}{{{}}} {}'.format(name, ','.join('{}="{}"'.format(label, _escape(label_value))
+                                                for label, label_value in labels), value)
+
+
+def _metric_lines(name, metric_type, description, samples):
+    return _header(name, metric_type, description) + [_sample(name, labels, value) for labels, value in samples]
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """
+    Time the requests and their phases, and count their queries. Left out of the middleware chain when disabled
+    """
+
+    def __init__(self, get_response):
+        config = metrics_settings()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = config['SERVER_TIMING']
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        _local.timings = timings
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timings.count_query):
+                response = self.get_response(request)
+        finally:
+            _local.timings = None
+        seconds = time.perf_counter() - start
+
+        match = request.resolver_match
+        registry.record(match.view_name if match is not None else 'unmatched', request.method, response.status_code,
+                        seconds, timings)
+        if self.server_timing:
+            response['Server-Timing'] = timings.server_timing(seconds)
+
+        return response
+
+    def process_template_response(self, request, response):
+        # the response is rendered next, its post render callbacks are called right after
+        render = phase(RENDER)
+        render.__enter__()
+        response.add_post_render_callback(lambda rendered: render.__exit__(None, None, None))
+        return response
@@ -0,0 +1,54 @@
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+import battleship_game.fields
+from battleship_game.engine import Board
+
+
+def pack_grids(apps, schema_editor):
+    Game = apps.get_model('battleship_game', 'Game')
+    for game in Game.objects.iterator():
+        game.packed_grid = Board.from_grid(game.opponent_grid)
+        game.save(update_fields=['packed_grid'])
+
+
+def unpack_grids(apps, schema_editor):
+    Game = apps.get_model('battleship_game', 'Game')
+    for game in Game.objects.iterator():
+        game.opponent_grid = game.packed_grid.to_grid()
+        game.save(update_fields=['opponent_grid'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battleship_game', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='packed_grid',
+            field=battleship_game.fields.BoardField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='game',
+            name='opponent_grid',
+            field=django.contrib.postgres.fields.ArrayField(base_field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(choices=[(' ', ' '), ('.', '.'), ('i', 'i'), ('x', 'x'), ('o', 'o')], default=' ', max_length=1), size=10), null=True, size=10),
+        ),
+        migrations.RunPython(pack_grids, unpack_grids),
+        migrations.RemoveField(
+            model_name='game',
+            name='opponent_grid',
+        ),
+        migrations.RenameField(
+            model_name='game',
+            old_name='packed_grid',
+            new_name='opponent_grid',
+        ),
+        migrations.AlterField(
+            model_name='game',
+            name='opponent_grid',
+            field=battleship_game.fields.BoardField(),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 2.0.5 on 2026-10-18 17:34
+
+import battleship_game.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battleship_game', '0002_packed_opponent_grid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PooledBoard',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('opponent_grid', battleship_game.fields.BoardField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
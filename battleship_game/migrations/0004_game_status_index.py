@@ -0,0 +1,17 @@
+# Generated by Django 2.0.5 on 2026-10-18 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battleship_game', '0003_board_pool'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['game_status', 'id'], name='game_status_id_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 2.0.5 on 2026-10-18 18:03
+
+import battleship_game.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battleship_game', '0004_game_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Attack',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.PositiveIntegerField()),
+                ('row', models.PositiveSmallIntegerField()),
+                ('column', models.PositiveSmallIntegerField()),
+                ('result', models.CharField(choices=[('INVALID', 'INVALID'), ('MISSED', 'MISSED'), ('INJURED', 'INJURED'), ('KILLED', 'KILLED')], max_length=10)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GameSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.PositiveIntegerField()),
+                ('opponent_grid', battleship_game.fields.BoardField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='shots',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='gamesnapshot',
+            name='game',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='battleship_game.Game'),
+        ),
+        migrations.AddField(
+            model_name='attack',
+            name='game',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='attacks', to='battleship_game.Game'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='gamesnapshot',
+            unique_together={('game', 'seq')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='attack',
+            unique_together={('game', 'seq')},
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 2.0.5 on 2026-10-18 18:31
+
+import battleship_game.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battleship_game', '0005_attack_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attack',
+            name='player',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='player1_token',
+            field=models.CharField(max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='player2_token',
+            field=models.CharField(max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='player_grid',
+            field=battleship_game.fields.BoardField(null=True),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='turn',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='gamesnapshot',
+            name='player_grid',
+            field=battleship_game.fields.BoardField(null=True),
+        ),
+        migrations.AddField(
+            model_name='gamesnapshot',
+            name='turn',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+    ]
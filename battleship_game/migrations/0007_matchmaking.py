@@ -0,0 +1,31 @@
+# Generated by Django 2.0.5 on 2026-10-18 18:36
+
+import battleship_game.models
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battleship_game', '0006_two_player'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchTicket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(default=battleship_game.models.new_token, max_length=32, unique=True)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('player', models.PositiveSmallIntegerField(null=True)),
+                ('matched_at', models.DateTimeField(null=True)),
+                ('game', models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tickets', to='battleship_game.Game')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='matchticket',
+            index=models.Index(fields=['game', 'id'], name='battleship__game_id_18df9d_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 2.0.5 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battleship_game', '0007_matchmaking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pooledboard',
+            name='grid_size',
+            field=models.PositiveSmallIntegerField(default=10),
+        ),
+        migrations.AddIndex(
+            model_name='pooledboard',
+            index=models.Index(fields=['grid_size', 'id'], name='pooled_board_grid_size_id_idx'),
+        ),
+    ]
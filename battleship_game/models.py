@@ -1,167 +1,347 @@
-from collections import namedtuple
-from enum import Enum
+import hmac
+import secrets
+from collections import namedtuple, OrderedDict
 
-from django.contrib.postgres.fields import ArrayField
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
-AttackCellResponse = namedtuple('AttackCellResponse', ('attack_status', 'game'))
+from battleship_game import metrics
+from battleship_game.engine import Board, BoardAttack
+from battleship_game.enums import AttackStatus, GameStatus, GameCell
+from battleship_game.fields import BoardField
+from battleship_game.signals import game_attacked
 
+AttackCellResponse = namedtuple('AttackCellResponse', ('attack_status', 'game', 'changes', 'player'))
+AttackCellsResponse = namedtuple('AttackCellsResponse', ('attack_statuses', 'game', 'changes', 'player'))
+# changes: list of the (row, column, GameCell value) cells changed by the attack, in the order they first changed
+# player: attacking player of a two player game, None in a single player game
+AttackCellResponse.__new__.__defaults__ = ((), None)
+AttackCellsResponse.__new__.__defaults__ = ((), None)
 
-class AttackStatus(Enum):
-    INVALID = 'INVALID'
-    MISSED = 'MISSED'
-    INJURED = 'INJURED'
-    KILLED = 'KILLED'
 
-
-class DBEnum(Enum):
-    @classmethod
-    def choices(cls):
-        return [(c.value, c.value) for c in cls]
-
-
-class GameStatus(DBEnum):
-    IN_PROGRESS = 'IN_PROGRESS'
-    FINISHED = 'FINISHED'
-
-
-class GameCell(DBEnum):
-    EMPTY = ' '
-    MISSED = '.'
-    INJURED = 'i'
-    KILLED = 'x'
-    SHIP = 'o'
-
-    @classmethod
-    def opened_cells(cls):
-        return [cls.MISSED, cls.INJURED, cls.KILLED]
-
-    @classmethod
-    def alive_cells(cls):
-        return [cls.SHIP, cls.INJURED]
-
-    @classmethod
-    def hidden_cells(cls):
-        return [cls.SHIP]
+def new_token():
+    """
+    Secret of a player or of a matchmaking ticket
+    """
+    return secrets.token_hex(16)
 
 
 class Game(models.Model):
     """
     Battleship game model.
-    Defines the status and the opponent grid
+    Defines the status and the opponent grid. The grid size and the fleet are part of the grid,
+    games default to the standard GRID_SIZE x GRID_SIZE board.
+    A two player game also has the player grid, the board of the first player: the first player attacks the opponent
+    grid and the second player the player grid, each in turn. The players are told apart by their tokens
     """
     GRID_SIZE = 10
-
-    opponent_grid = ArrayField(
-        ArrayField(models.CharField(max_length=1, choices=GameCell.choices(), default=GameCell.EMPTY.value),
-                   size=GRID_SIZE),
-        size=GRID_SIZE)
+    MAX_GRID_SIZE = 1000
+    # logged attacks between two board snapshots, the most attacks a replay applies
+    SNAPSHOT_INTERVAL = 100
+    PLAYERS = (1, 2)
+
+    opponent_grid = BoardField()
+    # board of the first player in a two player game, attacked by the second player
+    player_grid = BoardField(null=True)
+    # player attacking next in a two player game, the winner once it is finished; None in a single player game
+    turn = models.PositiveSmallIntegerField(null=True)
+    # secrets of the players of a two player game, sent with their requests
+    player1_token = models.CharField(max_length=32, null=True)
+    player2_token = models.CharField(max_length=32, null=True)
 
     game_status = models.CharField(max_length=50, choices=GameStatus.choices(), default=GameStatus.IN_PROGRESS.value)
 
+    # number of logged attacks, the seq of the last one
+    shots = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # filtering by status and paginating on id is a single range scan
+        indexes = [models.Index(fields=['game_status', 'id'], name='game_status_id_idx')]
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        if self.opponent_grid is None:
+        # a deferred grid is loaded on first access, not to be replaced by an empty one
+        if 'opponent_grid' not in self.get_deferred_fields() and self.opponent_grid is None:
             self.reset_grid()
 
-    def reset_grid(self):
+        # Attack and GameSnapshot rows not written yet, see take_log
+        self._attacks_log = []
+        self._snapshots_log = []
+
+    def reset_grid(self, grid_size=GRID_SIZE):
+        """
+        Reset the grid to grid_size x grid_size all EMPTY
+        """
+        self.opponent_grid = Board(grid_size)
+
+    def start_two_player(self, player_grid):
+        """
+        Turn a new game into a two player game, the first player attacking first
+        :param player_grid: board of the first player, the opponent grid being the board of the second one
+        """
+        self.player_grid = player_grid
+        self.turn = self.PLAYERS[0]
+        self.player1_token, self.player2_token = new_token(), new_token()
+
+    @property
+    def two_player(self):
+        return self.turn is not None
+
+    def player_of(self, token):
+        """
+        :return: the player with the given token, None for an unknown token or a single player game
+        """
+        for player, player_token in zip(self.PLAYERS, (self.player1_token, self.player2_token)):
+            if player_token is not None and hmac.compare_digest(player_token.encode(), token.encode()):
+                return player
+
+        return None
+
+    def target_grid(self, player=None):
+        """
+        Board attacked by a player: the opponent grid, but for the second player of a two player game
+        """
+        return self.opponent_grid if self.grid_field(player) == 'opponent_grid' else self.player_grid
+
+    def own_grid(self, player=None):
+        """
+        Board of a player of a two player game, attacked by the other one; None in a single player game
+        """
+        if not self.two_player:
+            return None
+
+        return self.player_grid if self.grid_field(player) == 'opponent_grid' else self.opponent_grid
+
+    def grid_field(self, player=None):
+        """
+        Name of the field of the board attacked by a player
+        """
+        return 'player_grid' if self.two_player and player == self.PLAYERS[1] else 'opponent_grid'
+
+    @property
+    def grid_size(self):
+        return self.opponent_grid.size
+
+    @property
+    def fleet(self):
         """
-        Reset the grid to GRID_SIZE x GRID_SIZE all EMPTY
+        Sizes of the ships of the game, biggest first
         """
-        self.opponent_grid = [
-            [GameCell.EMPTY.value for _ in range(0, Game.GRID_SIZE)] for _ in range(0, Game.GRID_SIZE)
-        ]
+        return sorted((ship.size for ship in self.opponent_grid.fleet), reverse=True)
+
+    @property
+    def ships_left(self):
+        return self.opponent_grid.ships_left
+
+    @property
+    def ship_cells_left(self):
+        return self.opponent_grid.ship_cells_left
 
-    def attack_cell(self, row, column) -> AttackCellResponse:
+    def attack_cell(self, row, column, save=True, player=None) -> AttackCellResponse:
         """
         Attack a cell on the opponent grid.
         Returns the attack result and updates the board and game status according to the ships left
         :param row: attack row
         :param column: attack column
-        :return: AttackCellResponse
-        """
-        cell_value = self.opponent_grid[row][column]
-
-        if GameStatus(self.game_status) is GameStatus.FINISHED or GameCell(cell_value) in GameCell.opened_cells():
-            return AttackCellResponse(AttackStatus.INVALID, self)
-
-        if GameCell(cell_value) is GameCell.EMPTY:
-            self.opponent_grid[row][column] = GameCell.MISSED.value
-            self.save()
-            return AttackCellResponse(AttackStatus.MISSED, self)
-
-        if GameCell(cell_value) is GameCell.SHIP:
-            if self._is_last_ship_cell(row, column):
-                # kill
-                self._kill_ship(row, column)
-                if self._opponent_ship_cells_left() == 0:
-                    self.game_status = GameStatus.FINISHED.value
-
-                self.save()
-                return AttackCellResponse(AttackStatus.KILLED, self)
-            else:
-                # injure
-                self.opponent_grid[row][column] = GameCell.INJURED.value
-                self._mark_corners_missed(row, column)
-                self.save()
-                return AttackCellResponse(AttackStatus.INJURED, self)
-
-    def _is_last_ship_cell(self, origin_row, origin_col):
-        increments = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-
-        for row_increment, col_increment in increments:
-            row = origin_row
-            col = origin_col
-            while True:
-                row += row_increment
-                col += col_increment
-                if self._over_board(row, col) or GameCell(self.opponent_grid[row][col]) not in GameCell.alive_cells():
-                    break
-
-                if GameCell(self.opponent_grid[row][col]) is GameCell.SHIP:
-                    return False
-
-        return True
-
-    def _kill_ship(self, origin_row, origin_col):
-        increments = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-
-        for row_increment, col_increment in increments:
-            row = origin_row
-            col = origin_col
-            while True:
-                row += row_increment
-                col += col_increment
-                if self._over_board(row, col):
-                    break
-
-                if GameCell(self.opponent_grid[row][col]) in GameCell.alive_cells():
-                    self.opponent_grid[row][col] = GameCell.KILLED.value
-                    self._mark_corners_missed(row, col)
-                elif GameCell(self.opponent_grid[row][col]) is GameCell.EMPTY:
-                    self.opponent_grid[row][col] = GameCell.MISSED.value
-                else:
-                    break
-
-        self.opponent_grid[origin_row][origin_col] = GameCell.KILLED.value
-        self._mark_corners_missed(origin_row, origin_col)
-
-    def _mark_corners_missed(self, origin_row, origin_col):
-        increments = [(1, 1), (-1, -1), (1, -1), (-1, 1)]
-        for row_increment, col_increment in increments:
-            row = origin_row + row_increment
-            col = origin_col + col_increment
-            if not self._over_board(row, col):
-                self.opponent_grid[row][col] = GameCell.MISSED.value
-
-    def _opponent_ship_cells_left(self):
-        return sum([
-            sum([1 for cell in row if GameCell(cell) is GameCell.SHIP])
-            for row in self.opponent_grid
-        ])
-
-    @staticmethod
-    def _over_board(row, col):
-        if row < 0 or row >= Game.GRID_SIZE or col < 0 or col >= Game.GRID_SIZE:
-            return True
+        :param save: whether to save the game, see attack_cells
+        :param player: attacking player of a two player game, see attack_cells
+        :return: AttackCellResponse, with the cells changed by the attack
+        """
+        attack_statuses, _, changes, player = self.attack_cells([(row, column)], save=save, player=player)
+        return AttackCellResponse(attack_statuses[0], self, changes, player)
+
+    def attack_cells(self, cells, save=True, player=None) -> AttackCellsResponse:
+        """
+        Attack several cells in order, saving the game once at the end.
+        Cells attacked after the game is finished are INVALID.
+        In a two player game the player attacks the board of the other one, and keeps the turn until a shot misses:
+        the cells attacked out of turn are INVALID too. Only the attacked board is saved.
+        Once the attacks are committed, the game_attacked signal is sent with the response
+        :param cells: iterable of (row, column) pairs
+        :param save: whether to save the game, False for the games of the in-memory store which saves them itself
+        :param player: attacking player of a two player game, ignored in a single player game
+        :return: AttackCellsResponse with one attack status per cell and the cells changed by all the attacks
+        """
+        if not self.two_player:
+            player = None
+        was_finished = GameStatus(self.game_status) is GameStatus.FINISHED
+        shots = self.shots
+        turn = self.turn
+        board = self.target_grid(player)
+        # the boards before the first logged attack are the origin of the replays
+        initial_snapshot = self._snapshot(0) if shots == 0 else None
+        # and a snapshot at every SNAPSHOT_INTERVAL attacks bounds the attacks they replay
+        snapshots = []
+        attack_statuses = []
+        # a cell may change twice in a batch, injured then killed: it is listed once with its final value
+        changed = OrderedDict()
+        with metrics.phase(metrics.ENGINE):
+            for row, column in cells:
+                attack_status, attack_changed = self._attack(row, column, player)
+                attack_statuses.append(attack_status)
+                changed.update((cell, None) for cell in attack_changed)
+                if attack_status is not AttackStatus.INVALID:
+                    self.shots += 1
+                    self._attacks_log.append(Attack(game=self, seq=self.shots, player=player, row=row, column=column,
+                                                    result=attack_status.value))
+                    if self.shots % self.SNAPSHOT_INTERVAL == 0:
+                        snapshots.append(self._snapshot(self.shots))
+
+        update_fields = []
+        if self.shots != shots:
+            update_fields.extend([self.grid_field(player), 'shots'])
+            if shots == 0:
+                self._snapshots_log.append(initial_snapshot)
+            self._snapshots_log.extend(snapshots)
+        if self.turn != turn:
+            update_fields.append('turn')
+        if not was_finished and GameStatus(self.game_status) is GameStatus.FINISHED:
+            update_fields.append('game_status')
+
+        if update_fields and save:
+            with metrics.phase(metrics.SAVE), transaction.atomic(savepoint=False):
+                self.save(update_fields=update_fields)
+                self.save_log()
+
+        changes = [(row, column, board.cell(row * board.size + column)) for row, column in changed]
+        response = AttackCellsResponse(attack_statuses, self, changes, player)
+
+        if update_fields:
+            transaction.on_commit(lambda: game_attacked.send(sender=Game, response=response))
+
+        return response
+
+    def take_log(self):
+        """
+        Hand over the attacks logged and the board snapshots taken since the last call, for them to be written
+        :return: (Attack list, GameSnapshot list)
+        """
+        log = self._attacks_log, self._snapshots_log
+        self._attacks_log, self._snapshots_log = [], []
+        return log
+
+    def restore_log(self, log):
+        """
+        Put back a log handed over by take_log that could not be written, ahead of the attacks logged since
+        """
+        attacks, snapshots = log
+        self._attacks_log[:0] = attacks
+        self._snapshots_log[:0] = snapshots
+
+    def save_log(self):
+        """
+        Write the attacks logged and the board snapshots taken since the last call, a single insert for each
+        """
+        attacks, snapshots = self.take_log()
+        Attack.objects.bulk_create(attacks)
+        GameSnapshot.objects.bulk_create(snapshots)
+
+    def replay(self, seq=None):
+        """
+        State of the game after its first seq logged attacks, rebuilt from the closest earlier board snapshot and
+        the attacks logged since, at most SNAPSHOT_INTERVAL of them
+        :param seq: number of attacks to replay, between 0 and shots, all of them by default
+        :return: unsaved Game
+        """
+        if seq is None:
+            seq = self.shots
+        if not 0 <= seq <= self.shots:
+            raise ValueError('The game has {} logged attacks, not {}'.format(self.shots, seq))
+        if self.shots == 0:
+            return Game(pk=self.pk, opponent_grid=Board.from_bytes(self.opponent_grid.to_bytes()),
+                        player_grid=None if self.player_grid is None else Board.from_bytes(self.player_grid.to_bytes()),
+                        turn=self.turn, game_status=self.game_status)
+
+        snapshot = self.snapshots.filter(seq__lte=seq).order_by('-seq').first()
+        game = Game(pk=self.pk, opponent_grid=snapshot.opponent_grid, player_grid=snapshot.player_grid,
+                    turn=snapshot.turn, shots=snapshot.seq)
+        if any(board is not None and board.ship_cells_left == 0 for board in (game.opponent_grid, game.player_grid)):
+            game.game_status = GameStatus.FINISHED.value
+
+        for attack in self.attacks.filter(seq__gt=snapshot.seq, seq__lte=seq).order_by('seq'):
+            game._attack(attack.row, attack.column, attack.player)
+            game.shots = attack.seq
+
+        return game
+
+    def _snapshot(self, seq):
+        return GameSnapshot(game=self, seq=seq, opponent_grid=self.opponent_grid.to_bytes(),
+                            player_grid=None if self.player_grid is None else self.player_grid.to_bytes(),
+                            turn=self.turn)
+
+    def _attack(self, row, column, player=None) -> BoardAttack:
+        if GameStatus(self.game_status) is GameStatus.FINISHED or player != self.turn:
+            return BoardAttack(AttackStatus.INVALID, [])
+
+        board = self.target_grid(player)
+        board_attack = board.attack(row, column)
+        if board_attack.attack_status is AttackStatus.MISSED and self.two_player:
+            self.turn = self.PLAYERS[1] if player == self.PLAYERS[0] else self.PLAYERS[0]
+        if board_attack.attack_status is AttackStatus.KILLED and board.ship_cells_left == 0:
+            self.game_status = GameStatus.FINISHED.value
+
+        return board_attack
+
+
+class Attack(models.Model):
+    """
+    Append-only log of the attacks of the games that changed their board, numbered by seq from 1 in each game
+    """
+    # indexed by the (game, seq) unique index
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='attacks', db_index=False)
+    seq = models.PositiveIntegerField()
+    # attacking player of a two player game
+    player = models.PositiveSmallIntegerField(null=True)
+    row = models.PositiveSmallIntegerField()
+    column = models.PositiveSmallIntegerField()
+    result = models.CharField(max_length=10, choices=[(status.value, status.value) for status in AttackStatus])
+
+    class Meta:
+        unique_together = [('game', 'seq')]
+
+
+class GameSnapshot(models.Model):
+    """
+    Boards of a game after its first seq logged attacks, the starting point of its replays
+    """
+    # indexed by the (game, seq) unique index
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='snapshots', db_index=False)
+    seq = models.PositiveIntegerField()
+    opponent_grid = BoardField()
+    player_grid = BoardField(null=True)
+    turn = models.PositiveSmallIntegerField(null=True)
+
+    class Meta:
+        unique_together = [('game', 'seq')]
+
+
+class PooledBoard(models.Model):
+    """
+    Board generated ahead of time, waiting to be claimed by a new game
+    """
+    grid_size = models.PositiveSmallIntegerField(default=Game.GRID_SIZE)
+    opponent_grid = BoardField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # claims take the oldest board of a size
+        indexes = [models.Index(fields=['grid_size', 'id'], name='pooled_board_grid_size_id_idx')]
+
+
+class MatchTicket(models.Model):
+    """
+    Player waiting in the matchmaking queue for a two player game, then the player of the game it was paired into
+    """
+    # secret of the ticket, its player polls it with the key
+    key = models.CharField(max_length=32, unique=True, default=new_token)
+    # indexed for the expiry of the tickets and the wait time statistics
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    # None while waiting
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, null=True, related_name='tickets', db_index=False)
+    player = models.PositiveSmallIntegerField(null=True)
+    matched_at = models.DateTimeField(null=True)
+
+    class Meta:
+        # the queue, the waiting tickets in order of arrival
+        indexes = [models.Index(fields=['game', 'id'])]
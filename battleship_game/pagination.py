@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class GameCursorPagination(CursorPagination):
+    """
+    Keyset pagination of the games on their id: a page is a range scan of the primary key (or of the status index when
+    filtering), whatever its depth in the list
+    """
+    ordering = 'id'
+    page_size = 100
+    page_size_query_param = 'pageSize'
+    max_page_size = 1000
@@ -0,0 +1,196 @@
+"""
+Pool of boards generated ahead of time, so that creating a game does not place a fleet inside the request.
+Besides the standard boards it holds the boards of the grid sizes whose fleet is too big to place inside a request.
+The pool is kept full by fill_pool, run by the fill_board_pool management command or by the in-process PoolWorker
+thread, and is configured by the BATTLESHIP_BOARD_POOL setting.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction, close_old_connections
+
+from battleship_game.factories import create_random_boards, BULK_CREATE_BATCH_SIZE
+from battleship_game.metrics import DURATION_BUCKETS, duration_bucket
+from battleship_game.models import PooledBoard, Game
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # number of ready boards to keep, 0 disables the pool
+    'SIZE': 0,
+    # number of ready boards to keep of other grid sizes, {grid_size: count}
+    'GRID_SIZES': {},
+    # seconds between two refills of the worker
+    'REFILL_INTERVAL': 1.0,
+    # run the worker as a thread of the web process
+    'THREAD': False,
+}
+
+
+def pool_settings():
+    return dict(DEFAULTS, **getattr(settings, 'BATTLESHIP_BOARD_POOL', {}))
+
+
+def pool_targets(size=None):
+    """
+    Number of boards to keep ready per grid size
+    :param size: number of standard boards, the configured SIZE by default
+    :return: dict of grid size to number of boards
+    """
+    config = pool_settings()
+    targets = dict(config['GRID_SIZES'])
+    targets[Game.GRID_SIZE] = config['SIZE'] if size is None else size
+    return targets
+
+
+class PoolStats:
+    """
+    In-process counters of the pool claims, served with the request metrics by the web process
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.claims = 0
+        self.hits = 0
+        self.claim_seconds_total = 0.0
+        self.claim_seconds_max = 0.0
+        # claims per duration bucket, the last one unbounded
+        self.claim_buckets = [0] * (len(DURATION_BUCKETS) + 1)
+        self.boards_generated = 0
+
+    def record_claim(self, hit, seconds):
+        with self._lock:
+            self.claims += 1
+            self.hits += hit
+            self.claim_seconds_total += seconds
+            self.claim_seconds_max = max(self.claim_seconds_max, seconds)
+            self.claim_buckets[duration_bucket(seconds)] += 1
+
+    def record_fill(self, count):
+        with self._lock:
+            self.boards_generated += count
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'claims': self.claims,
+                'hits': self.hits,
+                'misses': self.claims - self.hits,
+                'claim_seconds_avg': self.claim_seconds_total / self.claims if self.claims else 0.0,
+                'claim_seconds_max': self.claim_seconds_max,
+                'claim_seconds_total': self.claim_seconds_total,
+                'claim_buckets': list(self.claim_buckets),
+                'boards_generated': self.boards_generated,
+            }
+
+
+pool_stats = PoolStats()
+
+
+def claim_board(grid_size=Game.GRID_SIZE):
+    """
+    Take a board out of the pool
+    :param grid_size: size of the board
+    :return: the claimed Board, None when the pool does not hold the size or is empty
+    """
+    boards = claim_boards(1, grid_size)
+    return boards[0] if boards else None
+
+
+def claim_boards(count, grid_size=Game.GRID_SIZE):
+    """
+    Take boards out of the pool, all of them or none. Concurrent claims skip the rows locked by each other instead of
+    waiting
+    :param count: number of boards
+    :param grid_size: size of the boards
+    :return: list of the claimed Board, empty when the pool does not hold the size or has less than count boards
+    """
+    if not pool_targets().get(grid_size):
+        return []
+
+    start = time.perf_counter()
+    with transaction.atomic():
+        pooled = list(PooledBoard.objects.select_for_update(skip_locked=True)
+                      .filter(grid_size=grid_size).order_by('id')[:count])
+        if len(pooled) == count:
+            PooledBoard.objects.filter(pk__in=[board.pk for board in pooled]).delete()
+        else:
+            pooled = []
+
+    pool_stats.record_claim(bool(pooled), time.perf_counter() - start)
+    return [board.opponent_grid for board in pooled]
+
+
+def pool_depth(grid_size=None):
+    """
+    Number of boards in the pool
+    :param grid_size: count only the boards of this size, all of them by default
+    """
+    boards = PooledBoard.objects.all()
+    if grid_size is not None:
+        boards = boards.filter(grid_size=grid_size)
+    return boards.count()
+
+
+def fill_pool(size=None):
+    """
+    Generate the boards missing for the pool to hold its target of every grid size
+    :param size: target number of standard boards, the configured SIZE by default
+    :return: number of boards added
+    """
+    added = 0
+    for grid_size, target in sorted(pool_targets(size).items()):
+        missing = target - pool_depth(grid_size)
+        if missing <= 0:
+            continue
+
+        # as many cells per batch as the standard boards take, each batch can be claimed as soon as it is inserted
+        batch_size = max(1, BULK_CREATE_BATCH_SIZE * Game.GRID_SIZE ** 2 // grid_size ** 2)
+        for done in range(0, missing, batch_size):
+            count = min(batch_size, missing - done)
+            PooledBoard.objects.bulk_create(
+                [PooledBoard(grid_size=grid_size, opponent_grid=board)
+                 for board in create_random_boards(count, grid_size)])
+            pool_stats.record_fill(count)
+            added += count
+
+    return added
+
+
+def stats():
+    """
+    Pool metrics: the live depth and the claim counters of this process
+    """
+    return dict(pool_stats.as_dict(), depth=pool_depth())
+
+
+class PoolWorker(threading.Thread):
+    """
+    Daemon thread refilling the pool every REFILL_INTERVAL seconds
+    """
+
+    def __init__(self, size=None, interval=None):
+        super().__init__(name='board-pool-worker', daemon=True)
+        config = pool_settings()
+        self.size = config['SIZE'] if size is None else size
+        self.interval = config['REFILL_INTERVAL'] if interval is None else interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                fill_pool(self.size)
+            except Exception:
+                logger.exception('Board pool refill failed')
+            finally:
+                close_old_connections()
+
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,10 @@
+from rest_framework.renderers import JSONRenderer
+
+
+class EventStreamRenderer(JSONRenderer):
+    """
+    Renderer negotiated by the server-sent events endpoints. The event streams are written by the views themselves,
+    the renderer only renders their errors, as JSON
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
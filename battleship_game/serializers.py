@@ -1,7 +1,32 @@
-from rest_framework import serializers
+import base64
+from collections import Counter, OrderedDict
 
-from battleship_game.factories import create_random_game
-from battleship_game.models import Game, GameCell
+from rest_framework import exceptions, serializers, status
+from rest_framework.settings import api_settings
+
+from battleship_game import metrics
+from battleship_game.enums import TicketStatus
+from battleship_game.factories import create_random_game, create_random_games, check_fleet, FleetPlacementError, \
+    MAX_FLEET_LENGTH, MAX_FLEET_CELLS, placed_inline, proportional_fleet
+from battleship_game.matchmaking import enqueue
+from battleship_game.models import Game, GameCell, MatchTicket
+from battleship_game.pool import claim_boards, pool_targets
+
+
+class NoBoardReady(exceptions.APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'No board of this size is ready, retry later.'
+    default_code = 'no_board_ready'
+
+
+class TimedSerializerMixin:
+    """
+    Serializer timing its representations as the serialize phase of the request metrics
+    """
+
+    def to_representation(self, instance):
+        with metrics.phase(metrics.SERIALIZE):
+            return super().to_representation(instance)
 
 
 class GameCellField(serializers.CharField):
@@ -16,23 +41,166 @@ class GameCellField(serializers.CharField):
         return super().to_representation(value)
 
 
-class GameSerializer(serializers.ModelSerializer):
+GRID_CELLS = 'cells'
+GRID_ROWS = 'rows'
+GRID_BITMASKS = 'bitmasks'
+GRID_FORMATS = (GRID_CELLS, GRID_ROWS, GRID_BITMASKS)
+
+# fields of the two player games only
+TWO_PLAYER_FIELDS = ('playerGrid', 'turn', 'player')
+
+RESPONSE_FULL = 'full'
+RESPONSE_DELTA = 'delta'
+RESPONSE_MODES = (RESPONSE_FULL, RESPONSE_DELTA)
+
+# cell sets sent by the bitmasks grid format, ship cells are hidden
+_GRID_BITMASKS = (('missed', 'misses'), ('injured', 'hits'), ('killed', 'killed'))
+
+
+class OpponentGridField(serializers.Field):
     """
-    Main game serializer
+    Read only field rendering a board of a game with the Exiting ship cells hidden, in the grid_format of the context.
+    The board is the one attacked by the player of the context, the opponent grid but for the second player of a two
+    player game. With own=True it is the board of the player instead, with the ship cells shown to that player; a
+    single player game has no such board.
+    Grid formats:
+    - cells (default): list of rows, each a list of cell values. Same output as a ListField of ListFields of
+    GameCellField, without a field call per cell
+    - rows: list of rows, each a string of cell values
+    - bitmasks: base64 of the missed, injured and killed cells, bit ``row * size + column`` standing for a cell,
+    least significant bit of the first byte first
     """
-    opponentGrid = serializers.ListField(
-        child=serializers.ListField(
-            child=GameCellField()
-        ),
-        source='opponent_grid', read_only=True)
+
+    def __init__(self, own=False, **kwargs):
+        kwargs['read_only'] = True
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+        self.own = own
+
+    def get_attribute(self, instance):
+        player = self.context.get('player')
+        return instance.own_grid(player) if self.own else instance.target_grid(player)
+
+    def to_representation(self, value):
+        grid_format = self.context.get('grid_format', GRID_CELLS)
+        hidden = () if self.own and self.context.get('player') else GameCell.hidden_cells()
+
+        if grid_format == GRID_BITMASKS:
+            masks = _GRID_BITMASKS if hidden else _GRID_BITMASKS + (('ships', 'ships'),)
+            return OrderedDict(
+                (name, base64.b64encode(getattr(value, attribute).to_bytes()).decode('ascii'))
+                for name, attribute in masks)
+
+        if grid_format == GRID_ROWS:
+            text = value.to_text(hidden=hidden)
+            return [text[start:start + value.size] for start in range(0, len(text), value.size)]
+
+        return value.to_grid(hidden=hidden)
+
+
+class GameSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Main game serializer.
+    A new game is played on a gridSize x gridSize board with the given fleet of ship sizes, both optional:
+    the standard board by default, and the standard fleet scaled to the board. With 2 players, each player gets such
+    a board.
+    A two player game is seen by the player of the context, None for the spectators: opponentGrid and the ship counts
+    are those of the board the player attacks, playerGrid is the board of the player. The spectators see the game as
+    the first player does, without the ships
+    """
+    opponentGrid = OpponentGridField()
+    playerGrid = OpponentGridField(own=True)
     status = serializers.CharField(source='game_status', read_only=True)
+    turn = serializers.IntegerField(read_only=True)
+    player = serializers.SerializerMethodField()
+    shipsLeft = serializers.SerializerMethodField()
+    shipCellsLeft = serializers.SerializerMethodField()
+    # the bounds are checked by the validate methods: field validators are built again for every game serialized
+    gridSize = serializers.IntegerField(source='grid_size', required=False)
+    fleet = serializers.ListField(child=serializers.IntegerField(), write_only=True, required=False,
+                                  allow_empty=False)
+    players = serializers.IntegerField(write_only=True, required=False)
+
+    max_fleet_length = MAX_FLEET_LENGTH
 
     class Meta:
         model = Game
-        fields = ('id', 'opponentGrid', 'status')
+        fields = ('id', 'opponentGrid', 'playerGrid', 'status', 'turn', 'player', 'shipsLeft', 'shipCellsLeft',
+                  'gridSize', 'fleet', 'players')
+
+    def validate_gridSize(self, value):
+        if value < 1:
+            raise serializers.ValidationError('Ensure this value is greater than or equal to 1.', code='min_value')
+        if value > Game.MAX_GRID_SIZE:
+            raise serializers.ValidationError(
+                'Ensure this value is less than or equal to {}.'.format(Game.MAX_GRID_SIZE), code='max_value')
+
+        return value
+
+    def get_player(self, game):
+        return self.context.get('player')
+
+    def get_shipsLeft(self, game):
+        return game.target_grid(self.context.get('player')).ships_left
+
+    def get_shipCellsLeft(self, game):
+        return game.target_grid(self.context.get('player')).ship_cells_left
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if data.get('turn', True) is None:
+            # a single player game
+            for field_name in TWO_PLAYER_FIELDS:
+                del data[field_name]
+
+        return data
+
+    def validate_players(self, value):
+        if value not in Game.PLAYERS:
+            raise serializers.ValidationError('A game has 1 or 2 players.', code='invalid_choice')
+
+        return value
+
+    def validate_fleet(self, value):
+        if len(value) > self.max_fleet_length:
+            raise serializers.ValidationError(
+                'Ensure this field has no more than {} elements.'.format(self.max_fleet_length), code='max_length')
+        if min(value) < 1:
+            raise serializers.ValidationError('Ensure every ship size is greater than or equal to 1.',
+                                              code='min_value')
+        if sum(value) > MAX_FLEET_CELLS:
+            raise serializers.ValidationError(
+                'Ensure the ships have no more than {} cells in all.'.format(MAX_FLEET_CELLS), code='max_length')
+
+        return value
+
+    def validate(self, attrs):
+        grid_size = attrs.get('grid_size', Game.GRID_SIZE)
+        if 'fleet' in attrs:
+            try:
+                check_fleet(grid_size, attrs['fleet'])
+            except FleetPlacementError as error:
+                raise serializers.ValidationError({'fleet': [str(error)]})
+        elif not pool_targets().get(grid_size) and not placed_inline(proportional_fleet(grid_size)):
+            # the default fleet of a big board is only taken from the pool
+            raise serializers.ValidationError(
+                {'gridSize': ['No board of this size is kept ready, pass a fleet or a smaller size.']})
+
+        return attrs
 
     def create(self, validated_data):
-        instance = create_random_game()
+        grid_size = validated_data.get('grid_size', Game.GRID_SIZE)
+        ships = validated_data.get('fleet')
+        players = validated_data.get('players', 1)
+        boards = claim_boards(players, grid_size) if ships is None else []
+        if ships is None and not boards and not placed_inline(proportional_fleet(grid_size)):
+            raise NoBoardReady()
+
+        board, player_board = (boards + [None, None])[:2]
+        try:
+            instance = create_random_game(board, grid_size, ships, players, player_board)
+        except FleetPlacementError as error:
+            raise serializers.ValidationError({'fleet': [str(error)]})
 
         return instance
 
@@ -47,17 +215,177 @@ class GameListSerializer(GameSerializer):
         fields = ('id', 'status')
 
 
+class BulkCreateGamesSerializer(serializers.Serializer):
+    """
+    Write only serializer for bulk game creation calls
+    """
+    max_count = 1000
+
+    count = serializers.IntegerField(required=True, min_value=1, max_value=max_count)
+
+    def create(self, validated_data):
+        return create_random_games(validated_data['count'])
+
+
+class AttackCellListSerializer(serializers.ListSerializer):
+    """
+    Write only serializer for a batch of attacks, at most one shot per cell of the grid and max_attacks shots
+    """
+    max_attacks = 1000
+
+    def to_internal_value(self, data):
+        # checked before the attacks are validated one by one
+        max_length = min(self.context.get('grid_size', Game.GRID_SIZE) ** 2, self.max_attacks)
+        if isinstance(data, list) and len(data) > max_length:
+            message = 'Ensure there are no more than {} attacks.'.format(max_length)
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [message]}, code='max_length')
+
+        return super().to_internal_value(data)
+
+
 class AttackCellSerializer(serializers.Serializer):
     """
-    Write only serializer for attack cell calls
+    Write only serializer for attack cell calls.
+    Cells must be on the board of the grid_size passed in the context, GRID_SIZE by default
     """
-    row = serializers.IntegerField(required=True, min_value=0, max_value=Game.GRID_SIZE - 1)
-    column = serializers.IntegerField(required=True, min_value=0, max_value=Game.GRID_SIZE - 1)
+    row = serializers.IntegerField(required=True, min_value=0)
+    column = serializers.IntegerField(required=True, min_value=0)
 
+    class Meta:
+        list_serializer_class = AttackCellListSerializer
 
-class AttackResponseSerializer(serializers.Serializer):
+    def validate_row(self, value):
+        return self._validate_on_grid('row', value)
+
+    def validate_column(self, value):
+        return self._validate_on_grid('column', value)
+
+    def _validate_on_grid(self, field_name, value):
+        max_value = self.context.get('grid_size', Game.GRID_SIZE) - 1
+        if value > max_value:
+            message = self.fields[field_name].error_messages['max_value'].format(max_value=max_value)
+            raise serializers.ValidationError(message, code='max_value')
+
+        return value
+
+
+class AttackResponseSerializer(TimedSerializerMixin, serializers.Serializer):
     """
     Read only serializer for attack cell response
     """
     attackStatus = serializers.CharField(source='attack_status.value', read_only=True)
     game = GameSerializer(read_only=True)
+
+
+class AttacksResponseSerializer(TimedSerializerMixin, serializers.Serializer):
+    """
+    Read only serializer for batch attack response
+    """
+    attackStatuses = serializers.SerializerMethodField()
+    game = GameSerializer(read_only=True)
+
+    def get_attackStatuses(self, response):
+        return [attack_status.value for attack_status in response.attack_statuses]
+
+
+class GameDeltaSerializer(TimedSerializerMixin, serializers.Serializer):
+    """
+    Read only serializer for the game state after an attack, with only the cells changed by the attack as
+    [row, column, cell] instead of the whole grid.
+    In a two player game the changes and the ship counts are those of the board attacked by the player
+    """
+    id = serializers.IntegerField(source='game.id', read_only=True)
+    status = serializers.CharField(source='game.game_status', read_only=True)
+    turn = serializers.IntegerField(source='game.turn', read_only=True)
+    player = serializers.IntegerField(read_only=True)
+    shipsLeft = serializers.SerializerMethodField()
+    shipCellsLeft = serializers.SerializerMethodField()
+    changes = serializers.SerializerMethodField()
+
+    def get_shipsLeft(self, response):
+        return response.game.target_grid(response.player).ships_left
+
+    def get_shipCellsLeft(self, response):
+        return response.game.target_grid(response.player).ship_cells_left
+
+    def get_changes(self, response):
+        return [[row, column, value] for row, column, value in response.changes]
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if data['turn'] is None:
+            del data['turn'], data['player']
+
+        return data
+
+
+class AttackDeltaResponseSerializer(GameDeltaSerializer):
+    """
+    Read only serializer for attack cell delta response
+    """
+    attackStatus = serializers.CharField(source='attack_status.value', read_only=True)
+
+
+class AttacksDeltaResponseSerializer(GameDeltaSerializer):
+    """
+    Read only serializer for batch attack delta response
+    """
+    attackStatuses = serializers.SerializerMethodField()
+
+    def get_attackStatuses(self, response):
+        return [attack_status.value for attack_status in response.attack_statuses]
+
+
+class ShipSerializer(TimedSerializerMixin, serializers.Serializer):
+    """
+    Read only serializer for a killed ship of a game
+    """
+    size = serializers.IntegerField(read_only=True)
+    cells = serializers.SerializerMethodField()
+
+    def get_cells(self, ship):
+        return [[row, column] for row, column in ship.cells()]
+
+
+class FleetSerializer(TimedSerializerMixin, serializers.Serializer):
+    """
+    Read only serializer for the ship registry of a game: the killed ships with their cells, and only the number of
+    ships afloat per size, which the fleet discloses anyway, so that a hit never tells the size of its ship
+    """
+    killed = serializers.SerializerMethodField()
+    afloat = serializers.SerializerMethodField()
+
+    def get_killed(self, fleet):
+        return ShipSerializer([ship for ship in fleet if ship.killed], many=True).data
+
+    def get_afloat(self, fleet):
+        sizes = Counter(ship.size for ship in fleet if not ship.killed)
+        return [OrderedDict([('size', size), ('count', count)]) for size, count in sorted(sizes.items(), reverse=True)]
+
+
+class MatchTicketSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Matchmaking ticket of a player. Once paired, it holds the game, the player in the game and the token of the player
+    """
+    status = serializers.SerializerMethodField()
+    game = serializers.IntegerField(source='game_id', read_only=True)
+    playerToken = serializers.SerializerMethodField()
+    createdAt = serializers.DateTimeField(source='created_at', read_only=True)
+    matchedAt = serializers.DateTimeField(source='matched_at', read_only=True)
+
+    class Meta:
+        model = MatchTicket
+        fields = ('key', 'status', 'game', 'player', 'playerToken', 'createdAt', 'matchedAt')
+        read_only_fields = ('key', 'player')
+
+    def get_status(self, ticket):
+        return (TicketStatus.WAITING if ticket.game_id is None else TicketStatus.MATCHED).value
+
+    def get_playerToken(self, ticket):
+        if ticket.game_id is None:
+            return None
+
+        return ticket.game.player1_token if ticket.player == Game.PLAYERS[0] else ticket.game.player2_token
+
+    def create(self, validated_data):
+        return enqueue()
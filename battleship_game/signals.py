@@ -0,0 +1,4 @@
+from django.dispatch import Signal
+
+# sent once the transaction of an attack is committed, response is the AttackCellsResponse of the attacks
+game_attacked = Signal(providing_args=['response'])
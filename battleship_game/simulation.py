@@ -0,0 +1,124 @@
+"""
+Offline simulation of whole games: random boards attacked by a strategy of battleship_game/strategies.py until every
+ship is killed, to measure the shots a strategy needs to win.
+Games are played on the Board engine in memory, nothing is saved, and spread over a pool of processes in chunks.
+"""
+import math
+import random
+from collections import Counter, OrderedDict
+from multiprocessing import Pool
+
+from battleship_game.enums import AttackStatus
+from battleship_game.factories import create_random_board, proportional_fleet
+from battleship_game.models import Game
+from battleship_game.strategies import STRATEGIES
+
+# games played by a worker process per task
+CHUNK_SIZE = 500
+
+
+def play_game(strategy_class, rng=random, grid_size=Game.GRID_SIZE, fleet=None):
+    """
+    Play a game on a random board until every ship is killed
+    :param strategy_class: Strategy subclass attacking the board
+    :param rng: random number generator of the board and the strategy
+    :param grid_size: board size
+    :param fleet: ship sizes, by default the standard fleet scaled to the board (see proportional_fleet)
+    :return: number of shots to win
+    """
+    if fleet is None:
+        fleet = proportional_fleet(grid_size)
+    board = create_random_board(rng, grid_size, fleet)
+    strategy = strategy_class(grid_size, fleet, rng)
+
+    shots = 0
+    while board.ship_cells_left:
+        row, column = strategy.next_shot()
+        attack_status, changed = board.attack(row, column)
+        if attack_status is AttackStatus.INVALID:
+            raise ValueError('{} shot the opened cell ({}, {})'.format(strategy_class.__name__, row, column))
+
+        shots += 1
+        strategy.record(attack_status, [(r, c, board.cell(r * grid_size + c)) for r, c in changed])
+
+    return shots
+
+
+def play_chunk(task):
+    """
+    Play a chunk of games in a worker process, seeded from the simulation seed and the chunk number so that a
+    simulation is reproducible whatever the number of processes
+    :param task: (strategy name, grid size, fleet, seed, chunk number, number of games)
+    :return: Counter of the games by shots to win
+    """
+    strategy, grid_size, fleet, seed, chunk, games = task
+    rng = random.Random('{}:{}'.format(seed, chunk))
+    return Counter(play_game(STRATEGIES[strategy], rng, grid_size, fleet) for _ in range(games))
+
+
+def simulate(games, strategy='density', grid_size=Game.GRID_SIZE, fleet=None, processes=None, seed=None,
+             chunk_size=CHUNK_SIZE):
+    """
+    Play games with a strategy, in parallel
+    :param games: number of games
+    :param strategy: name of the strategy, a key of STRATEGIES
+    :param grid_size: board size
+    :param fleet: ship sizes, by default the standard fleet scaled to the board
+    :param processes: worker processes, one per core by default, 1 to play in the calling process
+    :param seed: seed of the games, a random one by default
+    :param chunk_size: games played by a worker per task
+    :return: Counter of the games by shots to win
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError('Unknown strategy {}'.format(strategy))
+    if fleet is None:
+        fleet = proportional_fleet(grid_size)
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+
+    tasks = [(strategy, grid_size, list(fleet), seed, chunk, min(chunk_size, games - start))
+             for chunk, start in enumerate(range(0, games, chunk_size))]
+
+    distribution = Counter()
+    if processes == 1:
+        for task in tasks:
+            distribution.update(play_chunk(task))
+    else:
+        with Pool(processes) as pool:
+            for chunk_distribution in pool.imap_unordered(play_chunk, tasks):
+                distribution.update(chunk_distribution)
+
+    return distribution
+
+
+def summarize(distribution):
+    """
+    Statistics of a shots to win distribution
+    :param distribution: Counter of the games by shots to win
+    :return: OrderedDict with the number of games, the mean, the minimum, the percentiles and the maximum
+    """
+    games = sum(distribution.values())
+    if not games:
+        return OrderedDict(games=0)
+
+    summary = OrderedDict([
+        ('games', games),
+        ('mean', sum(shots * count for shots, count in distribution.items()) / games),
+        ('min', min(distribution)),
+    ])
+    for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+        summary[name] = percentile(distribution, fraction)
+    summary['max'] = max(distribution)
+    return summary
+
+
+def percentile(distribution, fraction):
+    """
+    Smallest number of shots that at least fraction of the games did not exceed
+    """
+    rank = max(1, math.ceil(sum(distribution.values()) * fraction))
+    seen = 0
+    for shots in sorted(distribution):
+        seen += distribution[shots]
+        if seen >= rank:
+            return shots
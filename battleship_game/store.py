@@ -0,0 +1,267 @@
+"""
+In-memory store of the games in progress, so that an attack does not write its game to the database.
+With the BATTLESHIP_GAME_STORE setting ENABLED, the attacked games are kept in the memory of the process and attacked
+there, and the GameFlusher thread checkpoints the changed games to the database every FLUSH_INTERVAL seconds.
+A finished game is written before the response of its last attack is sent, then leaves the store; a game in progress
+leaves it once checkpointed and idle for IDLE_TIMEOUT seconds.
+A crash of the process loses the attacks made since the last checkpoint of its games in progress, never a finished
+game. The store is per process: every request on a game must reach the same process.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction, close_old_connections
+
+from battleship_game import cache, metrics
+from battleship_game.enums import GameStatus
+from battleship_game.models import Game, Attack, GameSnapshot
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # keep the attacked games in memory instead of saving them on every attack
+    'ENABLED': False,
+    # seconds between two checkpoints of the changed games
+    'FLUSH_INTERVAL': 0.2,
+    # seconds after which an unchanged game leaves the store
+    'IDLE_TIMEOUT': 300,
+}
+
+
+def store_settings():
+    return dict(DEFAULTS, **getattr(settings, 'BATTLESHIP_GAME_STORE', {}))
+
+
+def store_enabled():
+    return store_settings()['ENABLED']
+
+
+# boards of a game, the player grid of the two player games only
+BOARD_FIELDS = ('opponent_grid', 'player_grid')
+
+
+class StoredGame:
+    """
+    Game of the store with the lock held by its attacks and checkpoints
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.lock = threading.Lock()
+        # changed since its last checkpoint
+        self.dirty = False
+        # out of the store, to be loaded again from the database
+        self.evicted = False
+        self.last_used = time.monotonic()
+        # opened cells of each board at the last checkpoint, only the boards attacked since are written
+        self.board_versions = self.current_board_versions()
+
+    def current_board_versions(self):
+        return {field_name: cache.board_version(getattr(self.game, field_name))
+                for field_name in BOARD_FIELDS if getattr(self.game, field_name) is not None}
+
+    @property
+    def finished(self):
+        return GameStatus(self.game.game_status) is GameStatus.FINISHED
+
+
+class GameStore:
+    """
+    Games in progress of the process, by id
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._games = {}
+        # bumped by every eviction, a game loaded meanwhile may be older than its last checkpoint
+        self._evictions = 0
+        # checkpoints are written one at a time, so that an earlier state never overwrites a later one
+        self._flush_lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._games)
+
+    def __contains__(self, game_id):
+        with self._lock:
+            return game_id in self._games
+
+    @contextmanager
+    def checkout(self, game_id, load=True):
+        """
+        Game of the store, locked for the block. A changed game is checkpointed by the next flush, at once when it
+        is finished
+        :param game_id: id of the game
+        :param load: whether to load a game missing from the store from the database, finished games are not stored
+        :return: context manager giving the Game, None when it does not exist or is not loaded
+        """
+        stored = self._lock_game(game_id, load)
+        if stored is None:
+            yield None
+            return
+
+        version = cache.game_version(stored.game)
+        try:
+            yield stored.game
+        finally:
+            stored.dirty = stored.dirty or cache.game_version(stored.game) != version
+            stored.last_used = time.monotonic()
+            finished = stored.dirty and stored.finished
+            stored.lock.release()
+
+        if finished:
+            self.flush([stored])
+            self._evict(stored, 0)
+
+    def checkpoint(self, game_id):
+        """
+        Checkpoint a game of the store at once, if the store holds it
+        """
+        with self._lock:
+            stored = self._games.get(game_id)
+        if stored is not None:
+            self.flush([stored])
+
+    def flush(self, stored_games=None):
+        """
+        Checkpoint the changed games and their attack logs to the database, in one transaction
+        :param stored_games: StoredGame list, all the games of the store by default
+        :return: number of games written
+        """
+        with self._flush_lock:
+            if stored_games is None:
+                with self._lock:
+                    stored_games = list(self._games.values())
+
+            checkpoints = []
+            for stored in stored_games:
+                with stored.lock:
+                    if stored.dirty:
+                        game = stored.game
+                        board_versions = stored.current_board_versions()
+                        values = {'game_status': game.game_status, 'shots': game.shots, 'turn': game.turn}
+                        values.update((field_name, getattr(game, field_name).to_bytes())
+                                      for field_name, version in board_versions.items()
+                                      if version != stored.board_versions[field_name])
+                        checkpoints.append((stored, values, board_versions, game.take_log()))
+                        stored.dirty = False
+
+            try:
+                with transaction.atomic():
+                    for stored, values, _, _ in checkpoints:
+                        if not Game.objects.filter(pk=stored.game.pk).update(**values):
+                            logger.warning('Game %s was deleted before its checkpoint', stored.game.pk)
+
+                    logs = [log for _, _, _, log in checkpoints]
+                    Attack.objects.bulk_create([attack for attacks, _ in logs for attack in attacks])
+                    GameSnapshot.objects.bulk_create([snapshot for _, snapshots in logs for snapshot in snapshots])
+            except Exception:
+                for stored, _, _, log in checkpoints:
+                    with stored.lock:
+                        stored.dirty = True
+                        stored.game.restore_log(log)
+                raise
+
+            for stored, _, board_versions, _ in checkpoints:
+                with stored.lock:
+                    stored.board_versions = board_versions
+
+            return len(checkpoints)
+
+    def evict_idle(self, idle_timeout=None):
+        """
+        Drop the checkpointed games idle for idle_timeout seconds, IDLE_TIMEOUT by default
+        :return: number of games dropped
+        """
+        if idle_timeout is None:
+            idle_timeout = store_settings()['IDLE_TIMEOUT']
+
+        with self._lock:
+            stored_games = list(self._games.values())
+
+        return sum(self._evict(stored, idle_timeout) for stored in stored_games)
+
+    def clear(self):
+        with self._lock:
+            for stored in self._games.values():
+                stored.evicted = True
+            self._games.clear()
+            self._evictions += 1
+
+    def _lock_game(self, game_id, load):
+        while True:
+            stored = self._get(game_id, load)
+            if stored is None:
+                return None
+
+            stored.lock.acquire()
+            if not stored.evicted:
+                return stored
+            stored.lock.release()
+
+    def _get(self, game_id, load):
+        while True:
+            with self._lock:
+                stored = self._games.get(game_id)
+                evictions = self._evictions
+            if stored is not None or not load:
+                return stored
+
+            with metrics.phase(metrics.DB_LOAD):
+                game = Game.objects.filter(pk=game_id).first()
+            if game is None:
+                return None
+            if GameStatus(game.game_status) is GameStatus.FINISHED:
+                return StoredGame(game)
+
+            with self._lock:
+                if self._evictions == evictions:
+                    return self._games.setdefault(game_id, StoredGame(game))
+
+    def _evict(self, stored, idle_timeout):
+        with stored.lock:
+            if stored.evicted or stored.dirty:
+                return False
+            if not stored.finished and time.monotonic() - stored.last_used < idle_timeout:
+                return False
+
+            stored.evicted = True
+            with self._lock:
+                if self._games.get(stored.game.pk) is stored:
+                    del self._games[stored.game.pk]
+                self._evictions += 1
+
+        # the game is read through the game cache again
+        cache.write_through(stored.game)
+        return True
+
+
+game_store = GameStore()
+
+
+class GameFlusher(threading.Thread):
+    """
+    Daemon thread checkpointing the games of the store every FLUSH_INTERVAL seconds
+    """
+
+    def __init__(self, store=None, interval=None):
+        super().__init__(name='game-store-flusher', daemon=True)
+        self.store = game_store if store is None else store
+        self.interval = store_settings()['FLUSH_INTERVAL'] if interval is None else interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.store.flush()
+                self.store.evict_idle()
+            except Exception:
+                logger.exception('Game store checkpoint failed')
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,334 @@
+"""
+Attacker strategies: players choosing their shots from what the game shows of the board, the cells opened by the
+previous shots. They drive the offline simulations of battleship_game/simulation.py.
+"""
+import random
+from collections import Counter, OrderedDict
+
+from battleship_game.enums import GameCell
+
+
+class Strategy:
+    """
+    Attacker of a game. It is told the result of every shot through record() and picks the next one with next_shot()
+    """
+
+    def __init__(self, grid_size, fleet, rng=random):
+        """
+        :param grid_size: board size
+        :param fleet: ship sizes of the game
+        :param rng: random number generator
+        """
+        self.grid_size = grid_size
+        self.fleet = list(fleet)
+        self.rng = rng
+        # 1 for the opened cells, by index row * grid_size + column
+        self.opened = bytearray(grid_size * grid_size)
+
+    def next_shot(self):
+        """
+        :return: (row, column) of the next shot, a cell not opened yet
+        """
+        raise NotImplementedError
+
+    def record(self, attack_status, changes):
+        """
+        Take the result of a shot into account
+        :param attack_status: AttackStatus of the shot
+        :param changes: (row, column, GameCell value) of the cells the shot changed, see AttackCellResponse
+        """
+        for row, column, _ in changes:
+            self.opened[row * self.grid_size + column] = 1
+
+
+class RandomStrategy(Strategy):
+    """
+    Shoots the cells not opened yet in a random order
+    """
+
+    def __init__(self, grid_size, fleet, rng=random):
+        super().__init__(grid_size, fleet, rng)
+        # shuffled on the first shot, a strategy hunting otherwise may never need it
+        self._cells = None
+
+    def next_shot(self):
+        if self._cells is None:
+            self._cells = list(range(self.grid_size * self.grid_size))
+            self.rng.shuffle(self._cells)
+        while self.opened[self._cells[-1]]:
+            self._cells.pop()
+
+        return divmod(self._cells[-1], self.grid_size)
+
+
+class HuntTargetStrategy(RandomStrategy):
+    """
+    Hunts with random shots until a ship is injured, then targets the cells extending the injured cells of the ship
+    until it is killed
+    """
+
+    def __init__(self, grid_size, fleet, rng=random):
+        super().__init__(grid_size, fleet, rng)
+        # injured cells of the ships not killed yet
+        self.injured = set()
+
+    def record(self, attack_status, changes):
+        super().record(attack_status, changes)
+        for row, column, value in changes:
+            index = row * self.grid_size + column
+            if value == GameCell.INJURED.value:
+                self.injured.add(index)
+            elif value == GameCell.KILLED.value:
+                self.injured.discard(index)
+
+    def next_shot(self):
+        targets = self.targets()
+        if targets:
+            return divmod(self.choose_target(targets), self.grid_size)
+
+        return self.hunt()
+
+    def hunt(self):
+        return super().next_shot()
+
+    def choose_target(self, targets):
+        return self.rng.choice(targets)
+
+    def targets(self):
+        """
+        Cells not opened yet that may extend an injured ship: both ends of the line of its injured cells, or the four
+        neighbours of a single injured cell
+        :return: list of cell indexes
+        """
+        size = self.grid_size
+        targets = []
+        for line in ship_lines(self.injured, size):
+            rows = [index // size for index in line]
+            columns = [index % size for index in line]
+            if len(line) == 1:
+                candidates = [(rows[0] - 1, columns[0]), (rows[0] + 1, columns[0]),
+                              (rows[0], columns[0] - 1), (rows[0], columns[0] + 1)]
+            elif len(set(rows)) == 1:
+                candidates = [(rows[0], min(columns) - 1), (rows[0], max(columns) + 1)]
+            else:
+                candidates = [(min(rows) - 1, columns[0]), (max(rows) + 1, columns[0])]
+
+            targets.extend(row * size + column for row, column in candidates
+                           if 0 <= row < size and 0 <= column < size and not self.opened[row * size + column])
+
+        return targets
+
+
+def ship_lines(cells, grid_size):
+    """
+    Cells grouped by ship: ships never touch, so the cells of a ship are those next to each other
+    :param cells: cell indexes
+    :param grid_size: board size
+    :return: iterator of cell index lists
+    """
+    left = set(cells)
+    while left:
+        line = [left.pop()]
+        for index in line:
+            neighbours = [index - grid_size, index + grid_size]
+            if index % grid_size:
+                neighbours.append(index - 1)
+            if index % grid_size < grid_size - 1:
+                neighbours.append(index + 1)
+            for neighbour in neighbours:
+                if neighbour in left:
+                    left.discard(neighbour)
+                    line.append(neighbour)
+        yield line
+
+
+class Heatmap:
+    """
+    Ship placement density of a board: for every cell not opened yet, the number of the placements of the ships left
+    covering it, each placement counted once per ship of its size still afloat.
+    It is kept as the number of placements covering each cell by ship size, a byte per cell, and updated
+    incrementally: opening a cell removes the placements through it, at a cost depending on the ship sizes only, and
+    killing a ship is a count decrement. best() finds the highest score without scoring every cell, see its docstring.
+    """
+    # the placements of a ship covering a cell, at most twice its size, are counted in a byte
+    MAX_SHIP_SIZE = 127
+
+    def __init__(self, grid_size, fleet):
+        """
+        :param grid_size: board size
+        :param fleet: ship sizes of the game
+        """
+        self.grid_size = grid_size
+        self.remaining = Counter(fleet)
+        if max(self.remaining, default=0) > self.MAX_SHIP_SIZE:
+            raise ValueError('Ships longer than {} cells are not supported'.format(self.MAX_SHIP_SIZE))
+
+        self.open = bytearray(b'\x01') * (grid_size * grid_size)
+        # ship size -> number of placements of a ship of that size covering each cell
+        self.placements = OrderedDict()
+        # ship size -> number of cells by number of placements covering them
+        self.counts = {}
+        for ship_size in sorted(self.remaining, reverse=True):
+            placements = self.placements[ship_size] = self._placements(ship_size)
+            self.counts[ship_size] = [placements.count(value) for value in range(self._max_placements(ship_size) + 1)]
+
+    def score(self, index):
+        """
+        :return: number of placements of the ships left covering the cell
+        """
+        return sum(self.remaining[ship_size] * placements[index] for ship_size, placements in self.placements.items())
+
+    def best(self):
+        """
+        Cell of the highest score, found with the threshold algorithm: the cells are visited by decreasing number of
+        placements of each ship size in turn, until the best score seen reaches the score that a cell not visited yet
+        could have at most. The cells of the open water all have the highest counts, so the first cells visited
+        usually settle it.
+        :return: index of the cell with the highest score, None when no ship fits anywhere
+        """
+        # [ship count, placements, counts, placements of the cells visited, index of the next cell to visit]
+        cursors = [[self.remaining[ship_size], placements, self.counts[ship_size], len(self.counts[ship_size]), 0]
+                   for ship_size, placements in self.placements.items()]
+        best_index, best_score = None, 0
+        while cursors:
+            threshold = 0
+            for cursor in list(cursors):
+                count, placements, counts, value, start = cursor
+                index = placements.find(value, start) if value < len(counts) else -1
+                while index < 0:
+                    value -= 1
+                    while value and not counts[value]:
+                        value -= 1
+                    if not value:
+                        break
+                    index = placements.find(value)
+
+                if not value:
+                    cursors.remove(cursor)
+                    continue
+
+                cursor[3:] = value, index + 1
+                threshold += count * value
+                score = self.score(index)
+                if score > best_score:
+                    best_index, best_score = index, score
+
+            if best_score >= threshold:
+                break
+
+        return best_index
+
+    def open_cell(self, index):
+        """
+        Remove the placements through a cell that was just opened
+        """
+        if not self.open[index]:
+            return
+
+        size = self.grid_size
+        row, column = divmod(index, size)
+        open_cells = self.open
+        reach = max(self.placements, default=1) - 1
+        # the open cells through the cell along its row, then along its column, as far as the longest ship left
+        # reaches, as (first cell index, step, first position, position of the cell, last position)
+        runs = []
+        for line_start, position, step in ((index - column, column, 1), (column, row, size)):
+            first = last = position
+            while first > max(0, position - reach) and open_cells[line_start + (first - 1) * step]:
+                first -= 1
+            while last < min(size - 1, position + reach) and open_cells[line_start + (last + 1) * step]:
+                last += 1
+            runs.append((line_start, step, first, position, last))
+
+        for ship_size, placements in self.placements.items():
+            counts = self.counts[ship_size]
+            # a single cell ship has one placement per cell, whatever the orientation
+            for line_start, step, first, position, last in runs[:1] if ship_size == 1 else runs:
+                # the placements removed start between first_start and last_start, each covering ship_size cells
+                first_start = max(first, position - ship_size + 1)
+                last_start = min(position, last - ship_size + 1)
+                if first_start > last_start:
+                    continue
+                for covered in range(first_start, last_start + ship_size):
+                    removed = min(last_start, covered) - max(first_start, covered - ship_size + 1) + 1
+                    cell = line_start + covered * step
+                    counts[placements[cell]] -= 1
+                    placements[cell] -= removed
+                    counts[placements[cell]] += 1
+
+        open_cells[index] = 0
+
+    def kill(self, ship_size):
+        """
+        Remove a ship of the given size from the ships left
+        """
+        if not self.remaining[ship_size]:
+            return
+
+        self.remaining[ship_size] -= 1
+        if not self.remaining[ship_size]:
+            del self.placements[ship_size]
+            del self.counts[ship_size]
+
+    def _max_placements(self, ship_size):
+        return min(ship_size, self.grid_size - ship_size + 1) * (1 if ship_size == 1 else 2)
+
+    def _placements(self, ship_size):
+        size = self.grid_size
+        # placements of the ship covering each position of a line
+        line = [max(0, min(position, size - ship_size) - max(0, position - ship_size + 1) + 1)
+                for position in range(size)]
+        if ship_size == 1:
+            return bytearray(line) * size
+
+        # each row is the placements along it, plus the placements across it, the same for all of its cells
+        row = bytes(line)
+        return bytearray(b''.join(row.translate(_ADD_TABLES[across]) for across in line))
+
+
+# translation tables adding a number to every byte
+_ADD_TABLES = [bytes((value + added) & 0xFF for value in range(256)) for added in range(256)]
+
+
+class DensityStrategy(HuntTargetStrategy):
+    """
+    Hunts the cell most ship placements cover (see Heatmap), and targets the injured ships through the cell of the
+    highest density extending them. A fleet with a ship longer than Heatmap.MAX_SHIP_SIZE has no heatmap, it is
+    attacked as by HuntTargetStrategy
+    """
+
+    def __init__(self, grid_size, fleet, rng=random):
+        super().__init__(grid_size, fleet, rng)
+        self.heatmap = Heatmap(grid_size, fleet) if max(fleet, default=0) <= Heatmap.MAX_SHIP_SIZE else None
+
+    def record(self, attack_status, changes):
+        super().record(attack_status, changes)
+        if self.heatmap is None:
+            return
+        size = self.grid_size
+        for row, column, _ in changes:
+            self.heatmap.open_cell(row * size + column)
+        # a cell is listed once, when it changes: the killed cells of the changes are the ships just killed
+        killed = [row * size + column for row, column, value in changes if value == GameCell.KILLED.value]
+        for ship in ship_lines(killed, size):
+            self.heatmap.kill(len(ship))
+
+    def hunt(self):
+        index = self.heatmap.best() if self.heatmap is not None else None
+        if index is None:
+            return super().hunt()
+
+        return divmod(index, self.grid_size)
+
+    def choose_target(self, targets):
+        if self.heatmap is None:
+            return super().choose_target(targets)
+
+        return max(targets, key=self.heatmap.score)
+
+
+STRATEGIES = OrderedDict([
+    ('random', RandomStrategy),
+    ('hunt_target', HuntTargetStrategy),
+    ('density', DensityStrategy),
+])
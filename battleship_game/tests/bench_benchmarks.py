@@ -0,0 +1,25 @@
+"""
+The benchmarks of battleship_game/benchmarks.py under pytest-benchmark, e.g.
+    pytest --ds=battleship.settings battleship_game/tests/bench_benchmarks.py --benchmark-json=benchmarks.json
+It needs pytest-django and pytest-benchmark; manage.py test does not collect it.
+"""
+import pytest
+
+pytest.importorskip('pytest_django')
+pytest.importorskip('pytest_benchmark')
+
+from battleship_game.benchmarks import BENCHMARKS, timed_with  # noqa: E402
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', list(BENCHMARKS))
+def test_benchmark(benchmark, name):
+    def timer(function):
+        # the benchmarks change their boards and games, each measured call runs once
+        benchmark.pedantic(function, rounds=1, iterations=1)
+        return benchmark.stats['mean']
+
+    with timed_with(timer):
+        result = BENCHMARKS[name]()
+
+    benchmark.extra_info.update(operations=result['operations'], per_second=result['per_second'])
@@ -0,0 +1,64 @@
+import random
+
+from django.test import SimpleTestCase, override_settings
+
+from battleship_game import advisor
+from battleship_game.enums import GameStatus
+from battleship_game.factories import create_random_board
+from battleship_game.models import Game
+
+
+class AdvisorTestCase(SimpleTestCase):
+
+    def setUp(self):
+        advisor.clear()
+
+    def tearDown(self):
+        advisor.clear()
+
+    def _game(self, pk, seed):
+        # attacks without saving send the game_attacked signal at once, outside of a transaction
+        return Game(pk=pk, opponent_grid=create_random_board(random.Random(seed)))
+
+    def _scores(self, game_advisor):
+        heatmap = game_advisor.strategy.heatmap
+        return [heatmap.score(index) for index in range(len(heatmap.open))]
+
+    def test_suggestions_win_the_game(self):
+        game = self._game(1, 1)
+        advisor.suggest_shot(game)
+        game_advisor = advisor._advisors[game.pk, None]
+
+        shots = 0
+        while GameStatus(game.game_status) is not GameStatus.FINISHED:
+            row, column = advisor.suggest_shot(game)
+            response = game.attack_cell(row, column, save=False)
+            shots += 1
+
+            self.assertNotEqual('INVALID', response.attack_status.value)
+            self.assertIs(game_advisor, advisor._advisors[game.pk, None])
+            self.assertEqual(self._scores(advisor.GameAdvisor(game)), self._scores(game_advisor))
+
+        self.assertLess(shots, 100)
+
+    def test_missed_attack_rebuilds_the_strategy(self):
+        game = self._game(1, 2)
+        advisor.suggest_shot(game)
+        game_advisor = advisor._advisors[game.pk, None]
+
+        row, column = advisor.suggest_shot(game)
+        # an attack of another process
+        game.opponent_grid.attack(row, column)
+        suggested = advisor.suggest_shot(game)
+
+        self.assertIsNot(game_advisor, advisor._advisors[game.pk, None])
+        self.assertNotEqual((row, column), suggested)
+
+    @override_settings(BATTLESHIP_ADVISOR={'MAX_GAMES': 1})
+    def test_least_recently_asked_games_are_dropped(self):
+        first, second = self._game(1, 3), self._game(2, 4)
+
+        advisor.suggest_shot(first)
+        advisor.suggest_shot(second)
+
+        self.assertEqual([(second.pk, None)], list(advisor._advisors))
@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+from django.core.wsgi import get_wsgi_application
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITransactionTestCase
+
+from battleship.asgi import WsgiToAsgi, build_environ
+from battleship_game.models import Game
+
+
+async def asgi_call(application, method, path, body=b'', headers=()):
+    """
+    Run an http request through an ASGI application in the running event loop
+    :return: (status, headers dict, body)
+    """
+    scope = {'type': 'http', 'http_version': '1.1', 'method': method, 'path': path, 'query_string': b'',
+             'headers': [(b'host', b'testserver')] + list(headers), 'server': ('localhost', 80)}
+    requests = [{'type': 'http.request', 'body': body}]
+    sent = []
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await asyncio.sleep(60)
+
+    async def send(message):
+        sent.append(message)
+
+    await application(scope, receive, send)
+
+    return (sent[0]['status'], {name.decode(): value.decode() for name, value in sent[0]['headers']},
+            b''.join(message.get('body', b'') for message in sent[1:]))
+
+
+def asgi_request(application, method, path, body=b'', headers=()):
+    """
+    Run an http request through an ASGI application
+    :return: (status, headers dict, body)
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(asgi_call(application, method, path, body, headers))
+    finally:
+        loop.close()
+
+
+class WsgiToAsgiTestCase(APITransactionTestCase):
+
+    def setUp(self):
+        self.application = WsgiToAsgi(get_wsgi_application(), 2, 2)
+        self.game = Game()
+        self.game.opponent_grid.place_ship(2, 'col', 0, 0)
+        self.game.save()
+
+    def test_retrieve(self):
+        status_code, headers, body = asgi_request(self.application, 'GET', reverse('game-detail', args=[self.game.pk]))
+
+        self.assertEqual(status.HTTP_200_OK, status_code)
+        self.assertEqual('application/json', headers['content-type'])
+        self.assertEqual(self.client.get(reverse('game-detail', args=[self.game.pk])).data, json.loads(body.decode()))
+
+    def test_attack(self):
+        body = json.dumps({'row': 0, 'column': 0}).encode()
+        status_code, headers, content = asgi_request(
+            self.application, 'POST', reverse('game-attack', args=[self.game.pk]), body,
+            [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())])
+
+        self.assertEqual(status.HTTP_200_OK, status_code)
+        self.assertEqual('INJURED', json.loads(content.decode())['attackStatus'])
+
+    @override_settings(BATTLESHIP_EVENTS={'POLL_TIMEOUT': 0.2, 'STREAM_TIMEOUT': 1})
+    def test_streams_do_not_hold_the_request_threads(self):
+        loop = asyncio.new_event_loop()
+        finished = []
+
+        async def request(*args):
+            response = await asgi_call(self.application, *args)
+            finished.append(args[1])
+            return response
+
+        async def requests():
+            events = reverse('game-events', args=[self.game.pk])
+            streams = [loop.create_task(request('GET', events, b'', [(b'accept', b'text/event-stream')]))
+                       for _ in range(3)]
+            await asyncio.sleep(0.1)
+            retrieved = await request('GET', reverse('game-detail', args=[self.game.pk]))
+            return retrieved, await asyncio.gather(*streams)
+
+        try:
+            retrieved, streamed = loop.run_until_complete(requests())
+        finally:
+            loop.close()
+
+        self.assertEqual(status.HTTP_200_OK, retrieved[0])
+        self.assertEqual(reverse('game-detail', args=[self.game.pk]), finished[0])
+        for status_code, headers, body in streamed:
+            self.assertEqual(status.HTTP_200_OK, status_code)
+            self.assertEqual('text/event-stream', headers['content-type'].split(';')[0])
+            self.assertIn(b': keep-alive', body)
+
+
+class BuildEnvironTestCase(SimpleTestCase):
+
+    def test_headers(self):
+        scope = {'method': 'POST', 'path': '/games/', 'query_string': b'grid=rows', 'client': ('10.0.0.1', 5000),
+                 'headers': [(b'content-type', b'application/json'), (b'accept', b'text/html'),
+                             (b'accept', b'application/json'), (b'last-event-id', b'3')]}
+
+        environ = build_environ(scope, None)
+
+        self.assertEqual('application/json', environ['CONTENT_TYPE'])
+        self.assertEqual('text/html,application/json', environ['HTTP_ACCEPT'])
+        self.assertEqual('3', environ['HTTP_LAST_EVENT_ID'])
+        self.assertEqual('grid=rows', environ['QUERY_STRING'])
+        self.assertEqual('10.0.0.1', environ['REMOTE_ADDR'])
@@ -0,0 +1,100 @@
+from django.core.cache import caches
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from battleship_game import cache
+from battleship_game.factories import create_random_game
+from battleship_game.models import Game, GameCell
+
+
+class GameCacheTestCase(APITestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_retrieve_reads_through(self):
+        game = create_random_game()
+
+        first = self.client.get(reverse('game-detail', args=[game.pk]))
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('game-detail', args=[game.pk]))
+
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_grid_formats_are_cached_apart(self):
+        game = create_random_game()
+
+        cells = self.client.get(reverse('game-detail', args=[game.pk]))
+        rows = self.client.get(reverse('game-detail', args=[game.pk]), {'grid': 'rows'})
+
+        self.assertIsInstance(rows.data['opponentGrid'][0], str)
+        self.assertNotEqual(cells['ETag'], rows['ETag'])
+
+    def test_not_modified(self):
+        game = create_random_game()
+        etag = self.client.get(reverse('game-detail', args=[game.pk]))['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('game-detail', args=[game.pk]), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(etag, response['ETag'])
+
+    def test_later_version_is_not_replaced(self):
+        game = create_random_game()
+        stale = Game.objects.get(pk=game.pk)
+        game.attack_cell(0, 0)
+        cache.write_through(game)
+
+        cache.put_game(stale, 'cells', {'stale': True})
+
+        self.assertNotIn('stale', cache.get_game(game.pk, 'cells').data)
+
+    def test_read_before_a_write_through_is_not_added(self):
+        game = create_random_game()
+        stale = Game.objects.get(pk=game.pk)
+        game.attack_cell(0, 0)
+        cache.write_through(game)
+
+        cache.put_game(stale, 'rows', {'stale': True}, replace=False)
+        cache.put_game(game, 'bitmasks', {'stale': False}, replace=False)
+
+        self.assertIsNone(cache.get_game(game.pk, 'rows'))
+        self.assertIsNotNone(cache.get_game(game.pk, 'bitmasks'))
+
+    @override_settings(BATTLESHIP_GAME_CACHE={'ALIAS': None})
+    def test_disabled_cache(self):
+        game = create_random_game()
+        self.client.get(reverse('game-detail', args=[game.pk]))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('game-detail', args=[game.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_unknown_game(self):
+        response = self.client.get(reverse('game-detail', args=[0]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class GameCacheWriteThroughTestCase(APITransactionTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_attack_writes_through(self):
+        game = Game()
+        game.opponent_grid.place_ship(2, 'col', 0, 0)
+        game.save()
+        self.client.get(reverse('game-detail', args=[game.pk]), {'grid': 'rows'})
+
+        self.client.post(reverse('game-attack', args=[game.pk]), data={'row': 0, 'column': 0})
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('game-detail', args=[game.pk]))
+
+        self.assertEqual(GameCell.INJURED.value, response.data['opponentGrid'][0][0])
+        self.assertIsNone(cache.get_game(game.pk, 'rows'))
@@ -0,0 +1,246 @@
+from django.test import SimpleTestCase
+
+from battleship_game.engine import Board
+from battleship_game.models import AttackStatus, GameCell
+
+
+def _empty_grid(size=10):
+    return [[GameCell.EMPTY.value for _ in range(size)] for _ in range(size)]
+
+
+class BoardTestCase(SimpleTestCase):
+
+    def test_grid_round_trip(self):
+        grid = _empty_grid()
+        grid[0][0] = GameCell.SHIP.value
+        grid[3][4] = GameCell.INJURED.value
+        grid[9][9] = GameCell.MISSED.value
+        grid[5][0] = GameCell.KILLED.value
+
+        self.assertEqual(grid, Board.from_grid(grid).to_grid())
+
+    def test_bytes_round_trip(self):
+        grid = _empty_grid()
+        grid[0][0] = GameCell.SHIP.value
+        grid[3][4] = GameCell.INJURED.value
+        grid[9][9] = GameCell.MISSED.value
+        grid[5][0] = GameCell.KILLED.value
+        board = Board.from_grid(grid)
+
+        packed = board.to_bytes()
+
+        self.assertEqual(94, len(packed))
+        self.assertEqual(board, Board.from_bytes(memoryview(packed)))
+
+    def test_row_view_reads_and_writes_cells(self):
+        board = Board(10)
+
+        board[2][7] = GameCell.SHIP.value
+        board[2][7] = GameCell.INJURED.value
+
+        self.assertEqual(10, len(board[2]))
+        self.assertEqual(GameCell.INJURED.value, board[2][7])
+        self.assertFalse(board.ships)
+        self.assertEqual(GameCell.INJURED.value, board.to_grid()[2][7])
+        with self.assertRaises(IndexError):
+            board[2][10]
+
+    def test_attack_opened_cell(self):
+        grid = _empty_grid()
+        grid[4][4] = GameCell.MISSED.value
+        board = Board.from_grid(grid)
+
+        attack_status, changed = board.attack(4, 4)
+
+        self.assertEqual(AttackStatus.INVALID, attack_status)
+        self.assertEqual([], changed)
+
+    def test_attack_empty_cell(self):
+        board = Board.from_grid(_empty_grid())
+
+        attack_status, changed = board.attack(2, 3)
+
+        self.assertEqual(AttackStatus.MISSED, attack_status)
+        self.assertEqual([(2, 3)], changed)
+        self.assertEqual(GameCell.MISSED.value, board.to_grid()[2][3])
+
+    def test_kill_marks_only_the_ship_halo(self):
+        grid = _empty_grid()
+        grid[5][5] = GameCell.SHIP.value
+        grid[5][6] = GameCell.INJURED.value
+        board = Board.from_grid(grid)
+
+        attack_status, _ = board.attack(5, 5)
+        result = board.to_grid()
+
+        self.assertEqual(AttackStatus.KILLED, attack_status)
+        self.assertEqual(GameCell.KILLED.value, result[5][5])
+        self.assertEqual(GameCell.KILLED.value, result[5][6])
+        self.assertEqual(GameCell.MISSED.value, result[5][4])
+        self.assertEqual(GameCell.MISSED.value, result[5][7])
+        self.assertEqual(GameCell.MISSED.value, result[4][7])
+        self.assertEqual(GameCell.MISSED.value, result[6][4])
+        self.assertEqual(GameCell.EMPTY.value, result[5][8])
+        self.assertEqual(GameCell.EMPTY.value, result[5][3])
+        self.assertFalse(board.ships)
+
+    def test_ships_do_not_wrap_across_rows(self):
+        grid = _empty_grid()
+        grid[0][9] = GameCell.SHIP.value
+        grid[1][0] = GameCell.SHIP.value
+        board = Board.from_grid(grid)
+
+        attack_status, _ = board.attack(0, 9)
+        result = board.to_grid()
+
+        self.assertEqual(AttackStatus.KILLED, attack_status)
+        self.assertEqual(GameCell.SHIP.value, result[1][0])
+        self.assertEqual(GameCell.EMPTY.value, result[0][0])
+
+    def test_injure_vertical_ship(self):
+        grid = _empty_grid()
+        grid[6][2] = GameCell.SHIP.value
+        grid[7][2] = GameCell.SHIP.value
+        grid[8][2] = GameCell.SHIP.value
+        board = Board.from_grid(grid)
+
+        self.assertEqual(AttackStatus.INJURED, board.attack(7, 2).attack_status)
+        self.assertEqual(AttackStatus.INJURED, board.attack(6, 2).attack_status)
+        self.assertEqual(AttackStatus.KILLED, board.attack(8, 2).attack_status)
+        self.assertEqual(GameCell.MISSED.value, board.to_grid()[9][2])
+
+    def test_counters_follow_attacks(self):
+        board = Board(10)
+        board.place_ship(2, 'col', 0, 0)
+        board.place_ship(1, 'col', 5, 5)
+
+        self.assertEqual(2, board.ships_left)
+        self.assertEqual(3, board.ship_cells_left)
+
+        board.attack(0, 0)
+        self.assertEqual(2, board.ships_left)
+        self.assertEqual(2, board.ship_cells_left)
+
+        board.attack(0, 1)
+        self.assertEqual(1, board.ships_left)
+        self.assertEqual(1, board.ship_cells_left)
+
+        board.attack(9, 9)
+        self.assertEqual(1, board.ships_left)
+        self.assertEqual(1, board.ship_cells_left)
+
+    def test_counters_are_recounted_after_cell_writes(self):
+        board = Board(10)
+        board[1][1] = GameCell.SHIP.value
+        board[1][2] = GameCell.SHIP.value
+        board[7][7] = GameCell.SHIP.value
+        board[3][3] = GameCell.INJURED.value
+
+        self.assertEqual(2, board.ships_left)
+        self.assertEqual(3, board.ship_cells_left)
+
+    def test_counters_are_packed(self):
+        board = Board(10)
+        board.place_ship(3, 'row', 2, 2)
+        board.attack(3, 2)
+
+        unpacked = Board.from_bytes(board.to_bytes())
+
+        self.assertEqual(1, unpacked.ships_left)
+        self.assertEqual(2, unpacked.ship_cells_left)
+
+    def test_unpack_version_one(self):
+        grid = _empty_grid()
+        grid[0][0] = GameCell.SHIP.value
+        grid[0][1] = GameCell.INJURED.value
+        grid[4][4] = GameCell.SHIP.value
+        masks = Board.from_grid(grid)
+        packed = bytes([1, 0, 10]) + b''.join(
+            mask.to_bytes() for mask in (masks.ships, masks.hits, masks.misses, masks.killed))
+
+        board = Board.from_bytes(packed)
+
+        self.assertEqual(grid, board.to_grid())
+        self.assertEqual(2, board.ships_left)
+        self.assertEqual(2, board.ship_cells_left)
+
+    def test_placed_ships_are_registered(self):
+        board = Board(10)
+        board.place_ship(3, 'row', 2, 2)
+        board.place_ship(2, 'col', 7, 5)
+
+        ship = board.ship_at(3, 2)
+
+        self.assertEqual([0, 1], [ship.id for ship in board.fleet])
+        self.assertEqual(0, ship.id)
+        self.assertEqual([(2, 2), (3, 2), (4, 2)], list(ship.cells()))
+        self.assertEqual(1, board.ship_at(7, 6).id)
+        self.assertIsNone(board.ship_at(7, 7))
+
+    def test_ship_down_the_rows_is_found_below_the_ships_starting_after_it(self):
+        board = Board(10)
+        board.place_ship(4, 'row', 0, 0)
+        board.place_ship(2, 'col', 1, 2)
+        board.place_ship(1, 'col', 2, 5)
+
+        self.assertEqual((0, 0), (board.ship_at(3, 0).row, board.ship_at(3, 0).column))
+        self.assertEqual((1, 2), (board.ship_at(1, 3).row, board.ship_at(1, 3).column))
+        self.assertIsNone(board.ship_at(4, 0))
+        self.assertIsNone(board.ship_at(1, 4))
+
+    def test_attack_counts_ship_hits(self):
+        board = Board(10)
+        board.place_ship(2, 'col', 0, 0)
+
+        board.attack(0, 1)
+        self.assertEqual(1, board.fleet[0].hits)
+        self.assertFalse(board.fleet[0].killed)
+
+        board.attack(0, 0)
+        self.assertTrue(board.fleet[0].killed)
+
+    def test_registry_is_packed(self):
+        board = Board(10)
+        board.place_ship(4, 'row', 0, 9)
+        board.place_ship(1, 'col', 9, 0)
+        board.attack(1, 9)
+
+        fleet = Board.from_bytes(board.to_bytes()).fleet
+
+        self.assertEqual([(4, 'row', 0, 9, 1), (1, 'col', 9, 0, 0)],
+                         [(ship.size, ship.orientation, ship.row, ship.column, ship.hits) for ship in fleet])
+
+    def test_registry_is_rebuilt_from_cells(self):
+        grid = _empty_grid()
+        grid[1][1] = GameCell.SHIP.value
+        grid[1][2] = GameCell.INJURED.value
+        grid[1][3] = GameCell.SHIP.value
+        grid[4][6] = GameCell.KILLED.value
+        grid[5][6] = GameCell.KILLED.value
+
+        fleet = Board.from_grid(grid).fleet
+
+        self.assertEqual([(3, 'col', 1, 1, 1), (2, 'row', 4, 6, 2)],
+                         [(ship.size, ship.orientation, ship.row, ship.column, ship.hits) for ship in fleet])
+
+    def test_large_board_attacks(self):
+        board = Board(1000)
+        board.place_ship(3, 'row', 997, 999)
+
+        self.assertEqual(AttackStatus.INJURED, board.attack(998, 999).attack_status)
+        self.assertEqual(AttackStatus.INJURED, board.attack(999, 999).attack_status)
+        attack_status, changed = board.attack(997, 999)
+
+        self.assertEqual(AttackStatus.KILLED, attack_status)
+        self.assertEqual([(997, 999), (998, 999), (999, 999), (996, 998), (996, 999)], changed)
+        self.assertEqual(0, board.ships_left)
+        self.assertEqual(board, Board.from_bytes(board.to_bytes()))
+
+    def test_bent_ship_is_rejected(self):
+        grid = _empty_grid()
+        grid[1][1] = GameCell.SHIP.value
+        grid[1][2] = GameCell.SHIP.value
+        grid[2][2] = GameCell.SHIP.value
+
+        with self.assertRaises(ValueError):
+            Board.from_grid(grid).fleet
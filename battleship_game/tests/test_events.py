@@ -0,0 +1,97 @@
+import json
+from threading import Thread
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITransactionTestCase
+
+from battleship_game import events
+from battleship_game.models import Game
+
+
+class LocalEventBrokerTestCase(SimpleTestCase):
+
+    def test_wait_returns_the_events_after(self):
+        broker = events.LocalEventBroker()
+        broker.publish(1, {'shot': 1})
+        broker.publish(1, {'shot': 2})
+        broker.publish(2, {'shot': 3})
+
+        self.assertEqual([events.Event(2, {'shot': 2})], broker.wait(1, 1, 0))
+        self.assertEqual(2, broker.last_event_id(1))
+        self.assertEqual(0, broker.last_event_id(3))
+
+    def test_wait_times_out(self):
+        self.assertEqual([], events.LocalEventBroker().wait(1, 0, 0.01))
+
+    def test_waiter_is_woken_by_publish(self):
+        broker = events.LocalEventBroker()
+        received = []
+        waiter = Thread(target=lambda: received.extend(broker.wait(1, 0, 5)))
+        waiter.start()
+
+        broker.publish(1, {'shot': 1})
+        waiter.join(5)
+
+        self.assertEqual([events.Event(1, {'shot': 1})], received)
+
+    def test_buffers_are_bounded(self):
+        broker = events.LocalEventBroker(buffer_size=2, max_games=1)
+        for shot in range(3):
+            broker.publish(1, {'shot': shot})
+        broker.publish(2, {'shot': 0})
+
+        self.assertEqual([], broker.wait(1, 0, 0))
+        self.assertEqual([1], [event.id for event in broker.wait(2, 0, 0)])
+
+
+@override_settings(BATTLESHIP_EVENTS={'POLL_TIMEOUT': 0.1, 'STREAM_TIMEOUT': 1})
+class GameEventsTestCase(APITransactionTestCase):
+
+    def setUp(self):
+        events.reset_broker()
+
+    def tearDown(self):
+        events.reset_broker()
+
+    def _game(self):
+        game = Game()
+        game.opponent_grid.place_ship(1, 'col', 0, 0)
+        game.opponent_grid.place_ship(1, 'col', 9, 9)
+        game.save()
+        return game
+
+    def test_long_poll(self):
+        game = self._game()
+        self.client.post(reverse('game-attack', args=[game.pk]), data={'row': 0, 'column': 0})
+
+        response = self.client.get(reverse('game-events', args=[game.pk]), {'after': 0})
+        idle = self.client.get(reverse('game-events', args=[game.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(1, response.data['lastEventId'])
+        self.assertEqual(['KILLED'], response.data['events'][0]['data']['attackStatuses'])
+        self.assertEqual([0, 0, 'x'], response.data['events'][0]['data']['changes'][0])
+        self.assertEqual({'lastEventId': 1, 'events': []}, idle.data)
+
+    def test_event_stream(self):
+        game = self._game()
+        self.client.post(reverse('game-attack', args=[game.pk]), data={'row': 0, 'column': 0})
+        self.client.post(reverse('game-attack', args=[game.pk]), data={'row': 9, 'column': 9})
+
+        response = self.client.get(reverse('game-events', args=[game.pk]), HTTP_ACCEPT='text/event-stream',
+                                   HTTP_LAST_EVENT_ID='1')
+        chunks = [chunk.decode() for chunk in response.streaming_content]
+
+        self.assertEqual('text/event-stream', response['Content-Type'])
+        self.assertEqual(1, len(chunks))
+        self.assertTrue(chunks[0].startswith('id: 2\nevent: attack\ndata: '))
+        self.assertEqual('FINISHED', json.loads(chunks[0].split('data: ')[1])['status'])
+
+    def test_invalid_event_id(self):
+        game = self._game()
+
+        response = self.client.get(reverse('game-events', args=[game.pk]), {'after': 'last'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,94 @@
+import random
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from battleship_game.factories import create_random_game, create_random_games, SHIPS, place_fleet, \
+    FleetPlacementError, create_random_board, proportional_fleet, check_fleet
+from battleship_game.models import Game, GameStatus
+
+
+class FactoriesTestCase(TestCase):
+
+    def setUp(self):
+        Game.objects.all().delete()
+
+    def assertValidFleet(self, board, ships=SHIPS):
+        self.assertEqual(sorted(ships), sorted(ship.size for ship in board.fleet))
+        self.assertEqual(len(ships), board.ships_left)
+        self.assertEqual(sum(ships), board.ship_cells_left)
+
+        cells = {cell: ship.id for ship in board.fleet for cell in ship.cells()}
+        for (row, column), ship_id in cells.items():
+            for row_offset in (-1, 0, 1):
+                for column_offset in (-1, 0, 1):
+                    neighbour = cells.get((row + row_offset, column + column_offset), ship_id)
+                    self.assertEqual(ship_id, neighbour, 'ships {} and {} touch'.format(ship_id, neighbour))
+
+    def test_create_random_game(self):
+        game = create_random_game()
+
+        self.assertEqual(GameStatus.IN_PROGRESS.value, game.game_status)
+        self.assertValidFleet(Game.objects.get(pk=game.pk).opponent_grid)
+
+    def test_create_random_games(self):
+        games = create_random_games(5)
+
+        self.assertEqual(5, Game.objects.count())
+        self.assertEqual(sorted(game.pk for game in games), sorted(Game.objects.values_list('pk', flat=True)))
+        for game in Game.objects.all():
+            self.assertValidFleet(game.opponent_grid)
+
+    def test_seeded_boards_are_reproducible(self):
+        self.assertEqual(create_random_board(random.Random(7)), create_random_board(random.Random(7)))
+
+    def test_place_fleet_on_the_only_legal_slots(self):
+        board = place_fleet(3, [3, 1], random.Random(1))
+
+        ships = sorted((ship.size, ship.row, ship.column) for ship in board.fleet)
+        self.assertEqual(2, len(ships))
+        self.assertIn(ships[1], [(3, 0, 0), (3, 2, 0), (3, 0, 2)])
+
+    def test_place_dense_fleet(self):
+        board = place_fleet(10, SHIPS + [1] * 4, random.Random(3))
+
+        self.assertValidFleet(board, SHIPS + [1] * 4)
+
+    def test_place_impossible_fleet(self):
+        with self.assertRaises(FleetPlacementError):
+            place_fleet(10, [4] * 20)
+
+        with self.assertRaises(FleetPlacementError):
+            place_fleet(3, [4])
+
+    def test_crowded_fleet_is_rejected_up_front(self):
+        with self.assertRaises(FleetPlacementError):
+            check_fleet(20, [1] * 101)
+
+        self.assertEqual(10, len(check_fleet(20, [1] * 100)))
+
+    def test_place_fleet_on_shelves(self):
+        with patch('battleship_game.factories._try_place_fleet', return_value=None):
+            board = place_fleet(10, SHIPS + [1] * 4, random.Random(3))
+
+        self.assertValidFleet(board, SHIPS + [1] * 4)
+
+    def test_place_fleet_of_long_ships(self):
+        board = place_fleet(30, [15] * 15, random.Random(0))
+
+        self.assertValidFleet(board, [15] * 15)
+
+    def test_proportional_fleet(self):
+        self.assertEqual(SHIPS, proportional_fleet(Game.GRID_SIZE))
+        self.assertEqual(100 * [4] + 200 * [3] + 300 * [2] + 400 * [1], proportional_fleet(100))
+        self.assertEqual([1], proportional_fleet(1))
+
+    def test_create_large_board(self):
+        board = create_random_board(random.Random(11), grid_size=60)
+
+        self.assertEqual(60, board.size)
+        self.assertValidFleet(board, proportional_fleet(60))
+
+    def test_place_fleet_gives_up_after_bounded_attempts(self):
+        with self.assertRaises(FleetPlacementError):
+            place_fleet(4, [3, 3, 3], random.Random(5))
@@ -0,0 +1,126 @@
+import threading
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from battleship_game import matchmaking
+from battleship_game.models import Game, MatchTicket
+
+
+@override_settings(BATTLESHIP_MATCHMAKING={'PAIR_INTERVAL': 0})
+class MatchmakingTestCase(APITestCase):
+
+    def setUp(self):
+        matchmaking._next_pass = 0.0
+
+    def test_pair_waiting(self):
+        tickets = [matchmaking.enqueue() for _ in range(5)]
+
+        self.assertEqual(2, matchmaking.pair_waiting())
+        self.assertEqual(0, matchmaking.pair_waiting())
+
+        paired = {ticket.pk: ticket for ticket in MatchTicket.objects.select_related('game')}
+        first, second = paired[tickets[0].pk], paired[tickets[1].pk]
+        self.assertEqual(first.game_id, second.game_id)
+        self.assertEqual((1, 2), (first.player, second.player))
+        self.assertTrue(first.game.two_player)
+        self.assertNotEqual(first.game_id, paired[tickets[2].pk].game_id)
+        self.assertIsNone(paired[tickets[4].pk].game_id)
+        self.assertEqual(2, Game.objects.count())
+
+    def test_pair_waiting_in_batches(self):
+        for _ in range(7):
+            matchmaking.enqueue()
+
+        self.assertEqual(1, matchmaking.pair_waiting(batch_size=3))
+        self.assertEqual(2, matchmaking.pair_waiting(batch_size=4))
+        self.assertEqual(1, MatchTicket.objects.filter(game=None).count())
+
+    def test_expire_tickets(self):
+        old = matchmaking.enqueue()
+        MatchTicket.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(seconds=700))
+        recent = matchmaking.enqueue()
+
+        self.assertEqual(1, matchmaking.expire_tickets())
+        self.assertEqual([recent.pk], list(MatchTicket.objects.values_list('pk', flat=True)))
+
+    def test_queue(self):
+        first = self.client.post(reverse('matchticket-list'))
+        waiting = self.client.get(reverse('matchticket-detail', args=[first.data['key']]))
+        second = self.client.post(reverse('matchticket-list'))
+        paired = self.client.get(reverse('matchticket-detail', args=[first.data['key']]))
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual('WAITING', first.data['status'])
+        self.assertEqual(32, len(first.data['key']))
+        self.assertEqual('WAITING', waiting.data['status'])
+        self.assertIsNone(waiting.data['playerToken'])
+        self.assertEqual('MATCHED', paired.data['status'])
+        self.assertEqual(1, paired.data['player'])
+
+        game = Game.objects.get(pk=paired.data['game'])
+        self.assertEqual(game.player1_token, paired.data['playerToken'])
+        second_paired = self.client.get(reverse('matchticket-detail', args=[second.data['key']]))
+        self.assertEqual((game.pk, 2, game.player2_token),
+                         (second_paired.data['game'], second_paired.data['player'], second_paired.data['playerToken']))
+
+    def test_leave_the_queue(self):
+        paired = matchmaking.enqueue()
+        matchmaking.enqueue()
+        matchmaking.pair_waiting()
+        waiting = matchmaking.enqueue()
+
+        left = self.client.delete(reverse('matchticket-detail', args=[waiting.key]))
+        matched = self.client.delete(reverse('matchticket-detail', args=[paired.key]))
+        unknown = self.client.get(reverse('matchticket-detail', args=[waiting.key]))
+
+        self.assertEqual(left.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(matched.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(unknown.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(2, MatchTicket.objects.count())
+
+    def test_stats(self):
+        now = timezone.now()
+        game = Game.objects.create()
+        for wait in (1, 2, 3, 4, 10):
+            MatchTicket.objects.create(created_at=now - timedelta(seconds=wait), matched_at=now, game=game, player=1)
+        matchmaking.enqueue()
+
+        response = self.client.get(reverse('matchticket-stats'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(1, response.data['waiting'])
+        self.assertEqual(5, response.data['matched'])
+        self.assertEqual({'p50': 3.0, 'p90': 10.0, 'p99': 10.0, 'max': 10.0}, dict(response.data['waitSeconds']))
+
+
+class ConcurrentPairingTestCase(TransactionTestCase):
+
+    def test_passes_skip_the_locked_tickets(self):
+        tickets = [matchmaking.enqueue() for _ in range(4)]
+        locked = threading.Event()
+        release = threading.Event()
+
+        def lock_first_tickets():
+            with transaction.atomic():
+                list(MatchTicket.objects.select_for_update().filter(pk__in=[tickets[0].pk, tickets[1].pk]))
+                locked.set()
+                release.wait(5)
+            connection.close()
+
+        thread = threading.Thread(target=lock_first_tickets)
+        thread.start()
+        try:
+            locked.wait(5)
+            self.assertEqual(1, matchmaking.pair_waiting())
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual([None, None], [MatchTicket.objects.get(pk=ticket.pk).game_id for ticket in tickets[:2]])
+        self.assertEqual(1, matchmaking.pair_waiting())
@@ -0,0 +1,92 @@
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from battleship_game import metrics, pool
+from battleship_game.factories import create_random_board, create_random_game
+from battleship_game.models import PooledBoard
+
+
+@override_settings(BATTLESHIP_METRICS={'ENABLED': True, 'SERVER_TIMING': True})
+class MetricsTestCase(APITestCase):
+
+    def setUp(self):
+        metrics.registry.reset()
+
+    def test_attack_phases(self):
+        game = create_random_game()
+
+        response = self.client.post(reverse('game-attack', args=[game.pk]), data={'row': 3, 'column': 4})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        phases = [timing.split(';')[0] for timing in response['Server-Timing'].split(', ')]
+        self.assertEqual(['db_load', 'engine', 'save', 'serialize', 'render', 'total'], phases)
+
+        exported = self.client.get(reverse('metrics'))
+
+        self.assertEqual(metrics.CONTENT_TYPE, exported['Content-Type'])
+        lines = exported.content.decode().splitlines()
+        self.assertIn('battleship_requests_total{view="game-attack",method="POST",status="200"} 1', lines)
+        self.assertIn('battleship_request_duration_seconds_count{view="game-attack"} 1', lines)
+        self.assertIn('battleship_request_duration_seconds_bucket{view="game-attack",le="+Inf"} 1', lines)
+        self.assertIn('battleship_request_queries_total{view="game-attack",phase="db_load"} 1', lines)
+        self.assertTrue(any(line.startswith('battleship_request_phase_seconds_total{view="game-attack",phase="engine"}')
+                            for line in lines))
+
+    def test_create_phases(self):
+        response = self.client.post(reverse('game-list'))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn('engine;dur=', response['Server-Timing'])
+        self.assertEqual(1, metrics.registry.queries['game-list', 'save'])
+
+    @override_settings(BATTLESHIP_BOARD_POOL={'SIZE': 3})
+    def test_board_pool(self):
+        pool.pool_stats.reset()
+        PooledBoard.objects.create(opponent_grid=create_random_board())
+        self.client.post(reverse('game-list'))
+        self.client.post(reverse('game-list'))
+
+        lines = self.client.get(reverse('metrics')).content.decode().splitlines()
+
+        self.assertIn('battleship_board_pool_depth 0', lines)
+        self.assertIn('battleship_board_pool_claims_total{result="hit"} 1', lines)
+        self.assertIn('battleship_board_pool_claims_total{result="miss"} 1', lines)
+        self.assertIn('battleship_board_pool_claim_seconds_bucket{le="+Inf"} 2', lines)
+        self.assertIn('battleship_board_pool_claim_seconds_count 2', lines)
+
+    def test_board_pool_disabled(self):
+        lines = self.client.get(reverse('metrics')).content.decode().splitlines()
+
+        self.assertFalse(any(line.startswith('battleship_board_pool') for line in lines))
+
+    @override_settings(BATTLESHIP_METRICS={'ENABLED': False})
+    def test_disabled(self):
+        game = create_random_game()
+
+        response = self.client.post(reverse('game-attack', args=[game.pk]), data={'row': 3, 'column': 4})
+
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(metrics.registry.requests)
+
+
+class PhaseTestCase(SimpleTestCase):
+
+    def tearDown(self):
+        metrics._local.timings = None
+
+    def test_untimed_phase(self):
+        self.assertIs(metrics.phase(metrics.ENGINE), metrics.phase(metrics.SAVE))
+
+    def test_nested_phases_are_part_of_the_outer_one(self):
+        timings = metrics._local.timings = metrics.RequestTimings()
+
+        with metrics.phase(metrics.SAVE):
+            with metrics.phase(metrics.ENGINE):
+                pass
+        with metrics.phase(metrics.SAVE):
+            pass
+
+        self.assertEqual([metrics.SAVE], list(timings.seconds))
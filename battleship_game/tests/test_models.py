@@ -1,5 +1,8 @@
+from unittest.mock import patch
+
 from django.test import TestCase
 
+from battleship_game.engine import Board
 from battleship_game.models import Game, GameStatus, GameCell, AttackStatus
 
 
@@ -25,6 +28,28 @@ class GameTestCase(TestCase):
         self.assertEqual(GameStatus.IN_PROGRESS.value, all_games[0].game_status)
         self.assertEqual(GameCell.SHIP.value, all_games[0].opponent_grid[0][0])
 
+    def test_deferred_grid_is_loaded_on_access(self):
+        game = Game()
+        game.opponent_grid.place_ship(2, 'col', 3, 3)
+        game.save()
+
+        with self.assertNumQueries(1):
+            listed = Game.objects.only('id', 'game_status').get(pk=game.pk)
+
+        self.assertEqual(2, listed.ship_cells_left)
+
+    def test_save_game_after_attack(self):
+        game = Game()
+        game.opponent_grid[4][4] = GameCell.SHIP.value
+        game.opponent_grid[4][5] = GameCell.SHIP.value
+        game.save()
+
+        game.attack_cell(4, 4)
+        stored = Game.objects.get(pk=game.pk)
+
+        self.assertEqual(game.opponent_grid, stored.opponent_grid)
+        self.assertEqual(GameCell.INJURED.value, stored.opponent_grid[4][4])
+        self.assertEqual(GameCell.MISSED.value, stored.opponent_grid[5][5])
 
     def test_reset_grid(self):
         game = Game()
@@ -43,6 +68,15 @@ class GameTestCase(TestCase):
         result = game.attack_cell(2, 3)
         self.assertEqual(AttackStatus.INVALID, result.attack_status)
 
+    def test_attack_cell_outside_of_the_board(self):
+        game = Game()
+
+        for row, column in ((0, Game.GRID_SIZE), (Game.GRID_SIZE, 0), (-1, 0), (0, -1)):
+            with self.assertRaises(ValueError):
+                game.attack_cell(row, column, save=False)
+        self.assertEqual(GameCell.EMPTY.value, game.opponent_grid[1][0])
+        self.assertEqual(0, game.shots)
+
     def test_attack_cell_in_finished_game(self):
         game = Game(game_status=GameStatus.FINISHED.value)
         game.save()
@@ -147,6 +181,63 @@ class GameTestCase(TestCase):
         self.assertEqual(GameCell.MISSED.value, game.opponent_grid[1][3])
         self.assertEqual(GameCell.MISSED.value, game.opponent_grid[3][1])
 
+    def test_attack_cell_saves_only_changed_fields(self):
+        game = Game()
+        game.opponent_grid[5][5] = GameCell.SHIP.value
+        game.save()
+
+        with patch.object(Game, 'save') as save:
+            game.attack_cell(1, 1)
+            save.assert_called_once_with(update_fields=['opponent_grid', 'shots'])
+
+            save.reset_mock()
+            game.attack_cell(5, 5)
+            save.assert_called_once_with(update_fields=['opponent_grid', 'shots', 'game_status'])
+
+    def test_attack_cells_saves_once(self):
+        game = Game()
+        game.opponent_grid[5][5] = GameCell.SHIP.value
+        game.opponent_grid[5][6] = GameCell.SHIP.value
+        game.save()
+
+        with patch.object(Game, 'save') as save:
+            result = game.attack_cells([(0, 0), (5, 5), (0, 0)])
+
+            save.assert_called_once_with(update_fields=['opponent_grid', 'shots'])
+
+        self.assertEqual([AttackStatus.MISSED, AttackStatus.INJURED, AttackStatus.INVALID], result.attack_statuses)
+        self.assertIs(game, result.game)
+
+    def test_attack_cells_after_finishing_shot(self):
+        game = Game()
+        game.opponent_grid[5][5] = GameCell.SHIP.value
+        game.save()
+
+        result = game.attack_cells([(5, 5), (0, 0)])
+
+        self.assertEqual([AttackStatus.KILLED, AttackStatus.INVALID], result.attack_statuses)
+        self.assertEqual(GameStatus.FINISHED.value, Game.objects.get(pk=game.pk).game_status)
+        self.assertEqual(GameCell.EMPTY.value, game.opponent_grid[0][0])
+
+    def test_ship_counters(self):
+        game = Game()
+        game.opponent_grid[0][0] = GameCell.SHIP.value
+        game.opponent_grid[0][1] = GameCell.SHIP.value
+        game.opponent_grid[5][5] = GameCell.SHIP.value
+        game.save()
+
+        game.attack_cell(5, 5)
+        game.attack_cell(0, 0)
+        stored = Game.objects.get(pk=game.pk)
+
+        self.assertEqual(1, stored.ships_left)
+        self.assertEqual(1, stored.ship_cells_left)
+
+        game.reset_grid()
+
+        self.assertEqual(0, game.ships_left)
+        self.assertEqual(0, game.ship_cells_left)
+
     def test_attack_cell_injure_large_ship(self):
         game = Game()
         game.opponent_grid[0][0] = GameCell.SHIP.value
@@ -165,3 +256,149 @@ class GameTestCase(TestCase):
         self.assertEqual(GameCell.MISSED.value, game.opponent_grid[4][1])
         self.assertEqual(GameCell.MISSED.value, game.opponent_grid[2][1])
 
+    def test_attack_cell_changes(self):
+        game = Game()
+        game.opponent_grid.place_ship(1, 'col', 0, 0)
+        game.opponent_grid.place_ship(1, 'col', 9, 9)
+        game.save()
+
+        self.assertEqual([(5, 5, GameCell.MISSED.value)], game.attack_cell(5, 5).changes)
+        self.assertEqual([(0, 0, GameCell.KILLED.value), (1, 1, GameCell.MISSED.value), (0, 1, GameCell.MISSED.value),
+                          (1, 0, GameCell.MISSED.value)], game.attack_cell(0, 0).changes)
+        self.assertEqual([], game.attack_cell(0, 0).changes)
+
+    def test_attack_cells_lists_each_change_once(self):
+        game = Game()
+        game.opponent_grid.place_ship(2, 'col', 0, 0)
+        game.save()
+
+        changes = game.attack_cells([(0, 0), (0, 1)]).changes
+
+        self.assertEqual([(0, 0, GameCell.KILLED.value), (1, 1, GameCell.MISSED.value), (0, 1, GameCell.KILLED.value),
+                          (1, 0, GameCell.MISSED.value), (1, 2, GameCell.MISSED.value),
+                          (0, 2, GameCell.MISSED.value)], changes)
+
+    def test_attacks_are_logged(self):
+        game = Game()
+        game.opponent_grid.place_ship(2, 'col', 5, 5)
+        game.save()
+        initial_board = game.opponent_grid.to_bytes()
+
+        game.attack_cells([(0, 0), (5, 5), (0, 0)])
+
+        attacks = game.attacks.order_by('seq')
+        self.assertEqual([(1, 0, 0, AttackStatus.MISSED.value), (2, 5, 5, AttackStatus.INJURED.value)],
+                         [(attack.seq, attack.row, attack.column, attack.result) for attack in attacks])
+        self.assertEqual([(0, initial_board)],
+                         [(snapshot.seq, snapshot.opponent_grid.to_bytes()) for snapshot in game.snapshots.all()])
+        self.assertEqual(2, Game.objects.get(pk=game.pk).shots)
+
+    def test_replay(self):
+        game = Game()
+        game.opponent_grid.place_ship(1, 'col', 5, 5)
+        game.save()
+        initial_board = game.opponent_grid.to_bytes()
+        game.attack_cell(0, 0)
+        game.attack_cell(5, 5)
+
+        first = game.replay(1)
+        last = game.replay()
+
+        self.assertEqual(initial_board, game.replay(0).opponent_grid.to_bytes())
+        self.assertEqual(GameCell.MISSED.value, first.opponent_grid[0][0])
+        self.assertEqual(GameCell.SHIP.value, first.opponent_grid[5][5])
+        self.assertEqual(GameStatus.IN_PROGRESS.value, first.game_status)
+        self.assertEqual(game.opponent_grid.to_bytes(), last.opponent_grid.to_bytes())
+        self.assertEqual(GameStatus.FINISHED.value, last.game_status)
+        self.assertEqual(2, last.shots)
+        with self.assertRaises(ValueError):
+            game.replay(3)
+
+    def test_snapshots_bound_the_replay(self):
+        game = Game()
+        game.opponent_grid.place_ship(1, 'col', 9, 9)
+        game.save()
+
+        with patch.object(Game, 'SNAPSHOT_INTERVAL', 3):
+            game.attack_cells([(0, 0), (0, 2)])
+            for column in range(4, 10, 2):
+                game.attack_cell(0, column)
+            game.attack_cells([(2, 0), (2, 2)])
+
+        with self.assertNumQueries(2):
+            replayed = game.replay()
+
+        self.assertEqual([0, 3, 6], [snapshot.seq for snapshot in game.snapshots.order_by('seq')])
+        self.assertEqual(game.opponent_grid.to_bytes(), replayed.opponent_grid.to_bytes())
+
+    def test_batch_takes_a_snapshot_at_every_interval(self):
+        game = Game()
+        game.opponent_grid.place_ship(1, 'col', 9, 9)
+        game.save()
+
+        with patch.object(Game, 'SNAPSHOT_INTERVAL', 3):
+            game.attack_cells([(0, column) for column in range(0, 10, 2)] + [(2, 0), (2, 2), (2, 4)])
+
+        self.assertEqual([0, 3, 6], [snapshot.seq for snapshot in game.snapshots.order_by('seq')])
+        replayed = game.replay(5)
+        self.assertEqual(GameCell.MISSED.value, replayed.opponent_grid[0][8])
+        self.assertEqual(GameCell.EMPTY.value, replayed.opponent_grid[2][0])
+
+    def _two_player_game(self):
+        game = Game()
+        game.opponent_grid.place_ship(1, 'col', 0, 0)
+        game.opponent_grid.place_ship(1, 'col', 9, 9)
+        game.start_two_player(Board(Game.GRID_SIZE))
+        game.player_grid.place_ship(1, 'col', 5, 5)
+        game.save()
+        return game
+
+    def test_two_player_turns(self):
+        game = self._two_player_game()
+
+        self.assertEqual(1, game.player_of(game.player1_token))
+        self.assertEqual(2, game.player_of(game.player2_token))
+        self.assertIsNone(game.player_of('0' * 32))
+
+        self.assertEqual(AttackStatus.INVALID, game.attack_cell(1, 1, player=2).attack_status)
+        self.assertEqual(AttackStatus.KILLED, game.attack_cell(0, 0, player=1).attack_status)
+        self.assertEqual(1, game.turn)
+        self.assertEqual(AttackStatus.MISSED, game.attack_cell(3, 3, player=1).attack_status)
+        self.assertEqual(2, game.turn)
+        self.assertEqual(GameCell.MISSED.value, game.opponent_grid[3][3])
+
+        response = game.attack_cell(5, 5, player=2)
+
+        self.assertEqual(AttackStatus.KILLED, response.attack_status)
+        self.assertEqual(2, response.player)
+        self.assertEqual(GameStatus.FINISHED.value, game.game_status)
+        # the winner
+        self.assertEqual(2, Game.objects.get(pk=game.pk).turn)
+
+    def test_two_player_attack_saves_only_the_attacked_board(self):
+        game = self._two_player_game()
+
+        with patch.object(Game, 'save') as save:
+            game.attack_cell(1, 1, player=1)
+            save.assert_called_once_with(update_fields=['opponent_grid', 'shots', 'turn'])
+
+            save.reset_mock()
+            game.attack_cell(4, 4, player=2)
+            save.assert_called_once_with(update_fields=['player_grid', 'shots', 'turn'])
+
+    def test_two_player_replay(self):
+        game = self._two_player_game()
+        game.attack_cell(1, 1, player=1)
+        game.attack_cell(4, 4, player=2)
+        game.attack_cell(0, 0, player=1)
+
+        second = game.replay(2)
+        last = game.replay()
+
+        self.assertEqual(GameCell.MISSED.value, second.player_grid[4][4])
+        self.assertEqual(GameCell.SHIP.value, second.opponent_grid[0][0])
+        self.assertEqual(1, second.turn)
+        self.assertEqual(game.opponent_grid.to_bytes(), last.opponent_grid.to_bytes())
+        self.assertEqual(game.player_grid.to_bytes(), last.player_grid.to_bytes())
+        self.assertEqual(1, last.turn)
+        self.assertEqual([1, 2, 1], list(game.attacks.order_by('seq').values_list('player', flat=True)))
@@ -0,0 +1,105 @@
+from django.test import TestCase, override_settings
+
+from battleship_game import pool
+from battleship_game.factories import create_random_board
+from battleship_game.models import PooledBoard, Game
+from battleship_game.serializers import GameSerializer, NoBoardReady
+
+
+@override_settings(BATTLESHIP_BOARD_POOL={'SIZE': 3})
+class BoardPoolTestCase(TestCase):
+
+    def setUp(self):
+        pool.pool_stats.reset()
+
+    def test_fill_pool(self):
+        self.assertEqual(3, pool.fill_pool())
+        self.assertEqual(0, pool.fill_pool())
+        self.assertEqual(2, pool.fill_pool(5))
+
+        self.assertEqual(5, pool.pool_depth())
+        self.assertEqual(5, pool.stats()['boards_generated'])
+
+    def test_claim_board(self):
+        board = create_random_board()
+        PooledBoard.objects.create(opponent_grid=board)
+
+        self.assertEqual(board, pool.claim_board())
+        self.assertIsNone(pool.claim_board())
+
+        stats = pool.stats()
+        self.assertEqual(0, stats['depth'])
+        self.assertEqual(2, stats['claims'])
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(1, stats['misses'])
+
+    @override_settings(BATTLESHIP_BOARD_POOL={'SIZE': 0})
+    def test_disabled_pool_is_not_claimed(self):
+        PooledBoard.objects.create(opponent_grid=create_random_board())
+
+        self.assertIsNone(pool.claim_board())
+        self.assertEqual(1, pool.pool_depth())
+
+    def test_new_game_takes_a_pooled_board(self):
+        board = create_random_board()
+        PooledBoard.objects.create(opponent_grid=board)
+
+        serializer = GameSerializer(data={})
+        serializer.is_valid(raise_exception=True)
+        game = serializer.save()
+
+        self.assertEqual(board, Game.objects.get(pk=game.pk).opponent_grid)
+        self.assertEqual(0, pool.pool_depth())
+
+    def test_new_game_without_pooled_board(self):
+        serializer = GameSerializer(data={})
+        serializer.is_valid(raise_exception=True)
+        game = serializer.save()
+
+        self.assertEqual(10, game.ships_left)
+        self.assertEqual(1, pool.stats()['misses'])
+
+
+@override_settings(BATTLESHIP_BOARD_POOL={'SIZE': 1, 'GRID_SIZES': {101: 2}})
+class GridSizePoolTestCase(TestCase):
+    """
+    101 is the smallest board whose default fleet is not placed inside a request
+    """
+
+    def setUp(self):
+        pool.pool_stats.reset()
+
+    def test_fill_pool_per_grid_size(self):
+        self.assertEqual(3, pool.fill_pool())
+
+        self.assertEqual(1, pool.pool_depth(Game.GRID_SIZE))
+        self.assertEqual(2, pool.pool_depth(101))
+        self.assertEqual(101, pool.claim_board(101).size)
+        self.assertEqual(Game.GRID_SIZE, pool.claim_board().size)
+
+    def test_claim_boards_takes_all_or_none(self):
+        PooledBoard.objects.create(grid_size=101, opponent_grid=create_random_board(grid_size=101, ships=[1]))
+
+        self.assertEqual([], pool.claim_boards(2, 101))
+        self.assertEqual(1, pool.pool_depth(101))
+        self.assertEqual([], pool.claim_boards(1, 20))
+
+    def test_new_game_takes_pooled_boards_of_its_size(self):
+        for _ in range(2):
+            PooledBoard.objects.create(grid_size=101, opponent_grid=create_random_board(grid_size=101, ships=[1]))
+
+        serializer = GameSerializer(data={'gridSize': 101, 'players': 2})
+        serializer.is_valid(raise_exception=True)
+        game = serializer.save()
+
+        self.assertEqual([1], game.fleet)
+        self.assertEqual(1, game.player_grid.ships_left)
+        self.assertEqual(0, pool.pool_depth(101))
+
+    def test_new_game_without_pooled_board_of_its_size(self):
+        serializer = GameSerializer(data={'gridSize': 101})
+        serializer.is_valid(raise_exception=True)
+
+        with self.assertRaises(NoBoardReady):
+            serializer.save()
+        self.assertFalse(Game.objects.exists())
@@ -1,7 +1,11 @@
 from django.test import TestCase
+from rest_framework import serializers
 
-from battleship_game.models import Game, GameStatus, GameCell, AttackCellResponse, AttackStatus
-from battleship_game.serializers import GameSerializer, AttackCellSerializer, AttackResponseSerializer
+from battleship_game.factories import MAX_FLEET_LENGTH, MAX_FLEET_CELLS
+from battleship_game.models import Game, GameStatus, GameCell, AttackCellResponse, AttackStatus, \
+    AttackCellsResponse
+from battleship_game.serializers import GameSerializer, AttackCellSerializer, AttackResponseSerializer, \
+    AttacksResponseSerializer, GameCellField, OpponentGridField
 
 
 class GameSerializerTestCase(TestCase):
@@ -42,6 +46,18 @@ class GameSerializerTestCase(TestCase):
 
         self.assertEqual(GameCell.EMPTY.value, data['opponentGrid'][1][1])
 
+    def test_grid_matches_the_per_cell_fields(self):
+        game = Game(id=1)
+        game.opponent_grid.place_ship(3, 'row', 2, 2)
+        game.opponent_grid.place_ship(2, 'col', 7, 5)
+        game.opponent_grid.place_ship(1, 'col', 0, 9)
+        for row, column in [(2, 2), (7, 5), (7, 6), (4, 4), (0, 9)]:
+            game.opponent_grid.attack(row, column)
+        per_cell_field = serializers.ListField(child=serializers.ListField(child=GameCellField()))
+
+        self.assertEqual(per_cell_field.to_representation(game.opponent_grid),
+                         OpponentGridField().to_representation(game.opponent_grid))
+
     def test_create_new_game(self):
         serializer = GameSerializer(data={})
         serializer.is_valid(raise_exception=True)
@@ -52,6 +68,25 @@ class GameSerializerTestCase(TestCase):
         self.assertEqual(1, db_objects.count())
         self.assertEqual(GameStatus.IN_PROGRESS, GameStatus(db_objects[0].game_status))
 
+    def test_invalid_grid_size_and_fleet(self):
+        too_small = GameSerializer(data={'gridSize': 0})
+        too_large = GameSerializer(data={'gridSize': Game.MAX_GRID_SIZE + 1})
+        bad_ship = GameSerializer(data={'fleet': [2, 0]})
+        too_many_ships = GameSerializer(data={'gridSize': Game.MAX_GRID_SIZE, 'fleet': [1] * (MAX_FLEET_LENGTH + 1)})
+        long_ships = [Game.MAX_GRID_SIZE] * (MAX_FLEET_CELLS // Game.MAX_GRID_SIZE + 1)
+        too_many_cells = GameSerializer(data={'gridSize': Game.MAX_GRID_SIZE, 'fleet': long_ships})
+
+        self.assertFalse(too_small.is_valid())
+        self.assertEqual('min_value', too_small.errors['gridSize'][0].code)
+        self.assertFalse(too_large.is_valid())
+        self.assertEqual('max_value', too_large.errors['gridSize'][0].code)
+        self.assertFalse(bad_ship.is_valid())
+        self.assertEqual('min_value', bad_ship.errors['fleet'][0].code)
+        self.assertFalse(too_many_ships.is_valid())
+        self.assertEqual('max_length', too_many_ships.errors['fleet'][0].code)
+        self.assertFalse(too_many_cells.is_valid())
+        self.assertEqual('max_length', too_many_cells.errors['fleet'][0].code)
+
 
 class AttackCellSerializerTestCase(TestCase):
 
@@ -98,6 +133,41 @@ class AttackCellSerializerTestCase(TestCase):
         self.assertEqual('max_value', serializer.errors['row'][0].code)
         self.assertEqual('max_value', serializer.errors['column'][0].code)
 
+    def test_grid_size_from_context(self):
+        data = {'row': 42, 'column': 10}
+
+        serializer = AttackCellSerializer(data=data, context={'grid_size': 50})
+        small_serializer = AttackCellSerializer(data=data, context={'grid_size': 40})
+
+        self.assertTrue(serializer.is_valid())
+        self.assertFalse(small_serializer.is_valid())
+        self.assertEqual('max_value', small_serializer.errors['row'][0].code)
+        self.assertNotIn('column', small_serializer.errors)
+
+    def test_list_deserialization(self):
+        data = [{'row': 1, 'column': 2}, {'row': 3, 'column': 4}]
+
+        serializer = AttackCellSerializer(data=data, many=True)
+
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(data, serializer.validated_data)
+
+    def test_list_too_long_deserialization(self):
+        data = [{'row': 1, 'column': 2}] * (Game.GRID_SIZE * Game.GRID_SIZE + 1)
+
+        serializer = AttackCellSerializer(data=data, many=True)
+
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual('max_length', serializer.errors['non_field_errors'][0].code)
+
+    def test_list_longer_than_the_batch_limit(self):
+        data = [{'row': 1, 'column': 2}] * (AttackCellSerializer.Meta.list_serializer_class.max_attacks + 1)
+
+        serializer = AttackCellSerializer(data=data, many=True, context={'grid_size': Game.MAX_GRID_SIZE})
+
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual('max_length', serializer.errors['non_field_errors'][0].code)
+
 
 class AttackResponseSerializerTestCase(TestCase):
 
@@ -110,3 +180,16 @@ class AttackResponseSerializerTestCase(TestCase):
 
         self.assertEqual(AttackStatus.INJURED.value, response_serializer.data['attackStatus'])
         self.assertEqual(game_serializer.data, response_serializer.data['game'])
+
+
+class AttacksResponseSerializerTestCase(TestCase):
+
+    def test_response_serialization(self):
+        game = Game()
+        response = AttackCellsResponse([AttackStatus.MISSED, AttackStatus.KILLED], game)
+
+        response_serializer = AttacksResponseSerializer(response)
+
+        self.assertEqual([AttackStatus.MISSED.value, AttackStatus.KILLED.value],
+                         response_serializer.data['attackStatuses'])
+        self.assertEqual(GameSerializer(game).data, response_serializer.data['game'])
@@ -0,0 +1,101 @@
+import json
+import random
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from battleship_game.enums import AttackStatus, GameCell
+from battleship_game.simulation import play_game, simulate, summarize
+from battleship_game.strategies import STRATEGIES, Heatmap, HuntTargetStrategy
+
+
+def brute_force_scores(grid_size, fleet, opened):
+    """
+    Heatmap scores counted from scratch: every placement of every ship left avoiding the opened cells
+    """
+    scores = [0] * (grid_size * grid_size)
+    for ship_size in fleet:
+        orientations = ((0, 1),) if ship_size == 1 else ((0, 1), (1, 0))
+        for row_step, column_step in orientations:
+            for row in range(grid_size - (ship_size - 1) * row_step):
+                for column in range(grid_size - (ship_size - 1) * column_step):
+                    cells = [(row + offset * row_step) * grid_size + column + offset * column_step
+                             for offset in range(ship_size)]
+                    if not opened.intersection(cells):
+                        for cell in cells:
+                            scores[cell] += 1
+    return scores
+
+
+class StrategiesTestCase(SimpleTestCase):
+
+    def test_strategies_win(self):
+        for name, strategy_class in STRATEGIES.items():
+            with self.subTest(strategy=name):
+                shots = play_game(strategy_class, random.Random(name), grid_size=8)
+
+                self.assertLessEqual(shots, 64)
+
+    def test_heatmap_updates(self):
+        rng = random.Random(4)
+        fleet = [4, 3, 2, 1, 1]
+        heatmap = Heatmap(7, fleet)
+
+        def scores():
+            return [heatmap.score(index) for index in range(49)]
+
+        opened = set()
+        self.assertEqual(brute_force_scores(7, fleet, opened), scores())
+
+        for index in rng.sample(range(49), 20):
+            heatmap.open_cell(index)
+            opened.add(index)
+            self.assertEqual(brute_force_scores(7, fleet, opened), scores())
+            self.assertEqual(max(scores()), heatmap.score(heatmap.best()))
+
+        heatmap.kill(3)
+        heatmap.kill(1)
+        self.assertEqual(brute_force_scores(7, [4, 2, 1], opened), scores())
+        self.assertEqual(max(scores()), heatmap.score(heatmap.best()))
+
+    def test_targets_extend_the_injured_ship(self):
+        strategy = HuntTargetStrategy(10, [3])
+
+        injured, missed = GameCell.INJURED.value, GameCell.MISSED.value
+        strategy.record(AttackStatus.INJURED, [(4, 4, injured), (3, 3, missed), (3, 5, missed), (5, 3, missed),
+                                               (5, 5, missed)])
+        self.assertEqual({34, 54, 43, 45}, set(strategy.targets()))
+
+        strategy.record(AttackStatus.INJURED, [(4, 5, injured), (3, 6, missed), (5, 6, missed)])
+        self.assertEqual({43, 46}, set(strategy.targets()))
+
+
+class SimulationTestCase(SimpleTestCase):
+
+    def test_strategies_compare(self):
+        means = {name: summarize(simulate(200, name, seed=1, processes=1))['mean'] for name in STRATEGIES}
+
+        self.assertLess(means['hunt_target'], means['random'])
+        self.assertLess(means['density'], means['hunt_target'])
+
+    def test_pool_is_reproducible(self):
+        self.assertEqual(simulate(30, 'hunt_target', grid_size=6, seed=2, processes=1, chunk_size=7),
+                         simulate(30, 'hunt_target', grid_size=6, seed=2, processes=2, chunk_size=7))
+
+    def test_summarize(self):
+        summary = summarize({40: 1, 50: 8, 60: 1})
+
+        self.assertEqual(10, summary['games'])
+        self.assertEqual(50, summary['mean'])
+        self.assertEqual((40, 50, 50, 60, 60), (summary['min'], summary['p50'], summary['p90'], summary['p99'],
+                                                summary['max']))
+
+    def test_command(self):
+        out = StringIO()
+        call_command('simulate', games=20, strategy='random', grid_size=5, fleet='2,1', processes=1, seed=3,
+                     json=True, stdout=out)
+
+        result = json.loads(out.getvalue())
+        self.assertEqual(20, result['games'])
+        self.assertEqual(20, sum(result['distribution'].values()))
@@ -0,0 +1,161 @@
+import time
+from threading import Thread
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITransactionTestCase, APIClient
+
+from battleship_game import cache
+from battleship_game.enums import GameStatus, GameCell
+from battleship_game.models import Game
+from battleship_game.store import game_store, GameFlusher
+
+
+@override_settings(BATTLESHIP_GAME_STORE={'ENABLED': True})
+class GameStoreTestCase(APITransactionTestCase):
+
+    def setUp(self):
+        game_store.clear()
+        caches['default'].clear()
+
+    def tearDown(self):
+        game_store.clear()
+
+    def _game(self, *ships):
+        game = Game()
+        for size, row, column in ships:
+            game.opponent_grid.place_ship(size, 'col', row, column)
+        game.save()
+        return game
+
+    def test_attacks_stay_in_memory(self):
+        game = self._game((1, 0, 0), (1, 9, 9))
+
+        response = self.client.post(reverse('game-attack', args=[game.pk]), data={'row': 5, 'column': 5})
+        retrieved = self.client.get(reverse('game-detail', args=[game.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(GameCell.MISSED.value, retrieved.data['opponentGrid'][5][5])
+        self.assertEqual(GameCell.EMPTY.value, Game.objects.get(pk=game.pk).opponent_grid[5][5])
+
+        self.assertEqual(0, game.attacks.count())
+
+        self.assertEqual(1, game_store.flush())
+        self.assertEqual(0, game_store.flush())
+        self.assertEqual(GameCell.MISSED.value, Game.objects.get(pk=game.pk).opponent_grid[5][5])
+        self.assertEqual([(1, 5, 5)], [(attack.seq, attack.row, attack.column) for attack in game.attacks.all()])
+
+    def test_finished_game_is_written_at_once(self):
+        game = self._game((1, 0, 0))
+
+        response = self.client.post(reverse('game-attack', args=[game.pk]), data={'row': 0, 'column': 0})
+
+        self.assertEqual(GameStatus.FINISHED.value, response.data['game']['status'])
+        self.assertEqual(GameStatus.FINISHED.value, Game.objects.get(pk=game.pk).game_status)
+        self.assertNotIn(game.pk, game_store)
+        self.assertEqual(GameStatus.FINISHED.value, cache.get_game(game.pk, 'cells').data['status'])
+
+    def test_crash_loses_only_the_attacks_not_checkpointed(self):
+        in_progress = self._game((1, 0, 0), (1, 9, 9))
+        finished = self._game((1, 0, 0))
+        self.client.post(reverse('game-attack', args=[in_progress.pk]), data={'row': 0, 'column': 0})
+        self.client.post(reverse('game-attack', args=[finished.pk]), data={'row': 0, 'column': 0})
+
+        game_store.clear()
+        response = self.client.post(reverse('game-attack', args=[in_progress.pk]), data={'row': 9, 'column': 9})
+
+        self.assertEqual(GameStatus.FINISHED.value, Game.objects.get(pk=finished.pk).game_status)
+        self.assertEqual('KILLED', response.data['attackStatus'])
+        self.assertEqual(GameStatus.IN_PROGRESS.value, response.data['game']['status'])
+        self.assertEqual(2, Game.objects.get(pk=in_progress.pk).ship_cells_left)
+
+    def test_concurrent_attacks_finish_the_game(self):
+        game = self._game((2, 0, 0), (1, 3, 3), (1, 9, 9))
+        statuses = []
+
+        def attack(row):
+            for column in range(Game.GRID_SIZE):
+                response = APIClient().post(reverse('game-attack', args=[game.pk]), data={'row': row, 'column': column})
+                statuses.append(response.data['attackStatus'])
+            connection.close()
+
+        threads = [Thread(target=attack, args=(row,)) for row in range(Game.GRID_SIZE)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stored = Game.objects.get(pk=game.pk)
+        self.assertEqual(GameStatus.FINISHED.value, stored.game_status)
+        self.assertEqual(0, stored.ship_cells_left)
+        self.assertEqual(3, statuses.count('KILLED'))
+        self.assertNotIn(game.pk, game_store)
+
+    def test_idle_games_leave_the_store(self):
+        game = self._game((1, 0, 0), (1, 9, 9))
+        self.client.post(reverse('game-attack', args=[game.pk]), data={'row': 5, 'column': 5})
+
+        self.assertEqual(0, game_store.evict_idle(0))
+        game_store.flush()
+        self.assertEqual(1, game_store.evict_idle(0))
+
+        self.assertNotIn(game.pk, game_store)
+        with self.assertNumQueries(0):
+            retrieved = self.client.get(reverse('game-detail', args=[game.pk]))
+        self.assertEqual(GameCell.MISSED.value, retrieved.data['opponentGrid'][5][5])
+
+    def test_flusher(self):
+        game = self._game((1, 0, 0), (1, 9, 9))
+        flusher = GameFlusher(interval=0.01)
+        flusher.start()
+        try:
+            self.client.post(reverse('game-attack', args=[game.pk]), data={'row': 5, 'column': 5})
+
+            deadline = time.monotonic() + 5
+            while Game.objects.get(pk=game.pk).opponent_grid[5][5] != GameCell.MISSED.value:
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.01)
+        finally:
+            flusher.stop()
+            flusher.join()
+
+    def test_replay_includes_the_attacks_in_memory(self):
+        game = self._game((1, 0, 0), (1, 9, 9))
+        self.client.post(reverse('game-attack', args=[game.pk]), data={'row': 5, 'column': 5})
+
+        response = self.client.get(reverse('game-replay', args=[game.pk]))
+
+        self.assertEqual(1, response.data['seq'])
+        self.assertEqual(GameCell.MISSED.value, response.data['opponentGrid'][5][5])
+
+    def test_checkpoint_writes_only_the_attacked_boards(self):
+        game = self._game((1, 0, 0), (1, 9, 9))
+        game.start_two_player(Game().opponent_grid)
+        game.player_grid.place_ship(1, 'col', 0, 0)
+        game.save()
+
+        self.client.post(reverse('game-attack', args=[game.pk]), data={'row': 5, 'column': 5},
+                         HTTP_X_PLAYER_TOKEN=game.player1_token)
+        with CaptureQueriesContext(connection) as queries:
+            game_store.flush()
+        # the query log is reset by the next request
+        update = next(query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE'))
+        self.client.post(reverse('game-attack', args=[game.pk]), data={'row': 5, 'column': 5},
+                         HTTP_X_PLAYER_TOKEN=game.player2_token)
+        game_store.flush()
+
+        self.assertIn('"opponent_grid"', update)
+        self.assertNotIn('"player_grid"', update)
+        stored = Game.objects.get(pk=game.pk)
+        self.assertEqual(GameCell.MISSED.value, stored.opponent_grid[5][5])
+        self.assertEqual(GameCell.MISSED.value, stored.player_grid[5][5])
+        self.assertEqual(1, stored.turn)
+
+    def test_unknown_game(self):
+        response = self.client.post(reverse('game-attack', args=[0]), data={'row': 5, 'column': 5})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -1,11 +1,15 @@
+from base64 import b64encode
+from threading import Thread
 from unittest.mock import patch, Mock
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase, APIClient
 
-from battleship_game.factories import create_random_game
-from battleship_game.models import Game, AttackCellResponse, AttackStatus
+from battleship_game.factories import create_random_board, create_random_game, create_random_games
+from battleship_game.models import Game, AttackCellResponse, AttackStatus, GameCell, GameStatus
 
 
 class GameViewSetTestCase(APITestCase):
@@ -16,13 +20,65 @@ class GameViewSetTestCase(APITestCase):
         game2 = create_random_game()
 
         response = self.client.get(reverse('game-list'))
+        games = response.data['results']
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(2, len(response.data))
+        self.assertEqual(2, len(games))
 
-        self.assertEqual(2, len(response.data[0]))
-        self.assertEqual(game1.pk, response.data[0]['id'])
-        self.assertEqual(game2.game_status, response.data[1]['status'])
+        self.assertEqual(2, len(games[0]))
+        self.assertEqual(game1.pk, games[0]['id'])
+        self.assertEqual(game2.game_status, games[1]['status'])
+
+    def test_games_list_pages(self):
+        Game.objects.all().delete()
+        games = create_random_games(5)
+
+        first_page = self.client.get(reverse('game-list'), {'pageSize': 2})
+        second_page = self.client.get(first_page.data['next'])
+
+        self.assertEqual([game.pk for game in games[:2]], [game['id'] for game in first_page.data['results']])
+        self.assertEqual([game.pk for game in games[2:4]], [game['id'] for game in second_page.data['results']])
+        self.assertIsNotNone(second_page.data['previous'])
+
+    def test_games_list_does_not_load_grids(self):
+        create_random_games(3)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('game-list'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(1, len(queries.captured_queries))
+        self.assertNotIn('opponent_grid', queries.captured_queries[0]['sql'])
+
+    def test_games_list_status_filter(self):
+        Game.objects.all().delete()
+        game = Game()
+        game.opponent_grid.place_ship(1, 'col', 0, 0)
+        game.save()
+        game.attack_cell(0, 0)
+        create_random_game()
+
+        finished = self.client.get(reverse('game-list'), {'status': 'FINISHED'})
+        unknown = self.client.get(reverse('game-list'), {'status': 'LOST'})
+
+        self.assertEqual([game.pk], [listed['id'] for listed in finished.data['results']])
+        self.assertEqual(unknown.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_games_bulk_create(self):
+        Game.objects.all().delete()
+
+        response = self.client.post(reverse('game-bulk'), data={'count': 3})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(3, len(response.data))
+        self.assertEqual(3, Game.objects.count())
+        self.assertEqual(sorted(game['id'] for game in response.data),
+                         sorted(Game.objects.values_list('pk', flat=True)))
+
+    def test_games_bulk_create_invalid(self):
+        response = self.client.post(reverse('game-bulk'), data={'count': 1001})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_game_detail(self):
         Game.objects.all().delete()
@@ -32,10 +88,63 @@ class GameViewSetTestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-        self.assertEqual(3, len(response.data))
+        self.assertEqual(6, len(response.data))
         self.assertEqual(game.pk, response.data['id'])
         self.assertEqual(game.game_status, response.data['status'])
         self.assertEqual(Game.GRID_SIZE, len(response.data['opponentGrid']))
+        self.assertEqual(10, response.data['shipsLeft'])
+        self.assertEqual(20, response.data['shipCellsLeft'])
+        self.assertEqual(Game.GRID_SIZE, response.data['gridSize'])
+
+    def test_game_detail_grid_formats(self):
+        game = Game()
+        game.opponent_grid.place_ship(2, 'col', 0, 0)
+        game.opponent_grid.attack(0, 0)
+        game.save()
+
+        rows = self.client.get(reverse('game-detail', args=[game.pk]), {'grid': 'rows'})
+        bitmasks = self.client.get(reverse('game-detail', args=[game.pk]),
+                                   HTTP_ACCEPT='application/json; grid=bitmasks')
+        unknown = self.client.get(reverse('game-detail', args=[game.pk]), {'grid': 'pixels'})
+
+        self.assertEqual(['i' + ' ' * 9, ' .' + ' ' * 8] + [' ' * 10] * 8, rows.data['opponentGrid'])
+        self.assertEqual({
+            'missed': b64encode(bytes([0, 1 << 3] + [0] * 11)).decode(),
+            'injured': b64encode(bytes([1] + [0] * 12)).decode(),
+            'killed': b64encode(bytes(13)).decode(),
+        }, dict(bitmasks.data['opponentGrid']))
+        self.assertEqual(unknown.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+
+    def test_attack_cell_grid_format(self):
+        game = create_random_game()
+
+        response = self.client.post(reverse('game-attack', args=[game.pk]) + '?grid=rows',
+                                    data={'row': 3, 'column': 4})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(10, len(response.data['game']['opponentGrid'][3]))
+
+    def test_create_game_with_grid_size_and_fleet(self):
+        response = self.client.post(reverse('game-list'), data={'gridSize': 30, 'fleet': [5, 1]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(30, response.data['gridSize'])
+        self.assertEqual(30, len(response.data['opponentGrid']))
+        self.assertEqual(2, response.data['shipsLeft'])
+        self.assertEqual([5, 1], Game.objects.get(pk=response.data['id']).fleet)
+
+    def test_create_game_too_big_for_the_request_without_pooled_boards(self):
+        response = self.client.post(reverse('game-list'), data={'gridSize': Game.MAX_GRID_SIZE}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('gridSize', response.data)
+        self.assertFalse(Game.objects.exists())
+
+    def test_create_game_with_impossible_fleet(self):
+        response = self.client.post(reverse('game-list'), data={'gridSize': 5, 'fleet': [6]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fleet', response.data)
 
     @patch('battleship_game.views.GameViewSet.get_object')
     def test_attack_cell_valid(self, view_set_object):
@@ -47,9 +156,230 @@ class GameViewSetTestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(AttackStatus.MISSED.value, response.data['attackStatus'])
-        game.attack_cell.assert_called_once_with(3, 4)
+        game.attack_cell.assert_called_once_with(3, 4, save=True, player=None)
+
+    def test_attack_cell_locks_and_updates_the_game_row(self):
+        game = create_random_game()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('game-attack', args=[game.pk]), data={'row': 3, 'column': 4})
+
+        statements = [query['sql'] for query in queries.captured_queries]
+        self.assertTrue(any(sql.startswith('SELECT') and sql.endswith('FOR UPDATE') for sql in statements))
+        self.assertTrue(any(sql.startswith('UPDATE') and 'game_status' not in sql for sql in statements))
 
     def test_attack_cell_invalid(self):
-        response = self.client.post(reverse('game-attack', args=[2]), data={'row': 3}, )
+        game = create_random_game()
+
+        response = self.client.post(reverse('game-attack', args=[game.pk]), data={'row': 3}, )
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_attack_cell_is_checked_against_the_game_grid(self):
+        small_game = create_random_game(grid_size=5)
+        large_game = create_random_game(grid_size=20)
+
+        small_response = self.client.post(reverse('game-attack', args=[small_game.pk]), data={'row': 7, 'column': 0})
+        large_response = self.client.post(reverse('game-attack', args=[large_game.pk]), data={'row': 17, 'column': 0})
+
+        self.assertEqual(small_response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual('max_value', small_response.data['row'][0].code)
+        self.assertEqual(large_response.status_code, status.HTTP_200_OK)
+
+    def test_attack_cells(self):
+        game = Game()
+        game.opponent_grid[5][5] = GameCell.SHIP.value
+        game.save()
+        shots = [{'row': 1, 'column': 1}, {'row': 5, 'column': 5}]
+
+        response = self.client.post(reverse('game-attacks', args=[game.pk]), data=shots, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([AttackStatus.MISSED.value, AttackStatus.KILLED.value], response.data['attackStatuses'])
+        self.assertEqual('FINISHED', response.data['game']['status'])
+        self.assertEqual('FINISHED', Game.objects.get(pk=game.pk).game_status)
+
+    def test_attack_delta_responses(self):
+        game = Game()
+        game.opponent_grid.place_ship(1, 'col', 0, 0)
+        game.opponent_grid.place_ship(1, 'col', 9, 9)
+        game.save()
+
+        single = self.client.post(reverse('game-attack', args=[game.pk]) + '?response=delta',
+                                  data={'row': 5, 'column': 5})
+        batch = self.client.post(reverse('game-attacks', args=[game.pk]) + '?response=delta',
+                                 data=[{'row': 0, 'column': 0}, {'row': 9, 'column': 9}], format='json')
+        unknown = self.client.post(reverse('game-attack', args=[game.pk]) + '?response=diff',
+                                   data={'row': 4, 'column': 4})
+
+        self.assertEqual(single.status_code, status.HTTP_200_OK)
+        self.assertEqual({'id': game.pk, 'status': 'IN_PROGRESS', 'shipsLeft': 2, 'shipCellsLeft': 2,
+                          'changes': [[5, 5, '.']], 'attackStatus': 'MISSED'}, single.data)
+        self.assertEqual(['KILLED', 'KILLED'], batch.data['attackStatuses'])
+        self.assertEqual('FINISHED', batch.data['status'])
+        self.assertEqual(8, len(batch.data['changes']))
+        self.assertNotIn('opponentGrid', batch.data)
+        self.assertEqual(unknown.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+        self.assertEqual(GameCell.EMPTY.value, Game.objects.get(pk=game.pk).opponent_grid[4][4])
+
+    def test_attack_cells_invalid(self):
+        game = create_random_game()
+
+        response = self.client.post(reverse('game-attacks', args=[game.pk]), data=[], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_game_ships(self):
+        game = Game()
+        game.opponent_grid.place_ship(2, 'col', 0, 0)
+        game.opponent_grid.place_ship(1, 'col', 5, 5)
+        game.save()
+        game.attack_cell(5, 5)
+
+        response = self.client.get(reverse('game-ships', args=[game.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([{'size': 1, 'cells': [[5, 5]]}], response.data['killed'])
+        self.assertEqual([{'size': 2, 'count': 1}], response.data['afloat'])
+
+    def test_game_ships_do_not_tell_the_size_of_an_injured_ship(self):
+        game = Game()
+        game.opponent_grid.place_ship(3, 'col', 0, 0)
+        game.opponent_grid.place_ship(2, 'col', 5, 5)
+        game.save()
+        game.attack_cell(0, 0)
+
+        response = self.client.get(reverse('game-ships', args=[game.pk]))
+
+        self.assertEqual({'killed': [], 'afloat': [{'size': 3, 'count': 1}, {'size': 2, 'count': 1}]}, response.data)
+
+    def test_game_replay(self):
+        game = Game()
+        game.opponent_grid.place_ship(1, 'col', 5, 5)
+        game.save()
+        game.attack_cells([(0, 0), (5, 5)])
+
+        first = self.client.get(reverse('game-replay', args=[game.pk]), {'seq': 1, 'grid': 'rows'})
+        last = self.client.get(reverse('game-replay', args=[game.pk]))
+        invalid = self.client.get(reverse('game-replay', args=[game.pk]), {'seq': 3})
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(1, first.data['seq'])
+        self.assertEqual('.         ', first.data['opponentGrid'][0])
+        self.assertEqual(GameStatus.IN_PROGRESS.value, first.data['status'])
+        self.assertEqual(2, last.data['seq'])
+        self.assertEqual(GameStatus.FINISHED.value, last.data['status'])
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_game_suggest(self):
+        game = Game()
+        game.opponent_grid.place_ship(2, 'col', 0, 0)
+        game.opponent_grid.place_ship(1, 'col', 9, 9)
+        game.save()
+        game.attack_cell(0, 0)
+
+        response = self.client.get(reverse('game-suggest', args=[game.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # the only cells extending the injured ship
+        self.assertIn((response.data['row'], response.data['column']), [(0, 1), (1, 0)])
+
+    def test_game_suggest_with_a_ship_longer_than_the_heatmap_counts(self):
+        created = self.client.post(reverse('game-list'), data={'gridSize': 300, 'fleet': [200]}, format='json')
+
+        response = self.client.get(reverse('game-suggest', args=[created.data['id']]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLess(response.data['row'], 300)
+        self.assertLess(response.data['column'], 300)
+
+    def test_game_suggest_finished(self):
+        game = Game()
+        game.opponent_grid.place_ship(1, 'col', 9, 9)
+        game.save()
+        game.attack_cell(9, 9)
+
+        response = self.client.get(reverse('game-suggest', args=[game.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('status', response.data)
+
+    def test_create_two_player_game(self):
+        response = self.client.post(reverse('game-list'), data={'players': 2}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        game = Game.objects.get(pk=response.data['id'])
+        self.assertEqual([game.player1_token, game.player2_token], response.data['playerTokens'])
+        self.assertEqual(1, response.data['turn'])
+        self.assertEqual(game.fleet, sorted((ship.size for ship in game.player_grid.fleet), reverse=True))
+
+        invalid = self.client.post(reverse('game-list'), data={'players': 3}, format='json')
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('players', invalid.data)
+
+    def test_two_player_game_views(self):
+        game = create_random_game(players=2)
+
+        spectator = self.client.get(reverse('game-detail', args=[game.pk]), {'grid': 'rows'})
+        second = self.client.get(reverse('game-detail', args=[game.pk]), {'grid': 'rows'},
+                                 HTTP_X_PLAYER_TOKEN=game.player2_token)
+        unknown = self.client.get(reverse('game-detail', args=[game.pk]), HTTP_X_PLAYER_TOKEN='0' * 32)
+
+        self.assertNotIn(GameCell.SHIP.value, ''.join(spectator.data['opponentGrid'] + spectator.data['playerGrid']))
+        self.assertIsNone(spectator.data['player'])
+        self.assertEqual(2, second.data['player'])
+        self.assertEqual(game.player_grid.to_text(hidden=GameCell.hidden_cells()), ''.join(second.data['opponentGrid']))
+        self.assertEqual(game.opponent_grid.to_text(hidden=()), ''.join(second.data['playerGrid']))
+        self.assertEqual(unknown.status_code, status.HTTP_403_FORBIDDEN)
+
+        not_modified = self.client.get(reverse('game-detail', args=[game.pk]), {'grid': 'rows'},
+                                       HTTP_X_PLAYER_TOKEN=game.player2_token, HTTP_IF_NONE_MATCH=second['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertNotEqual(spectator['ETag'], second['ETag'])
+
+    def test_two_player_attacks(self):
+        game = Game()
+        game.opponent_grid.place_ship(1, 'col', 0, 0)
+        game.opponent_grid.place_ship(1, 'col', 9, 9)
+        game.start_two_player(create_random_board(grid_size=Game.GRID_SIZE, ships=[1]))
+        game.save()
+        url = reverse('game-attack', args=[game.pk])
+
+        anonymous = self.client.post(url, data={'row': 5, 'column': 5})
+        out_of_turn = self.client.post(url, data={'row': 5, 'column': 5}, HTTP_X_PLAYER_TOKEN=game.player2_token)
+        missed = self.client.post(url + '?response=delta', data={'row': 5, 'column': 5},
+                                  HTTP_X_PLAYER_TOKEN=game.player1_token)
+
+        self.assertEqual(anonymous.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(out_of_turn.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual('MISSED', missed.data['attackStatus'])
+        self.assertEqual(2, missed.data['turn'])
+        self.assertEqual(1, missed.data['player'])
+        self.assertEqual([[5, 5, GameCell.MISSED.value]], missed.data['changes'])
+
+        ships = self.client.get(reverse('game-ships', args=[game.pk]), HTTP_X_PLAYER_TOKEN=game.player2_token)
+        self.assertEqual([{'size': 1, 'count': 1}], ships.data['afloat'])
+        self.assertEqual(2, Game.objects.get(pk=game.pk).turn)
+
+
+class ConcurrentAttackTestCase(APITransactionTestCase):
+
+    def test_concurrent_attacks_are_all_applied(self):
+        game = Game()
+        game.opponent_grid.place_ship(1, 'col', 9, 9)
+        game.save()
+        cells = [(row, column) for row in range(0, 8, 2) for column in range(0, 8, 2)]
+
+        def attack(row, column):
+            APIClient().post(reverse('game-attack', args=[game.pk]), data={'row': row, 'column': column})
+            connection.close()
+
+        threads = [Thread(target=attack, args=cell) for cell in cells]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stored = Game.objects.get(pk=game.pk)
+        for row, column in cells:
+            self.assertEqual(GameCell.MISSED.value, stored.opponent_grid[row][column])
@@ -1,6 +1,7 @@
 from rest_framework import routers
 
-from battleship_game.views import GameViewSet
+from battleship_game.views import GameViewSet, MatchTicketViewSet
 
 router = routers.SimpleRouter()
 router.register(r'games', GameViewSet)
+router.register(r'matchmaking', MatchTicketViewSet)
@@ -1,15 +1,99 @@
-from rest_framework import viewsets, mixins, status
+from contextlib import contextmanager
+
+from django.db import transaction, connection
+from django.http import StreamingHttpResponse, Http404, HttpResponse
+from django.http.multipartparser import parse_header
+from rest_framework import viewsets, mixins, status, exceptions
 from rest_framework.decorators import action
+from rest_framework.renderers import JSONRenderer, BrowsableAPIRenderer
 from rest_framework.response import Response
 
-from battleship_game.models import Game
+from battleship_game import advisor, cache, events, matchmaking, metrics, pool, store
+from battleship_game.enums import GameStatus
+from battleship_game.models import Game, MatchTicket
+from battleship_game.pagination import GameCursorPagination
+from battleship_game.renderers import EventStreamRenderer
 from battleship_game.serializers import GameSerializer, AttackCellSerializer, AttackResponseSerializer, \
-    GameListSerializer
+    GameListSerializer, FleetSerializer, AttacksResponseSerializer, BulkCreateGamesSerializer, GRID_FORMATS, \
+    GRID_CELLS, RESPONSE_MODES, RESPONSE_FULL, RESPONSE_DELTA, AttackDeltaResponseSerializer, \
+    AttacksDeltaResponseSerializer, MatchTicketSerializer
+
+
+class NotYourTurn(exceptions.APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The other player attacks now.'
+    default_code = 'not_your_turn'
+
+
+class AlreadyMatched(exceptions.APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The ticket is paired into a game already.'
+    default_code = 'matched'
 
 
 class GameViewSet(viewsets.ReadOnlyModelViewSet, mixins.CreateModelMixin):
     queryset = Game.objects.all()
     serializer_class = GameSerializer
+    pagination_class = GameCursorPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # the grids are the bulk of the rows and are not listed
+            queryset = queryset.only('id', 'game_status').filter(**self.get_list_filters())
+        if self.action in ('attack_cell', 'attack_cells'):
+            # concurrent attacks on a game queue up on its row lock, held until the attack is committed
+            queryset = queryset.select_for_update()
+
+        return queryset
+
+    def get_list_filters(self):
+        """
+        Filters of the game list from the query parameters: ``status`` selects the games with that status
+        """
+        game_status = self.request.query_params.get('status')
+        if game_status is None:
+            return {}
+        if game_status not in [choice.value for choice in GameStatus]:
+            raise exceptions.ValidationError({'status': ['Unknown game status "{}", use one of: {}'.format(
+                game_status, ', '.join(choice.value for choice in GameStatus))]})
+
+        return {'game_status': game_status}
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['grid_format'] = self.get_grid_format()
+        return context
+
+    def get_grid_format(self):
+        """
+        Format of the opponent grid asked by the client, with the ``grid`` query parameter or a ``grid`` parameter of
+        the accepted media type, e.g. ``Accept: application/json; grid=rows``
+        """
+        grid_format = self.request.query_params.get('grid')
+        if grid_format is None and getattr(self.request, 'accepted_media_type', None):
+            _, params = parse_header(self.request.accepted_media_type.encode('ascii'))
+            grid_format = params['grid'].decode('ascii') if 'grid' in params else None
+
+        if grid_format is None:
+            return GRID_CELLS
+        if grid_format not in GRID_FORMATS:
+            raise exceptions.NotAcceptable('Unknown grid format "{}", use one of: {}'.format(
+                grid_format, ', '.join(GRID_FORMATS)))
+
+        return grid_format
+
+    def get_response_mode(self):
+        """
+        Whether an attack answers with the whole game (full, default) or only the cells it changed (delta),
+        from the ``response`` query parameter
+        """
+        response_mode = self.request.query_params.get('response', RESPONSE_FULL)
+        if response_mode not in RESPONSE_MODES:
+            raise exceptions.NotAcceptable('Unknown response mode "{}", use one of: {}'.format(
+                response_mode, ', '.join(RESPONSE_MODES)))
+
+        return response_mode
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -17,14 +101,291 @@ class GameViewSet(viewsets.ReadOnlyModelViewSet, mixins.CreateModelMixin):
         else:
             return GameSerializer
 
+    @contextmanager
+    def attacked_game(self):
+        """
+        Game to attack, locked until the attack is done: in the in-memory game store when it is enabled, by its row
+        lock in a transaction otherwise
+        """
+        if not store.store_enabled():
+            with transaction.atomic():
+                yield self.get_object()
+            return
+
+        with store.game_store.checkout(self.get_game_id()) as game:
+            if game is None:
+                raise Http404
+            yield game
+
+    @contextmanager
+    def stored_game(self):
+        """
+        Game held by the in-memory game store, locked for the block; None when the store does not hold it
+        """
+        if not store.store_enabled():
+            yield None
+            return
+
+        with store.game_store.checkout(self.get_game_id(), load=False) as game:
+            yield game
+
+    def get_object(self):
+        with metrics.phase(metrics.DB_LOAD):
+            return super().get_object()
+
+    def get_player(self, game):
+        """
+        Player of a two player game identified by the token of the X-Player-Token header, None without the header
+        """
+        token = self.request.META.get('HTTP_X_PLAYER_TOKEN')
+        if token is None:
+            return None
+
+        player = game.player_of(token)
+        if player is None:
+            raise exceptions.PermissionDenied('Unknown player token.')
+
+        return player
+
+    def get_player_context(self, game):
+        """
+        Serializer context of the game as seen by the player of the request
+        """
+        context = self.get_serializer_context()
+        context['player'] = self.get_player(game)
+        return context
+
+    def check_turn(self, game, player):
+        """
+        Reject the attacks of a two player game by a spectator or by the player not having the turn. The turn is a
+        column of the game row, loaded and locked by the attack anyway
+        """
+        if not game.two_player:
+            return
+        if player is None:
+            raise exceptions.PermissionDenied('Two player games are attacked with the X-Player-Token header.')
+        if player != game.turn and GameStatus(game.game_status) is GameStatus.IN_PROGRESS:
+            raise NotYourTurn
+
+    def get_game_id(self):
+        try:
+            return int(self.kwargs[self.lookup_field])
+        except ValueError:
+            raise Http404
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Game read through the game cache, answered with 304 Not Modified when the client has it already
+        """
+        grid_format = self.get_grid_format()
+        if 'HTTP_X_PLAYER_TOKEN' in request.META:
+            # the views of the players of a two player game are not cached
+            with self.stored_game() as game:
+                game = game or self.get_object()
+                context = self.get_player_context(game)
+                cached = cache.CachedGame(cache.game_etag(game, grid_format, context['player']),
+                                          cache.game_version(game), GameSerializer(game, context=context).data)
+        else:
+            with self.stored_game() as game:
+                # the game store holds the latest state of its games, ahead of the database and the game cache
+                if game is not None:
+                    cached = cache.CachedGame(cache.game_etag(game, grid_format), cache.game_version(game),
+                                              self.get_serializer(game).data)
+            if game is None:
+                cached = cache.get_game(kwargs[self.lookup_field], grid_format)
+            if cached is None:
+                instance = self.get_object()
+                cached = cache.put_game(instance, grid_format, self.get_serializer(instance).data, replace=False)
+
+        headers = {'ETag': cached.etag}
+        if cached.etag in [etag.strip() for etag in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        return Response(cached.data, headers=headers)
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        game = response.data.serializer.instance
+        if game.two_player:
+            # the only time the tokens are sent, for the creator to hand them to the players
+            response.data['playerTokens'] = [game.player1_token, game.player2_token]
+
+        return response
+
+    @action(detail=False, methods=['post'], url_path='bulk', url_name='bulk')
+    def bulk_create(self, request):
+        bulk_create = BulkCreateGamesSerializer(data=request.data)
+
+        if bulk_create.is_valid(raise_exception=True):
+            games = bulk_create.save()
+            response_serializer = GameListSerializer(games, many=True)
+            return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['post'], url_path='attack', url_name='attack')
     def attack_cell(self, request, pk=None):
-        attack_cell = AttackCellSerializer(data=request.data)
-
-        if attack_cell.is_valid(raise_exception=True):
-            game = self.get_object()
-            row = attack_cell.validated_data['row']
-            col = attack_cell.validated_data['column']
-            response = game.attack_cell(row, col)
-            response_serializer = AttackResponseSerializer(response)
-            return Response(response_serializer.data, status=status.HTTP_200_OK)
+        # an unknown grid format or response mode is rejected before the attack is made
+        context = self.get_serializer_context()
+        response_mode = self.get_response_mode()
+        with self.attacked_game() as game:
+            context['player'] = self.get_player(game)
+            self.check_turn(game, context['player'])
+            # the cells are checked against the size of the game board
+            attack_cell = AttackCellSerializer(data=request.data, context={'grid_size': game.grid_size})
+
+            if attack_cell.is_valid(raise_exception=True):
+                row = attack_cell.validated_data['row']
+                col = attack_cell.validated_data['column']
+                response = game.attack_cell(row, col, save=not store.store_enabled(), player=context['player'])
+
+        if response_mode == RESPONSE_DELTA:
+            response_serializer = AttackDeltaResponseSerializer(response, context=context)
+        else:
+            response_serializer = AttackResponseSerializer(response, context=context)
+        return Response(response_serializer.data, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'], url_path='attacks', url_name='attacks')
+    def attack_cells(self, request, pk=None):
+        context = self.get_serializer_context()
+        response_mode = self.get_response_mode()
+        with self.attacked_game() as game:
+            context['player'] = self.get_player(game)
+            self.check_turn(game, context['player'])
+            attack_cells = AttackCellSerializer(data=request.data, many=True, allow_empty=False,
+                                                context={'grid_size': game.grid_size})
+
+            if attack_cells.is_valid(raise_exception=True):
+                cells = [(attack['row'], attack['column']) for attack in attack_cells.validated_data]
+                response = game.attack_cells(cells, save=not store.store_enabled(), player=context['player'])
+
+        if response_mode == RESPONSE_DELTA:
+            response_serializer = AttacksDeltaResponseSerializer(response, context=context)
+        else:
+            response_serializer = AttacksResponseSerializer(response, context=context)
+        return Response(response_serializer.data, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], url_path='ships', url_name='ships')
+    def ships(self, request, pk=None):
+        with self.stored_game() as game:
+            game = game or self.get_object()
+            # the ships attacked by the player of a two player game
+            ships_serializer = FleetSerializer(game.target_grid(self.get_player(game)).fleet)
+            return Response(ships_serializer.data, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], url_path='suggest', url_name='suggest')
+    def suggest(self, request, pk=None):
+        """
+        Next shot suggested by the computer attacker, from what the game shows of its board. In a two player game it
+        is the shot of the player of the request, of the player having the turn by default
+        """
+        with self.stored_game() as game:
+            game = game or self.get_object()
+            if GameStatus(game.game_status) is GameStatus.FINISHED:
+                raise exceptions.ValidationError({'status': ['The game is finished.']})
+
+            row, column = advisor.suggest_shot(game, self.get_player(game) or game.turn)
+            return Response({'row': row, 'column': column}, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], url_path='replay', url_name='replay')
+    def replay(self, request, pk=None):
+        """
+        The game as it was after its first ``seq`` logged attacks, all of them by default, rebuilt from its attack log
+        """
+        if store.store_enabled():
+            # the attacks held by the game store are logged first
+            store.game_store.checkpoint(self.get_game_id())
+        game = self.get_object()
+
+        seq = request.query_params.get('seq', str(game.shots))
+        if not seq.isdigit() or int(seq) > game.shots:
+            raise exceptions.ValidationError(
+                {'seq': ['Must be a number of attacks between 0 and {}.'.format(game.shots)]})
+
+        replayed = game.replay(int(seq))
+        replayed_serializer = GameSerializer(replayed, context=self.get_player_context(game))
+        return Response(dict(replayed_serializer.data, seq=replayed.shots), status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], url_path='events', url_name='events',
+            renderer_classes=[JSONRenderer, BrowsableAPIRenderer, EventStreamRenderer])
+    def game_events(self, request, pk=None):
+        """
+        Attacks of the game as they are committed: a stream of server-sent events for the clients accepting
+        text/event-stream, long-polling otherwise
+        """
+        with self.stored_game() as game:
+            game = game or self.get_object()
+            finished = GameStatus(game.game_status) is GameStatus.FINISHED
+        after = self.get_last_event_id(game)
+        # the database connection is not needed while waiting for the events
+        if not connection.in_atomic_block:
+            connection.close()
+
+        if request.accepted_renderer.format == EventStreamRenderer.format:
+            response = StreamingHttpResponse(events.event_stream(game.pk, after, finished),
+                                             content_type=EventStreamRenderer.media_type)
+            response['Cache-Control'] = 'no-cache'
+            return response
+
+        timeout = 0 if finished else events.events_settings()['POLL_TIMEOUT']
+        new_events = events.get_broker().wait(game.pk, after, timeout)
+        return Response({
+            'lastEventId': new_events[-1].id if new_events else after,
+            'events': [{'id': event.id, 'data': event.data} for event in new_events],
+        }, status=status.HTTP_200_OK)
+
+    def get_last_event_id(self, game):
+        """
+        Id of the last event the client has, from the ``after`` query parameter or the Last-Event-ID header of a
+        reconnecting event stream. A new client starts from the last published event
+        """
+        last_event_id = self.request.query_params.get('after', self.request.META.get('HTTP_LAST_EVENT_ID'))
+        if last_event_id is None:
+            return events.get_broker().last_event_id(game.pk)
+        if not last_event_id.isdigit():
+            raise exceptions.ValidationError({'after': ['A valid event id is required.']})
+
+        return int(last_event_id)
+
+
+class MatchTicketViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin,
+                         viewsets.GenericViewSet):
+    """
+    Matchmaking queue of the two player games: POST enqueues a player, GET polls its ticket by key until it is paired,
+    DELETE leaves the queue
+    """
+    # only the tokens of the paired game are read, not its boards
+    queryset = MatchTicket.objects.select_related('game').only(
+        'id', 'key', 'created_at', 'game', 'player', 'matched_at', 'game__player1_token', 'game__player2_token')
+    serializer_class = MatchTicketSerializer
+    lookup_field = 'key'
+    lookup_value_regex = '[0-9a-f]+'
+
+    def retrieve(self, request, *args, **kwargs):
+        # the polls pair the waiting tickets, when no matchmaker does it
+        matchmaking.pair_if_due()
+        return super().retrieve(request, *args, **kwargs)
+
+    def perform_destroy(self, instance):
+        if not matchmaking.dequeue(instance):
+            raise AlreadyMatched
+
+    @action(detail=False, methods=['get'], url_path='stats', url_name='stats')
+    def stats(self, request):
+        """
+        Waiting tickets and wait time percentiles of the queue
+        """
+        return Response(matchmaking.queue_stats(), status=status.HTTP_200_OK)
+
+
+def metrics_view(request):
+    """
+    Request metrics of the process, and the board pool metrics when the pool is enabled, in the Prometheus text
+    format, when they are enabled
+    """
+    if not metrics.metrics_enabled():
+        raise Http404
+
+    content = metrics.registry.render()
+    if pool.pool_settings()['SIZE']:
+        content += metrics.render_pool_stats(pool.stats())
+
+    return HttpResponse(content, content_type=metrics.CONTENT_TYPE)